@@ -1,11 +1,9 @@
 # app.py
 import sys
 import os
-from PyQt6 import QtWidgets
-from PyQt6.QtGui import QIcon
-from PyQt6.QtCore import QSettings
-import db
-from main_window import MainWindow
+import startup_profile
+# PyQt6 и главное окно импортируются внутри main(): дочерние процессы пула (пакетные записки)
+# тоже импортируют этот модуль и не должны тянуть за собой интерфейс.
 
 def app_dir() -> str:
     """Папка приложения (рядом с .py в dev и рядом с .exe в сборке)."""
@@ -21,9 +19,31 @@ def resource_path(*parts) -> str:
     base = getattr(sys, "_MEIPASS", app_dir())
     return os.path.join(base, *parts)
 
+def _arg_value(name: str) -> str | None:
+    """Значение ключа командной строки вида --name=value."""
+    for a in sys.argv[1:]:
+        if a.startswith(name + "="):
+            return a.split("=", 1)[1]
+    return None
+
 def main():
+    # Пути из командной строки — относительно каталога, из которого запущено приложение (до chdir)
+    timeline, timeline_path = startup_profile.parse_flag(sys.argv[1:])
+    if timeline_path:
+        timeline_path = os.path.abspath(timeline_path)
+    cli_db = _arg_value("--db")   # --db=путь: открыть указанную базу (без запоминания в настройках)
+    if cli_db:
+        cli_db = os.path.abspath(cli_db)
     # Рабочая директория = папка приложения (чтобы data/ создавалась рядом с exe)
     os.chdir(app_dir())
+    quit_after_paint = "--quit-after-paint" in sys.argv[1:]
+
+    with startup_profile.span("import PyQt6"):
+        from PyQt6 import QtWidgets, QtCore
+        from PyQt6.QtGui import QIcon
+        from PyQt6.QtCore import QSettings
+    with startup_profile.span("import db"):
+        import db
 
     app = QtWidgets.QApplication(sys.argv)
     app.setApplicationName("Invest Manager")
@@ -43,6 +63,8 @@ def main():
     # --- Выбор активной БД ДО любых вызовов db.* ---
     settings = QSettings()
     last_db = settings.value("db/last_path", "", str)
+    if cli_db:
+        last_db = cli_db
 
     chosen_path = None
     new_db_type = None  # при создании новой базы: "invest" или "services"
@@ -95,12 +117,14 @@ def main():
 
     while True:
         try:
-            db.set_db_path(chosen_path)
-            db.ensure_data_dirs()
-            if new_db_type:
-                db.init_db(db_type=new_db_type)
-            else:
-                db.init_db()
+            with startup_profile.span("открытие БД"):
+                db.set_db_path(chosen_path)
+                db.ensure_data_dirs()
+            with startup_profile.span("init_db"):
+                if new_db_type:
+                    db.init_db(db_type=new_db_type)
+                else:
+                    db.open_db()
             break
         except Exception as e:
             msg = db._format_db_error(e) if hasattr(db, "_format_db_error") else str(e)
@@ -149,9 +173,26 @@ def main():
                 chosen_path = path
                 settings.setValue("db/last_path", os.path.abspath(path))
 
-    w = MainWindow()
+    with startup_profile.span("import main_window"):
+        from main_window import MainWindow
+    with startup_profile.span("MainWindow()"):
+        w = MainWindow()
     w.show()
+
+    def on_first_paint():
+        startup_profile.finish()
+        if timeline:
+            startup_profile.dump(timeline_path)
+        if quit_after_paint:
+            app.quit()
+
+    # Срабатывает после первого прохода цикла событий, когда окно уже отрисовано
+    QtCore.QTimer.singleShot(0, on_first_paint)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Пакетные служебные записки пишутся в пуле процессов: в собранном exe дочерний процесс
+    # должен выполнить задание, а не запустить второе окно приложения
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
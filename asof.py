@@ -0,0 +1,166 @@
+# asof.py
+# Главная таблица «на дату»: бюджет, имеется, необходимо и остаток каждой статьи, какими они были
+# на выбранный день. События (корректировки, ревизии, маркетинг, договоры) читаются одним
+# запросом по дате (db.list_asof_data) и проигрываются по порядку; каждые CHECKPOINT_EVERY событий
+# сохраняется контрольная точка состояния, так что расчёт на любую дату — копия ближайшей точки
+# и проигрывание не более CHECKPOINT_EVERY событий. Журнал и точки кэшируются до изменения
+# данных (_meta.data_version).
+#
+# Бюджет до первой корректировки — projects.initial_budget (заполняется при создании статьи,
+# миграция 7→8). У статей, откорректированных до миграции, исходный бюджет не сохранился:
+# до первой корректировки берётся её сумма (приближение). Признак «вне бюджета» и статус
+# закупки не версионируются — показываются текущие.
+import bisect
+import datetime
+import os
+import sys
+
+import db
+
+CHECKPOINT_EVERY = 2000
+
+_cache = None             # (путь базы, data_version, Journal)
+
+
+class _State:
+    """Состояние на момент после n событий: по позиции статьи — бюджет, ревизии, последние маркетинг/договор."""
+
+    __slots__ = ("n", "base", "rev_in", "rev_out", "marketing", "contract", "seen")
+
+    def __init__(self, size: int, base: list):
+        self.n = 0
+        self.base = list(base)
+        self.rev_in = [0.0] * size
+        self.rev_out = [0.0] * size
+        self.marketing: list = [None] * size
+        self.contract: list = [None] * size
+        self.seen = [False] * size          # у статьи было событие (для статей без даты создания)
+
+    def copy(self) -> "_State":
+        s = _State.__new__(_State)
+        s.n = self.n
+        s.base, s.rev_in, s.rev_out = self.base[:], self.rev_in[:], self.rev_out[:]
+        s.marketing, s.contract, s.seen = self.marketing[:], self.contract[:], self.seen[:]
+        return s
+
+
+class Journal:
+    """Журнал событий базы с контрольными точками; rows(date) — строки главной таблицы на дату."""
+
+    def __init__(self, projects: list[tuple], events: list[tuple]):
+        self.projects = projects
+        self._pos = {p[0]: i for i, p in enumerate(projects)}
+        self.events = [e for e in events if e[2] in self._pos]
+        self.dates = [str(e[0] or "")[:10] for e in self.events]
+        base = []
+        for p in projects:
+            initial, current, first_correction = p[5], p[6], p[9]
+            if initial is None:
+                initial = first_correction if first_correction is not None else current
+            base.append(float(initial or 0))
+        state = _State(len(projects), base)
+        self.checkpoints = [state.copy()]
+        for i in range(len(self.events)):
+            self._apply(state, self.events[i])
+            state.n = i + 1
+            if state.n % CHECKPOINT_EVERY == 0:
+                self.checkpoints.append(state.copy())
+
+    def _apply(self, s: _State, event: tuple):
+        _date, kind, pid, amount, other = event
+        i = self._pos[pid]
+        amount = float(amount or 0)
+        s.seen[i] = True
+        if kind == "C":
+            s.base[i] = amount
+        elif kind == "M":
+            s.marketing[i] = amount
+        elif kind == "K":
+            s.contract[i] = amount
+        elif kind == "R":
+            s.rev_out[i] += amount
+            j = self._pos.get(other)
+            if j is not None:
+                s.rev_in[j] += amount
+                s.seen[j] = True
+
+    def state_at(self, date: str) -> _State:
+        """Состояние после всех событий с датой ≤ date (ГГГГ-ММ-ДД)."""
+        n = bisect.bisect_right(self.dates, date)
+        start = self.checkpoints[n // CHECKPOINT_EVERY]
+        if start.n == n:
+            return start
+        s = start.copy()
+        for i in range(s.n, n):
+            self._apply(s, self.events[i])
+        s.n = n
+        return s
+
+    def rows(self, date: str) -> list[tuple]:
+        """
+        Строки в формате db.list_project_rows для статей, существовавших на date: созданных не позже
+        date или имеющих события до date включительно (события часто вносятся задним числом).
+
+        >>> j = Journal([(1, "A", "", "", "2026-10-19", 100.0, 100.0, 0, None, None),
+        ...              (2, "B", "", "", "2026-10-19", 50.0, 50.0, 0, None, None)],
+        ...             [("2026-03-01", "R", 1, 30.0, 2), ("2026-06-01", "K", 2, 60.0, None)])
+        >>> [(r[1], r[5], r[8]) for r in j.rows("2026-07-01")]
+        [('A', 70.0, None), ('B', 80.0, 60.0)]
+        >>> j.rows("2026-02-01")
+        []
+        """
+        s = self.state_at(date)
+        out = []
+        for i, p in enumerate(self.projects):
+            created = str(p[4] or "")[:10]
+            if not s.seen[i] and (not created or created > date):
+                continue
+            base = s.base[i]
+            st = db._status_values(base, s.rev_in[i], s.rev_out[i], s.contract[i], s.marketing[i])
+            pstatus = (p[8].strip() if p[8] else None) or None
+            out.append((p[0], p[1], p[2], p[3], base, st["have"], st["need"], st["marketing_amount"],
+                        st["contract_amount"], st["diff"], st["stage"], 1 if p[7] else 0, pstatus))
+        return out
+
+
+def journal() -> Journal:
+    """Журнал текущей базы (кэш — до изменения данных)."""
+    global _cache
+    key = os.path.abspath(db.get_db_path())
+    version = db.get_data_version()
+    if _cache is not None and _cache[:2] == (key, version):
+        return _cache[2]
+    projects, events, version = db.list_asof_data()
+    j = Journal(projects, events)
+    _cache = (key, version, j)
+    return j
+
+
+def project_rows(date) -> list[tuple]:
+    """Строки главной таблицы на дату (datetime.date или ГГГГ-ММ-ДД)."""
+    if isinstance(date, datetime.date):
+        date = date.isoformat()
+    return journal().rows(str(date)[:10])
+
+
+def main(argv=None) -> int:
+    import argparse
+    from utils import money
+    ap = argparse.ArgumentParser(description="Бюджет статей на дату")
+    ap.add_argument("date", help="ГГГГ-ММ-ДД")
+    ap.add_argument("--db", help="путь к базе (по умолчанию — база по умолчанию в data/)")
+    args = ap.parse_args(argv)
+    if args.db:
+        db.set_db_path(args.db)
+    if db.open_db() != "invest":
+        print("Расчёт на дату есть только для базы инвест-проектов.", file=sys.stderr)
+        return 2
+    rows = project_rows(args.date)
+    for r in rows:
+        print(f"{r[0]:>6}  {r[1][:40]:<40}  {money(r[4]):>16}  {money(r[5]):>16}  {money(r[6]):>16}  {money(r[9]):>16}")
+    print(f"Статей: {len(rows)} | Имеется: {money(sum(r[5] for r in rows))} | Остаток: {money(sum(r[9] for r in rows))}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,184 @@
+# attachment_check_dialog.py
+# Окно «Проверка файлов»: запуск attachment_scanner.scan в фоновом потоке и вывод результатов
+# (нет файла / лишние файлы / дубликаты) с действиями по исправлению.
+import os
+
+from PyQt6 import QtCore, QtWidgets
+
+import db
+import attachment_scanner
+
+
+class _ScanThread(QtCore.QThread):
+    done = QtCore.pyqtSignal(object)     # report (dict) или строка с ошибкой
+
+    def __init__(self, full: bool, parent=None):
+        super().__init__(parent)
+        self._full = full
+
+    def run(self):
+        try:
+            self.done.emit(attachment_scanner.scan(full=self._full))
+        except Exception as e:
+            self.done.emit(str(e) or e.__class__.__name__)
+
+
+def _size_text(n: int) -> str:
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.1f} МБ"
+    return f"{max(1, n // 1024)} КБ" if n else "0 КБ"
+
+
+class AttachmentCheckDialog(QtWidgets.QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Проверка файлов")
+        self.resize(820, 520)
+        self._report: dict | None = None
+        self._thread: _ScanThread | None = None
+
+        self.full_chk = QtWidgets.QCheckBox("Полная проверка (без индекса)")
+        self.scan_btn = QtWidgets.QPushButton("🔍 Проверить")
+        self.summary = QtWidgets.QLabel("Нажмите «Проверить».")
+        self.summary.setWordWrap(True)
+
+        self.missing_tbl = self._make_table(["Таблица", "ID записи", "ID проекта", "Путь"])
+        self.orphan_tbl = self._make_table(["Файл", "Размер", "ID проекта"])
+        self.dup_tbl = self._make_table(["Группа", "Файл"])
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.addTab(self.missing_tbl, "Нет файла")
+        self.tabs.addTab(self.orphan_tbl, "Лишние файлы")
+        self.tabs.addTab(self.dup_tbl, "Дубликаты")
+
+        self.relink_btn = QtWidgets.QPushButton("Перепривязать по имени файла")
+        self.relink_btn.setToolTip("Для записей без файла найти в папке базы файл с тем же именем (если он один) и обновить путь.")
+        self.register_btn = QtWidgets.QPushButton("Добавить лишние файлы в загрузки проектов")
+        self.register_btn.setToolTip("Файлы из папок проектов, на которые нет ссылок, будут записаны в «Загруженные файлы» проекта.")
+        self.open_btn = QtWidgets.QPushButton("📂 Открыть папку")
+        close_btn = QtWidgets.QPushButton("Закрыть")
+        for b in (self.relink_btn, self.register_btn):
+            b.setEnabled(False)
+
+        top = QtWidgets.QHBoxLayout()
+        top.addWidget(self.scan_btn)
+        top.addWidget(self.full_chk)
+        top.addStretch(1)
+        bottom = QtWidgets.QHBoxLayout()
+        bottom.addWidget(self.relink_btn)
+        bottom.addWidget(self.register_btn)
+        bottom.addWidget(self.open_btn)
+        bottom.addStretch(1)
+        bottom.addWidget(close_btn)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(top)
+        layout.addWidget(self.summary)
+        layout.addWidget(self.tabs, 1)
+        layout.addLayout(bottom)
+
+        self.scan_btn.clicked.connect(self.start_scan)
+        self.relink_btn.clicked.connect(self._relink)
+        self.register_btn.clicked.connect(self._register)
+        self.open_btn.clicked.connect(self._open_folder)
+        close_btn.clicked.connect(self.reject)
+
+    def _make_table(self, headers: list[str]) -> QtWidgets.QTableWidget:
+        t = QtWidgets.QTableWidget(0, len(headers))
+        t.setHorizontalHeaderLabels(headers)
+        t.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        t.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        t.horizontalHeader().setStretchLastSection(True)
+        t.verticalHeader().setVisible(False)
+        return t
+
+    def start_scan(self):
+        if self._thread is not None:
+            return
+        self.scan_btn.setEnabled(False)
+        self.relink_btn.setEnabled(False)
+        self.register_btn.setEnabled(False)
+        self.summary.setText("Проверка…")
+        self._thread = _ScanThread(self.full_chk.isChecked(), self)
+        self._thread.done.connect(self._on_scan_done)
+        self._thread.start()
+
+    def _on_scan_done(self, result):
+        self._thread.wait()
+        self._thread.deleteLater()
+        self._thread = None
+        self.scan_btn.setEnabled(True)
+        if isinstance(result, str):
+            self.summary.setText(f"Ошибка проверки: {result}")
+            return
+        self._report = result
+        self._fill(result)
+
+    def _fill(self, r: dict):
+        self.summary.setText(
+            f"Ссылок в базе: {r['refs']}, файлов в папке: {r['files']}. "
+            f"Нет файла: {len(r['missing'])}, лишних: {len(r['orphaned'])}, групп дубликатов: {len(r['duplicates'])}. "
+            f"Перечитано папок: {r['rescanned_dirs']}, время: {r['elapsed']:.1f} с."
+        )
+        self._set_rows(self.missing_tbl, [
+            (m["table"], m["id"], m["project_id"], m["file_path"]) for m in r["missing"]
+        ])
+        self._set_rows(self.orphan_tbl, [
+            (o["file_path"], _size_text(o["size"]), o["project_id"] if o["project_id"] is not None else "—")
+            for o in r["orphaned"]
+        ])
+        self._set_rows(self.dup_tbl, [
+            (i, p) for i, group in enumerate(r["duplicates"], start=1) for p in group
+        ])
+        self.tabs.setTabText(0, f"Нет файла ({len(r['missing'])})")
+        self.tabs.setTabText(1, f"Лишние файлы ({len(r['orphaned'])})")
+        self.tabs.setTabText(2, f"Дубликаты ({len(r['duplicates'])})")
+        self.relink_btn.setEnabled(bool(r["missing"]))
+        self.register_btn.setEnabled(any(o["project_id"] is not None for o in r["orphaned"]))
+
+    def _set_rows(self, table: QtWidgets.QTableWidget, rows: list[tuple]):
+        table.setUpdatesEnabled(False)
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, v in enumerate(row):
+                table.setItem(i, j, QtWidgets.QTableWidgetItem(str(v)))
+        table.resizeColumnsToContents()
+        table.horizontalHeader().setStretchLastSection(True)
+        table.setUpdatesEnabled(True)
+
+    def _relink(self):
+        if not self._report:
+            return
+        try:
+            n = attachment_scanner.relink_missing(self._report)
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", db._format_db_error(e))
+            return
+        QtWidgets.QMessageBox.information(self, "Проверка файлов", f"Перепривязано записей: {n}.")
+        self.start_scan()
+
+    def _register(self):
+        if not self._report:
+            return
+        if QtWidgets.QMessageBox.question(
+            self, "Проверка файлов",
+            "Добавить лишние файлы из папок проектов в «Загруженные файлы» соответствующих проектов?"
+        ) != QtWidgets.QMessageBox.StandardButton.Yes:
+            return
+        try:
+            n = attachment_scanner.register_orphans(self._report)
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", db._format_db_error(e))
+            return
+        QtWidgets.QMessageBox.information(self, "Проверка файлов", f"Добавлено записей: {n}.")
+        self.start_scan()
+
+    def _open_folder(self):
+        path = os.path.abspath(os.path.join(db.FILES_DIR, db.get_db_basename()))
+        os.makedirs(path, exist_ok=True)
+        from PyQt6.QtGui import QDesktopServices
+        QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(path))
+
+    def reject(self):
+        if self._thread is not None:
+            self._thread.wait()
+        super().reject()
@@ -0,0 +1,227 @@
+# attachment_index.py
+# Поиск по содержимому вложений (маркетинг, договоры, загрузки проекта): текст извлекается из
+# docx/xlsx (zipfile + XML, без сторонних библиотек) и текстовых файлов и кладётся в FTS5-таблицу
+# (trigram) — по строке на запись вложения (таблица:id). Обновление инкрементальное: файл читается
+# заново, только если изменились размер/mtime и при этом SHA-256; одинаковое содержимое (хранилище
+# _store) извлекается один раз. Индекс лежит рядом с файлами (Files/{имя_базы}/_content_index.sqlite),
+# в саму базу не пишется — как и индекс attachment_scanner.
+import os
+import sqlite3
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+
+import db
+import attachment_scanner
+
+INDEX_FILENAME = attachment_scanner.SIDECAR_FILENAMES[1]
+TEXT_EXTENSIONS = (".txt", ".csv", ".md", ".log", ".xml", ".json")
+ZIP_EXTENSIONS = (".docx", ".docm", ".xlsx", ".xlsm")
+MAX_FILE_BYTES = 100 * 1024 * 1024     # крупнее — не индексируются
+MAX_PART_BYTES = 64 * 1024 * 1024      # распакованная часть docx/xlsx (защита от «zip-бомб»)
+MAX_TEXT_CHARS = 2_000_000
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def is_supported(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS + ZIP_EXTENSIONS
+
+
+# -------- Извлечение текста
+def _xml_text(zf: zipfile.ZipFile, name: str, text_tag: str, break_tags: tuple) -> list[str]:
+    info = zf.getinfo(name)
+    if info.file_size > MAX_PART_BYTES:
+        return []
+    out = []
+    with zf.open(info) as f:
+        for _event, el in ET.iterparse(f):
+            if el.tag == text_tag and el.text:
+                out.append(el.text)
+            elif el.tag in break_tags:
+                out.append("\n")
+            el.clear()
+    return out
+
+
+def _docx_text(zf: zipfile.ZipFile) -> str:
+    parts = [n for n in zf.namelist()
+             if n == "word/document.xml" or (n.startswith("word/") and n.endswith(".xml")
+                                             and os.path.basename(n).startswith(("header", "footer", "footnotes")))]
+    out = []
+    for name in parts:
+        out += _xml_text(zf, name, _W + "t", (_W + "p", _W + "tab", _W + "br"))
+    return "".join(out)
+
+
+def _xlsx_text(zf: zipfile.ZipFile) -> str:
+    # Общие строки + строки, записанные прямо в листах (inlineStr); числа не индексируются
+    names = [n for n in zf.namelist()
+             if n == "xl/sharedStrings.xml" or (n.startswith("xl/worksheets/") and n.endswith(".xml"))]
+    out = []
+    for name in names:
+        out += _xml_text(zf, name, _S + "t", (_S + "si", _S + "is"))
+    return " ".join(t.strip() for t in "".join(out).split("\n") if t.strip())
+
+
+def _plain_text(path: str) -> str:
+    with open(path, "rb") as f:
+        raw = f.read(MAX_TEXT_CHARS * 2)
+    for enc in ("utf-8-sig", "cp1251"):
+        try:
+            return raw.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("utf-8", errors="replace")
+
+
+def extract_text(path: str) -> str:
+    """Текст файла для индекса ('' — формат не поддерживается). Ошибки чтения — OSError/ValueError."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        text = _plain_text(path)
+    elif ext in ZIP_EXTENSIONS:
+        try:
+            with zipfile.ZipFile(path) as zf:
+                text = _docx_text(zf) if ext.startswith(".doc") else _xlsx_text(zf)
+        except (zipfile.BadZipFile, ET.ParseError, KeyError) as e:
+            raise ValueError(f"{os.path.basename(path)}: {e}") from None
+    else:
+        return ""
+    return " ".join(text.split())[:MAX_TEXT_CHARS]
+
+
+# -------- Индекс
+def _index_path() -> str:
+    return os.path.join(attachment_scanner._scan_root(), INDEX_FILENAME)
+
+
+def _open_index(create: bool = True) -> sqlite3.Connection | None:
+    path = _index_path()
+    if not create and not os.path.isfile(path):
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path, timeout=10)
+    con.execute("""CREATE TABLE IF NOT EXISTS docs(
+        id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE, tbl TEXT, row_id INTEGER,
+        project_id INTEGER, file_path TEXT, size INTEGER, mtime_ns INTEGER, sha256 TEXT)""")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_docs_sha ON docs(sha256)")
+    try:
+        # text — для поиска (db.normalize_search_text), raw — исходный текст для фрагмента в результатах
+        con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS content USING fts5(text, raw UNINDEXED, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        # SQLite без FTS5: обычная таблица, поиск — перебором (instr)
+        con.execute("CREATE TABLE IF NOT EXISTS content(rowid INTEGER PRIMARY KEY, text TEXT, raw TEXT)")
+    return con
+
+
+def _has_fts(con: sqlite3.Connection) -> bool:
+    row = con.execute("SELECT sql FROM sqlite_master WHERE name='content'").fetchone()
+    return bool(row and "fts5" in (row[0] or "").lower())
+
+
+def update_index(progress=None, cancelled=None) -> dict:
+    """
+    Довести индекс до текущего состояния вложений. progress(done, total) — по файлам;
+    cancelled() → True — прервать (уже сделанное сохраняется).
+    Возвращает {"indexed", "unchanged", "removed", "errors", "total", "elapsed"}.
+    """
+    t0 = time.perf_counter()
+    refs = [r for r in attachment_scanner.load_references() if is_supported(str(r["file_path"]))]
+    con = _open_index()
+    stats = {"indexed": 0, "unchanged": 0, "removed": 0, "errors": 0, "total": len(refs)}
+    try:
+        known = {r[0]: r[1:] for r in con.execute("SELECT key, id, file_path, size, mtime_ns, sha256 FROM docs")}
+        live = set()
+        for n, ref in enumerate(refs):
+            if cancelled is not None and cancelled():
+                break
+            if progress is not None:
+                progress(n, len(refs))
+            key = f"{ref['table']}:{ref['id']}"
+            path = db.resolve_file_path(ref["file_path"])
+            if path is None:
+                continue
+            live.add(key)
+            try:
+                st = os.stat(path)
+                if st.st_size > MAX_FILE_BYTES:
+                    continue
+                prev = known.get(key)
+                if prev and prev[1] == ref["file_path"] and prev[2] == st.st_size and prev[3] == st.st_mtime_ns:
+                    stats["unchanged"] += 1
+                    continue
+                sha = db._file_sha256(path)
+                if prev and prev[4] == sha:
+                    with con:
+                        con.execute("UPDATE docs SET file_path=?, size=?, mtime_ns=?, project_id=? WHERE id=?",
+                                    (ref["file_path"], st.st_size, st.st_mtime_ns, ref["project_id"], prev[0]))
+                    stats["unchanged"] += 1
+                    continue
+                same = con.execute("SELECT c.raw FROM docs d JOIN content c ON c.rowid = d.id "
+                                   "WHERE d.sha256=? LIMIT 1", (sha,)).fetchone()
+                raw = same[0] if same else extract_text(path)
+            except (OSError, ValueError):
+                stats["errors"] += 1
+                continue
+            with con:
+                if prev:
+                    con.execute("DELETE FROM content WHERE rowid=?", (prev[0],))
+                    con.execute("DELETE FROM docs WHERE id=?", (prev[0],))
+                cur = con.execute(
+                    "INSERT INTO docs(key, tbl, row_id, project_id, file_path, size, mtime_ns, sha256) VALUES(?,?,?,?,?,?,?,?)",
+                    (key, ref["table"], ref["id"], ref["project_id"], ref["file_path"], st.st_size, st.st_mtime_ns, sha))
+                con.execute("INSERT INTO content(rowid, text, raw) VALUES(?,?,?)",
+                            (cur.lastrowid, db.normalize_search_text(raw), raw))
+            stats["indexed"] += 1
+        else:
+            # Записи удалены или файл пропал — убрать из индекса (только если обход не прерван)
+            gone = [(v[0],) for k, v in known.items() if k not in live]
+            with con:
+                con.executemany("DELETE FROM content WHERE rowid=?", gone)
+                con.executemany("DELETE FROM docs WHERE id=?", gone)
+            stats["removed"] = len(gone)
+    finally:
+        con.close()
+    stats["elapsed"] = time.perf_counter() - t0
+    return stats
+
+
+def search(query: str, limit: int = 30) -> list[dict]:
+    """
+    Вложения, в тексте которых есть query (без учёта регистра, от 3 символов):
+    [{"project_id", "table", "row_id", "file_path", "snippet"}].
+    """
+    q = " ".join(db.normalize_search_text(query).split())
+    if len(q) < 3:
+        return []
+    con = _open_index(create=False)
+    if con is None:
+        return []
+    try:
+        if _has_fts(con):
+            rows = con.execute(
+                "SELECT d.project_id, d.tbl, d.row_id, d.file_path, content.text, content.raw "
+                "FROM content JOIN docs d ON d.id = content.rowid WHERE content MATCH ? "
+                "ORDER BY bm25(content) LIMIT ?", ('"' + q.replace('"', '""') + '"', limit)).fetchall()
+        else:
+            con.create_function("fold", 1, lambda v: (v or "").lower(), deterministic=True)
+            rows = con.execute(
+                "SELECT d.project_id, d.tbl, d.row_id, d.file_path, c.text, c.raw "
+                "FROM content c JOIN docs d ON d.id = c.rowid WHERE instr(fold(c.text), ?) > 0 LIMIT ?",
+                (q.lower(), limit)).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        con.close()
+    return [{"project_id": r[0], "table": r[1], "row_id": r[2], "file_path": r[3], "snippet": _snippet(r[4], r[5], q)}
+            for r in rows]
+
+
+def _snippet(text: str, raw: str, q: str, before: int = 30, width: int = 100) -> str:
+    """Фрагмент исходного текста вокруг совпадения (замена «двойников» не меняет длину — позиции совпадают)."""
+    pos = max((text or "").lower().find(q.lower()), 0)
+    start = max(0, pos - before)
+    cut = (raw or "")[start:start + width]
+    return ("…" if start > 0 else "") + cut + ("…" if start + width < len(raw or "") else "")
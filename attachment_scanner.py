@@ -0,0 +1,311 @@
+# attachment_scanner.py
+# Проверка целостности вложений: записи БД, чей file_path не открывается (missing),
+# файлы в Files/{имя_базы}/, на которые не ссылается ни одна запись (orphaned), и одинаковые
+# по содержимому файлы (duplicates). Дерево обходится один раз через os.scandir; ссылки из всех
+# таблиц вложений читаются одним запросом. Повторный обход инкрементальный: для каждой папки
+# хранится mtime, и если папка не менялась — список её файлов берётся из индекса без scandir
+# (размер и mtime файлов всё равно сверяются через stat: перезапись на месте mtime папки не меняет).
+# Индекс лежит рядом с файлами (Files/{имя_базы}/_scan_index.sqlite), в саму базу не пишется.
+import os
+import sqlite3
+import time
+import datetime
+
+import db
+
+INDEX_FILENAME = "_scan_index.sqlite"
+# Служебные базы в корне папки файлов (вместе с -journal): этот индекс и индекс содержимого attachment_index
+SIDECAR_FILENAMES = (INDEX_FILENAME, "_content_index.sqlite")
+
+# Служебные файлы, которые не считаются «лишними»
+_SKIP_PREFIXES = (".tmp_", "~$")
+_SKIP_SUFFIXES = (".part",)
+
+
+def _scan_root() -> str:
+    return os.path.abspath(os.path.join(db.FILES_DIR, db.get_db_basename()))
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.normpath(path))
+
+
+def _open_index(root: str) -> sqlite3.Connection:
+    con = sqlite3.connect(os.path.join(root, INDEX_FILENAME))
+    con.execute("""CREATE TABLE IF NOT EXISTS dirs(
+        rel_dir TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER)""")
+    con.execute("""CREATE TABLE IF NOT EXISTS files(
+        rel_path TEXT PRIMARY KEY, rel_dir TEXT, size INTEGER, mtime_ns INTEGER, sha256 TEXT)""")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_files_dir ON files(rel_dir)")
+    return con
+
+
+def load_references() -> list[dict]:
+    """Все ссылки на файлы из таблиц вложений — одним запросом."""
+    con = db.connect()
+    cur = con.cursor()
+    parts = [f"SELECT '{t}' AS tbl, id, project_id, file_path FROM {t} WHERE file_path IS NOT NULL AND file_path<>''"
+             for t in db.ATTACHMENT_TABLES]
+    cur.execute(" UNION ALL ".join(parts))
+    rows = [{"table": r[0], "id": r[1], "project_id": r[2], "file_path": r[3]} for r in cur.fetchall()]
+    con.close()
+    return rows
+
+
+def _walk(root: str, index: sqlite3.Connection, full: bool) -> tuple[dict, int]:
+    """
+    Обойти дерево. Возвращает ({rel_path: (size, mtime_ns, sha256|None)}, число папок, прочитанных scandir).
+    Папки, чей mtime совпал с индексом, не читаются — их файлы и подпапки берутся из индекса;
+    у файлов, изменившихся по stat, хэш из индекса сбрасывается.
+    """
+    cached_dirs = {} if full else {r[0]: (r[1], r[2]) for r in index.execute("SELECT rel_dir, parent, mtime_ns FROM dirs")}
+    children: dict[str, list[str]] = {}
+    for rel_dir, (parent, _m) in cached_dirs.items():
+        children.setdefault(parent, []).append(rel_dir)
+    cached_files: dict[str, dict] = {}
+    if not full:
+        for rel_path, rel_dir, size, mtime_ns, sha in index.execute("SELECT rel_path, rel_dir, size, mtime_ns, sha256 FROM files"):
+            cached_files.setdefault(rel_dir, {})[rel_path] = (size, mtime_ns, sha)
+
+    files: dict[str, tuple] = {}
+    new_dirs: list[tuple] = []
+    new_files: list[tuple] = []
+    rescanned: list[str] = []
+    changed: list[tuple] = []
+    vanished: list[tuple] = []
+    visited: set[str] = set()
+    stack = [("", None)]
+    while stack:
+        rel_dir, parent = stack.pop()
+        abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+        try:
+            mtime_ns = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            continue
+        visited.add(rel_dir)
+        cached = cached_dirs.get(rel_dir)
+        if cached is not None and cached[1] == mtime_ns:
+            for rel, prev in cached_files.get(rel_dir, {}).items():
+                try:
+                    st = os.stat(os.path.join(root, rel))
+                except OSError:
+                    vanished.append((rel,))
+                    continue
+                if prev[0] == st.st_size and prev[1] == st.st_mtime_ns:
+                    files[rel] = prev
+                else:
+                    files[rel] = (st.st_size, st.st_mtime_ns, None)
+                    changed.append((st.st_size, st.st_mtime_ns, rel))
+            for sub in children.get(rel_dir, []):
+                stack.append((sub, rel_dir))
+            continue
+        rescanned.append(rel_dir)
+        new_dirs.append((rel_dir, parent, mtime_ns))
+        old = cached_files.get(rel_dir, {})
+        try:
+            entries = list(os.scandir(abs_dir))
+        except OSError:
+            continue
+        for e in entries:
+            rel = os.path.join(rel_dir, e.name) if rel_dir else e.name
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append((rel, rel_dir))
+                    continue
+                if not e.is_file(follow_symlinks=False):
+                    continue
+                if not rel_dir and e.name.startswith(SIDECAR_FILENAMES):
+                    continue
+                st = e.stat()
+            except OSError:
+                continue
+            prev = old.get(rel)
+            sha = prev[2] if prev and prev[0] == st.st_size and prev[1] == st.st_mtime_ns else None
+            files[rel] = (st.st_size, st.st_mtime_ns, sha)
+            new_files.append((rel, rel_dir, st.st_size, st.st_mtime_ns, sha))
+
+    # Обновляем индекс только для перечитанных и исчезнувших папок
+    with index:
+        if full:
+            index.execute("DELETE FROM dirs")
+            index.execute("DELETE FROM files")
+        else:
+            gone = [d for d in cached_dirs if d not in visited]
+            index.executemany("DELETE FROM dirs WHERE rel_dir=?", [(d,) for d in gone])
+            index.executemany("DELETE FROM files WHERE rel_dir=?", [(d,) for d in gone + rescanned])
+            index.executemany("DELETE FROM files WHERE rel_path=?", vanished)
+            index.executemany("UPDATE files SET size=?, mtime_ns=?, sha256=NULL WHERE rel_path=?", changed)
+        index.executemany("INSERT OR REPLACE INTO dirs(rel_dir, parent, mtime_ns) VALUES(?,?,?)", new_dirs)
+        index.executemany("INSERT OR REPLACE INTO files(rel_path, rel_dir, size, mtime_ns, sha256) VALUES(?,?,?,?,?)", new_files)
+    return files, len(rescanned)
+
+
+def _hash_duplicates(root: str, files: dict, index: sqlite3.Connection) -> list[list[str]]:
+    """Группы одинаковых файлов: сначала по размеру, хэш считается только при совпадении размеров."""
+    by_size: dict[int, list[str]] = {}
+    for rel, (size, _m, _sha) in files.items():
+        if size > 0:
+            by_size.setdefault(size, []).append(rel)
+    by_hash: dict[str, list[str]] = {}
+    updates = []
+    for size, rels in by_size.items():
+        if len(rels) < 2:
+            continue
+        inodes = set()
+        for rel in rels:
+            full = os.path.join(root, rel)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            if st.st_ino and (st.st_dev, st.st_ino) in inodes:
+                continue  # жёсткая ссылка на уже учтённый файл — это не дубликат
+            inodes.add((st.st_dev, st.st_ino))
+            size_, mtime_ns, sha = files[rel]
+            if not sha:
+                try:
+                    sha = db._file_sha256(full)
+                except OSError:
+                    continue
+                files[rel] = (size_, mtime_ns, sha)
+                updates.append((sha, rel))
+            by_hash.setdefault(sha, []).append(rel)
+    if updates:
+        with index:
+            index.executemany("UPDATE files SET sha256=? WHERE rel_path=?", updates)
+    return sorted((sorted(g) for g in by_hash.values() if len(g) > 1), key=lambda g: g[0])
+
+
+def _project_id_from_rel(rel: str) -> int | None:
+    """Files/{база}/{id_Название}/файл → id (для «лишних» файлов в папках проектов)."""
+    head = rel.split(os.sep, 1)[0]
+    num = head.split("_", 1)[0]
+    return int(num) if num.isdigit() and os.sep in rel else None
+
+
+def scan(full: bool = False, find_duplicates: bool = True) -> dict:
+    """
+    Проверить вложения текущей базы. full=True — игнорировать индекс и перечитать всё дерево.
+    Возвращает словарь: missing, orphaned, duplicates, files, refs, rescanned_dirs, elapsed.
+    """
+    t0 = time.perf_counter()
+    root = _scan_root()
+    refs = load_references()
+    if os.path.isdir(root):
+        index = _open_index(root)
+        try:
+            files, rescanned = _walk(root, index, full)
+            duplicates = _hash_duplicates(root, files, index) if find_duplicates else []
+        finally:
+            index.close()
+    else:
+        files, rescanned, duplicates = {}, 0, []
+
+    data_dir = os.path.abspath(db.DATA_DIR)
+    by_norm = {_norm(os.path.join(root, rel)): rel for rel in files}
+    referenced: set[str] = set()
+    missing = []
+    for ref in refs:
+        p = str(ref["file_path"]).strip()
+        full_path = _norm(p if os.path.isabs(p) else os.path.join(data_dir, p))
+        if full_path in by_norm:
+            referenced.add(by_norm[full_path])
+        elif full_path.startswith(_norm(root) + os.sep) or not os.path.isfile(full_path):
+            missing.append(ref)
+
+    # Жёсткие ссылки из папок проектов на файлы хранилища — не «лишние»
+    ref_inodes = set()
+    store_prefix = db.ATTACHMENT_STORE_DIRNAME + os.sep
+    if any(rel.startswith(store_prefix) for rel in referenced):
+        for rel in referenced:
+            if rel.startswith(store_prefix):
+                try:
+                    st = os.stat(os.path.join(root, rel))
+                    ref_inodes.add((st.st_dev, st.st_ino))
+                except OSError:
+                    pass
+
+    orphaned = []
+    for rel, (size, _m, _sha) in files.items():
+        name = os.path.basename(rel)
+        if rel in referenced or name.startswith(_SKIP_PREFIXES) or name.endswith(_SKIP_SUFFIXES):
+            continue
+        if ref_inodes:
+            try:
+                st = os.stat(os.path.join(root, rel))
+                if st.st_nlink > 1 and (st.st_dev, st.st_ino) in ref_inodes:
+                    continue
+            except OSError:
+                pass
+        orphaned.append({
+            "file_path": os.path.relpath(os.path.join(root, rel), data_dir),
+            "size": size,
+            "project_id": _project_id_from_rel(rel),
+        })
+    orphaned.sort(key=lambda o: o["file_path"])
+
+    return {
+        "missing": missing,
+        "orphaned": orphaned,
+        "duplicates": [[os.path.relpath(os.path.join(root, r), data_dir) for r in g] for g in duplicates],
+        "files": len(files),
+        "refs": len(refs),
+        "rescanned_dirs": rescanned,
+        "elapsed": time.perf_counter() - t0,
+    }
+
+
+def relink_missing(report: dict) -> int:
+    """
+    Перепривязать записи с недоступным файлом к найденному в дереве файлу с тем же именем
+    (только если совпадение однозначное). Возвращает число исправленных записей.
+    """
+    data_dir = os.path.abspath(db.DATA_DIR)
+    root = _scan_root()
+    by_name: dict[str, list[str]] = {}
+    for o in report.get("orphaned", []):
+        by_name.setdefault(os.path.basename(o["file_path"]).lower(), []).append(o["file_path"])
+    if os.path.isdir(root):
+        index = _open_index(root)
+        try:
+            for (rel,) in index.execute("SELECT rel_path FROM files"):
+                p = os.path.relpath(os.path.join(root, rel), data_dir)
+                lst = by_name.setdefault(os.path.basename(rel).lower(), [])
+                if p not in lst:
+                    lst.append(p)
+        finally:
+            index.close()
+    updates: dict[str, list[tuple]] = {}
+    for ref in report.get("missing", []):
+        cands = by_name.get(os.path.basename(str(ref["file_path"]).replace("\\", os.sep)).lower(), [])
+        if len(cands) == 1:
+            updates.setdefault(ref["table"], []).append((cands[0], ref["id"]))
+    if not updates:
+        return 0
+    con = db.connect()
+    cur = con.cursor()
+    n = 0
+    for table, rows in updates.items():
+        cur.executemany(f"UPDATE {table} SET file_path=? WHERE id=?", rows)
+        n += len(rows)
+    con.commit()
+    con.close()
+    return n
+
+
+def register_orphans(report: dict, comment: str = "Найден при проверке файлов") -> int:
+    """Зарегистрировать «лишние» файлы из папок проектов как загрузки этих проектов. Возвращает число записей."""
+    con = db.connect()
+    cur = con.cursor()
+    cur.execute("SELECT id FROM projects")
+    existing = {r[0] for r in cur.fetchall()}
+    today = datetime.date.today().isoformat()
+    who = db.get_windows_user()
+    rows = [(o["project_id"], o["file_path"], today, comment, who)
+            for o in report.get("orphaned", []) if o.get("project_id") in existing]
+    cur.executemany(
+        "INSERT INTO project_file_uploads (project_id, file_path, date, comment, added_by) VALUES (?,?,?,?,?)", rows
+    )
+    con.commit()
+    con.close()
+    return len(rows)
@@ -0,0 +1,187 @@
+# attachment_transfer.py
+# Копирование вложений в фоновом потоке: по частям, с прогрессом и отменой, с проверкой SHA-256
+# и атомарной записью (временный файл + переименование — см. db.copy_attachment_to_files).
+# Запись в БД делается в on_done задания — только после того, как файл полностью скопирован.
+import os
+import queue
+import threading
+
+from PyQt6 import QtCore, QtWidgets
+
+import db
+
+
+class TransferJob:
+    """Одно задание: что копировать, куда (проект) и что сделать после успешного копирования."""
+    def __init__(self, source_path: str, kind: str, project_id: int, on_done=None):
+        self.source_path = source_path
+        self.kind = kind
+        self.project_id = project_id
+        self.on_done = on_done          # on_done(job) — вызывается в GUI-потоке, когда stored_path готов
+        self.stored_path: str | None = None
+        self.error: str | None = None
+        self.cancelled = False
+        try:
+            self.size = os.path.getsize(source_path)
+        except OSError:
+            self.size = 0
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.source_path)
+
+
+class _TransferThread(QtCore.QThread):
+    def __init__(self, service: "AttachmentTransferService"):
+        super().__init__(service)
+        self._service = service
+
+    def run(self):
+        self._service._drain()
+
+
+class AttachmentTransferService(QtCore.QObject):
+    """
+    Очередь копирования вложений. Задания выполняются по одному в рабочем потоке;
+    сигналы приходят в GUI-поток (Qt ставит их в очередь автоматически).
+    """
+    progress = QtCore.pyqtSignal(object, object, object)   # job, скопировано байт, всего байт
+    job_started = QtCore.pyqtSignal(object)
+    job_finished = QtCore.pyqtSignal(object)                # job (stored_path, error или cancelled)
+    idle = QtCore.pyqtSignal()                              # очередь опустела
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._queue: "queue.Queue[TransferJob]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._running = False
+        self._cancel = threading.Event()
+        self._thread: _TransferThread | None = None
+        self.job_finished.connect(self._dispatch_done)
+
+    def enqueue(self, job: TransferJob):
+        self.enqueue_many([job])
+
+    def enqueue_many(self, jobs: list[TransferJob]):
+        """Поставить задания в очередь одним пакетом (сигнал idle придёт после последнего из них)."""
+        with self._lock:
+            for job in jobs:
+                self._queue.put(job)
+            if self._running:
+                return
+            self._running = True
+            self._cancel.clear()
+        self._thread = _TransferThread(self)
+        self._thread.start()
+
+    def cancel(self):
+        """Отменить текущее копирование и все задания в очереди."""
+        self._cancel.set()
+
+    def is_busy(self) -> bool:
+        with self._lock:
+            return self._running
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Дождаться завершения рабочего потока (например, при закрытии окна после cancel())."""
+        if self._thread is None:
+            return True
+        return self._thread.wait() if msecs < 0 else self._thread.wait(msecs)
+
+    # --- рабочий поток
+    def _drain(self):
+        while True:
+            with self._lock:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    self._running = False
+                    break
+            if self._cancel.is_set():
+                job.cancelled = True
+                self.job_finished.emit(job)
+                continue
+            self.job_started.emit(job)
+            try:
+                job.stored_path = db.copy_attachment_to_files(
+                    job.source_path, job.kind, job.project_id,
+                    progress=lambda done, total, j=job: self.progress.emit(j, done, total),
+                    cancelled=self._cancel.is_set,
+                ) or None
+                if not job.stored_path:
+                    job.error = "Файл не найден или недоступен."
+            except db.CopyCancelled:
+                job.cancelled = True
+            except Exception as e:
+                job.error = str(e) or e.__class__.__name__
+            self.job_finished.emit(job)
+        self.idle.emit()
+
+    # --- GUI-поток
+    def _dispatch_done(self, job: TransferJob):
+        if job.stored_path and not job.cancelled and job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                job.error = str(e) or e.__class__.__name__
+
+
+def _mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f} МБ"
+
+
+def run_with_progress(parent, jobs: list[TransferJob], title: str = "Копирование файлов") -> list[TransferJob]:
+    """
+    Скопировать файлы заданий с окном прогресса (кнопка «Отмена»). Интерфейс не блокируется:
+    копирование идёт в рабочем потоке, здесь крутится цикл событий. Возвращает те же задания с результатом.
+    """
+    if not jobs:
+        return jobs
+    service = AttachmentTransferService(parent)
+    total_bytes = sum(j.size for j in jobs) or 1
+    state = {"done_before": 0, "index": 0}
+
+    dlg = QtWidgets.QProgressDialog("Подготовка…", "Отмена", 0, 1000, parent)
+    dlg.setWindowTitle(title)
+    dlg.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
+    dlg.setMinimumDuration(300)
+    dlg.setAutoClose(False)
+    dlg.setAutoReset(False)
+    dlg.setValue(0)
+
+    def on_started(job):
+        state["index"] += 1
+        dlg.setLabelText(f"Файл {state['index']} из {len(jobs)}: {job.name}")
+
+    def on_progress(job, done, total):
+        dlg.setLabelText(f"Файл {state['index']} из {len(jobs)}: {job.name}\n{_mb(done)} из {_mb(total)}")
+        dlg.setValue(min(1000, int((state["done_before"] + done) * 1000 / total_bytes)))
+
+    def on_finished(job):
+        state["done_before"] += job.size
+
+    loop = QtCore.QEventLoop()
+    service.job_started.connect(on_started)
+    service.progress.connect(on_progress)
+    service.job_finished.connect(on_finished)
+    service.idle.connect(loop.quit)
+    dlg.canceled.connect(service.cancel)
+    service.enqueue_many(jobs)
+    loop.exec()
+    service.wait()
+    dlg.close()
+    service.deleteLater()
+    return jobs
+
+
+def copy_with_progress(parent, source_path: str, kind: str, project_id: int) -> str | None:
+    """
+    Скопировать один файл в папку проекта с окном прогресса.
+    Возвращает путь для БД; None — если пользователь отменил. При ошибке бросает OSError.
+    """
+    job = run_with_progress(parent, [TransferJob(source_path, kind, project_id)])[0]
+    if job.cancelled:
+        return None
+    if job.error:
+        raise OSError(job.error)
+    return job.stored_path
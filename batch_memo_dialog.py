@@ -0,0 +1,172 @@
+# batch_memo_dialog.py
+# Окно «Служебные записки за период»: выбор ревизий по датам / руднику / статье и пакетное формирование записок.
+import os
+
+from PyQt6 import QtCore, QtWidgets
+from PyQt6.QtCore import QDate
+
+import db
+import utils
+import doc_generator
+from theme import apply_dialog_theme
+
+
+class BatchMemoDialog(QtWidgets.QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Служебные записки за период")
+        self.resize(760, 520)
+        apply_dialog_theme(self)
+        self._revisions: list[dict] = []
+
+        today = QDate.currentDate()
+        quarter_start = QDate(today.year(), 3 * ((today.month() - 1) // 3) + 1, 1)
+        self.from_edit = QtWidgets.QDateEdit(quarter_start)
+        self.to_edit = QtWidgets.QDateEdit(today)
+        for e in (self.from_edit, self.to_edit):
+            e.setCalendarPopup(True)
+            e.setDisplayFormat("dd.MM.yyyy")
+
+        self.mine_combo = QtWidgets.QComboBox()
+        self.mine_combo.addItem("Все рудники", None)
+        for mid, name in db.list_mines():
+            self.mine_combo.addItem(name, mid)
+        self.project_combo = QtWidgets.QComboBox()
+        self.project_combo.addItem("Все статьи", None)
+        for row in db.list_projects():
+            self.project_combo.addItem(row[1], row[0])
+
+        self.dest_project_rb = QtWidgets.QRadioButton("В папку статьи-назначения")
+        self.dest_folder_rb = QtWidgets.QRadioButton("В папку:")
+        self.dest_project_rb.setChecked(True)
+        self.folder_edit = QtWidgets.QLineEdit(os.path.abspath(os.path.join(db.FILES_DIR, "memos")))
+        browse_btn = QtWidgets.QPushButton("…")
+        browse_btn.setFixedWidth(32)
+        self.bundle_combo = QtWidgets.QComboBox()
+        self.bundle_combo.addItem("Отдельные файлы", doc_generator.BUNDLE_NONE)
+        self.bundle_combo.addItem("Один архив .zip", doc_generator.BUNDLE_ZIP)
+        self.bundle_combo.addItem("Один документ .docx", doc_generator.BUNDLE_DOCX)
+
+        self.table = QtWidgets.QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Дата", "Источник", "Назначение", "Сумма"])
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.count_lbl = QtWidgets.QLabel("")
+
+        form = QtWidgets.QFormLayout()
+        period = QtWidgets.QHBoxLayout()
+        period.addWidget(self.from_edit)
+        period.addWidget(QtWidgets.QLabel("—"))
+        period.addWidget(self.to_edit)
+        period.addStretch(1)
+        form.addRow("Период:", period)
+        form.addRow("Рудник:", self.mine_combo)
+        form.addRow("Статья:", self.project_combo)
+        folder_row = QtWidgets.QHBoxLayout()
+        folder_row.addWidget(self.dest_folder_rb)
+        folder_row.addWidget(self.folder_edit, 1)
+        folder_row.addWidget(browse_btn)
+        dest = QtWidgets.QVBoxLayout()
+        dest.addWidget(self.dest_project_rb)
+        dest.addLayout(folder_row)
+        form.addRow("Сохранить:", dest)
+        form.addRow("Формат:", self.bundle_combo)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        self.generate_btn = btns.addButton("Сформировать", QtWidgets.QDialogButtonBox.ButtonRole.AcceptRole)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addWidget(self.table, 1)
+        layout.addWidget(self.count_lbl)
+        layout.addWidget(btns)
+
+        for w in (self.from_edit, self.to_edit):
+            w.dateChanged.connect(self._reload)
+        self.mine_combo.currentIndexChanged.connect(self._reload)
+        self.project_combo.currentIndexChanged.connect(self._reload)
+        self.bundle_combo.currentIndexChanged.connect(self._sync_dest)
+        self.dest_folder_rb.toggled.connect(self._sync_dest)
+        browse_btn.clicked.connect(self._browse)
+        btns.accepted.connect(self._generate)
+        btns.rejected.connect(self.reject)
+
+        self._sync_dest()
+        self._reload()
+
+    def _sync_dest(self):
+        # Архив и общий документ — всегда в одну папку
+        bundled = bool(self.bundle_combo.currentData())
+        if bundled:
+            self.dest_folder_rb.setChecked(True)
+        self.dest_project_rb.setEnabled(not bundled)
+        self.folder_edit.setEnabled(self.dest_folder_rb.isChecked())
+
+    def _browse(self):
+        path = QtWidgets.QFileDialog.getExistingDirectory(self, "Папка для записок", self.folder_edit.text())
+        if path:
+            self.folder_edit.setText(path)
+            self.dest_folder_rb.setChecked(True)
+
+    def _reload(self):
+        self._revisions = db.list_revisions_for_period(
+            self.from_edit.date().toString("yyyy-MM-dd"),
+            self.to_edit.date().toString("yyyy-MM-dd"),
+            mine_id=self.mine_combo.currentData(),
+            project_id=self.project_combo.currentData(),
+        )
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(self._revisions))
+        for i, r in enumerate(self._revisions):
+            cells = (r["date"], r["source_name"], r["target_name"], utils.money(r["amount"]))
+            for j, text in enumerate(cells):
+                item = QtWidgets.QTableWidgetItem(str(text))
+                if j == 3:
+                    item.setTextAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(i, j, item)
+        self.table.resizeColumnsToContents()
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setUpdatesEnabled(True)
+        total = sum(float(r["amount"] or 0) for r in self._revisions)
+        self.count_lbl.setText(f"Ревизий: {len(self._revisions)}, на сумму {utils.money(total)}")
+        self.generate_btn.setEnabled(bool(self._revisions))
+
+    def _generate(self):
+        if not self._revisions:
+            return
+        out_dir = self.folder_edit.text().strip() if self.dest_folder_rb.isChecked() else None
+        if self.dest_folder_rb.isChecked() and not out_dir:
+            QtWidgets.QMessageBox.warning(self, "Служебные записки", "Укажите папку для сохранения.")
+            return
+
+        dlg = QtWidgets.QProgressDialog("Формирование записок…", None, 0, len(self._revisions), self)
+        dlg.setWindowTitle("Служебные записки")
+        dlg.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
+        dlg.setMinimumDuration(300)
+
+        def on_progress(done, total):
+            dlg.setValue(done)
+            QtWidgets.QApplication.processEvents()
+
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.CursorShape.WaitCursor)
+        try:
+            paths = doc_generator.generate_revision_memos(
+                self._revisions, out_dir=out_dir, bundle=self.bundle_combo.currentData(), progress=on_progress
+            )
+        except Exception as e:
+            QtWidgets.QApplication.restoreOverrideCursor()
+            dlg.close()
+            QtWidgets.QMessageBox.critical(self, "Служебные записки", f"Не удалось сформировать записки:\n{e}")
+            return
+        QtWidgets.QApplication.restoreOverrideCursor()
+        dlg.close()
+
+        if len(paths) == 1:
+            msg = f"Готово:\n{paths[0]}"
+        else:
+            msg = f"Сформировано записок: {len(paths)}."
+            if out_dir:
+                msg += f"\nПапка: {os.path.abspath(out_dir)}"
+        QtWidgets.QMessageBox.information(self, "Служебные записки", msg)
+        self.accept()
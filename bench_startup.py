@@ -0,0 +1,93 @@
+# bench_startup.py
+# Замер времени запуска до первой отрисовки окна (регрессионный бенчмарк).
+# Запускает app.py несколько раз с --startup-timeline и --quit-after-paint на временной базе
+# и печатает медиану. Код возврата 1 — если медиана больше --max-ms или при старте загружены
+# модули, которые должны загружаться лениво (startup_profile.LAZY_MODULES).
+#
+#   python bench_startup.py [--runs 5] [--projects 300] [--max-ms 1500] [--db путь]
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _make_db(path: str, projects: int):
+    sys.path.insert(0, HERE)
+    import db
+    db.set_db_path(path)
+    db.ensure_data_dirs()
+    db.init_db(db_type="invest")
+    con = db.connect()
+    cur = con.cursor()
+    rnd = random.Random(1)
+    cur.executemany(
+        "INSERT INTO projects(name, budget, comment, created_at) VALUES(?,?,?,?)",
+        [(f"Статья {i}", rnd.randint(1, 500) * 100000.0, "", "2024-01-01") for i in range(projects)],
+    )
+    con.commit()
+    con.close()
+
+
+def _run_once(db_path: str, timeline_path: str) -> tuple[float, str]:
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    subprocess.run(
+        [sys.executable, os.path.join(HERE, "app.py"), f"--db={db_path}",
+         f"--startup-timeline={timeline_path}", "--quit-after-paint"],
+        env=env, check=True, timeout=120,
+    )
+    with open(timeline_path, encoding="utf-8") as f:
+        text = f.read()
+    first_paint = None
+    loaded = ""
+    for line in text.splitlines():
+        if line.rstrip().endswith("первая отрисовка окна"):
+            first_paint = float(line.split()[0])
+        elif line.startswith("Загружены при старте:"):
+            loaded = line.split(":", 1)[1].strip()
+    if first_paint is None:
+        raise RuntimeError("В хронологии нет отметки первой отрисовки:\n" + text)
+    return first_paint, loaded
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Время запуска до первой отрисовки окна")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--projects", type=int, default=300, help="статей во временной базе")
+    ap.add_argument("--db", help="готовая база вместо временной")
+    ap.add_argument("--max-ms", type=float, default=None, help="порог медианы, мс")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        if not args.db:
+            _make_db(db_path, args.projects)
+        timeline_path = os.path.join(tmp, "timeline.txt")
+        times = []
+        loaded = ""
+        for i in range(args.runs):
+            ms, loaded = _run_once(db_path, timeline_path)
+            times.append(ms)
+            print(f"запуск {i + 1}: {ms:.0f} мс")
+        with open(timeline_path, encoding="utf-8") as f:
+            print(f.read())
+
+    median = statistics.median(times)
+    print(f"Медиана до первой отрисовки: {median:.0f} мс (мин {min(times):.0f}, макс {max(times):.0f})")
+    failed = False
+    if loaded and loaded != "—":
+        print(f"ОШИБКА: при старте загружены модули, которые должны грузиться лениво: {loaded}")
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"ОШИБКА: медиана {median:.0f} мс больше порога {args.max_ms:.0f} мс")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# bulk_revision_form.py
+# Пакетная ревизия: из одной статьи в несколько или из нескольких в одну. Суммы вводятся
+# в таблице статей, проверка остатка и запись — одной транзакцией (db.record_revisions_bulk);
+# служебные записки по пакету — по желанию, одним вызовом doc_generator.generate_revision_memos.
+from PyQt6 import QtCore, QtWidgets
+from PyQt6.QtCore import QDate
+from PyQt6.QtGui import QBrush
+
+import db
+import doc_generator
+import utils
+from utils import to_float
+from theme import apply_dialog_theme
+
+PID_ROLE = QtCore.Qt.ItemDataRole.UserRole
+_RIGHT = QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter
+_BAD = QBrush(QtCore.Qt.GlobalColor.red)
+
+
+class BulkRevisionDialog(QtWidgets.QDialog):
+    def __init__(self, parent=None, project_id: int | None = None):
+        super().__init__(parent)
+        self.setWindowTitle("Пакетная ревизия")
+        self.resize(760, 620)
+        apply_dialog_theme(self)
+        self.inserted: list[dict] = []
+        rows, _version = db.list_project_rows()
+        self._rows = sorted(rows, key=lambda r: r[1].casefold())
+        self._have = {r[0]: r[5] for r in rows}
+
+        self.one_to_many_rb = QtWidgets.QRadioButton("Из одной статьи в несколько")
+        self.many_to_one_rb = QtWidgets.QRadioButton("Из нескольких статей в одну")
+        self.one_to_many_rb.setChecked(True)
+        self.one_lbl = QtWidgets.QLabel("Источник:")
+        self.one_combo = QtWidgets.QComboBox()
+        for r in self._rows:
+            self.one_combo.addItem(r[1], r[0])
+        if project_id is not None and self.one_combo.findData(project_id) >= 0:
+            self.one_combo.setCurrentIndex(self.one_combo.findData(project_id))
+        self.available_lbl = QtWidgets.QLabel("")
+
+        self.filter_edit = QtWidgets.QLineEdit()
+        self.filter_edit.setPlaceholderText("Поиск статьи")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.table = QtWidgets.QTableWidget(len(self._rows), 4)
+        self.table.setHorizontalHeaderLabels(["Статья", "Рудник", "Имеется", "Сумма"])
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.AllEditTriggers)
+        for r, row in enumerate(self._rows):
+            name = QtWidgets.QTableWidgetItem(row[1])
+            name.setData(PID_ROLE, row[0])
+            mine = QtWidgets.QTableWidgetItem(row[2] + (f" / {row[3]}" if row[3] else ""))
+            have = QtWidgets.QTableWidgetItem(utils.money(row[5]))
+            have.setTextAlignment(_RIGHT)
+            for it in (name, mine, have):
+                it.setFlags(it.flags() & ~QtCore.Qt.ItemFlag.ItemIsEditable)
+            amount = QtWidgets.QTableWidgetItem("")
+            amount.setTextAlignment(_RIGHT)
+            for c, it in enumerate((name, mine, have, amount)):
+                self.table.setItem(r, c, it)
+        self.table.resizeColumnsToContents()
+        self.table.horizontalHeader().setStretchLastSection(True)
+
+        self.date_edit = QtWidgets.QDateEdit(QDate.currentDate())
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setDisplayFormat("dd.MM.yyyy")
+        self.note_edit = QtWidgets.QLineEdit()
+        self.memo_chk = QtWidgets.QCheckBox("Сформировать служебные записки")
+        self.bundle_combo = QtWidgets.QComboBox()
+        self.bundle_combo.addItem("Отдельные файлы (в папки статей-назначений)", doc_generator.BUNDLE_NONE)
+        self.bundle_combo.addItem("Один архив .zip", doc_generator.BUNDLE_ZIP)
+        self.bundle_combo.addItem("Один документ .docx", doc_generator.BUNDLE_DOCX)
+        self.bundle_combo.setEnabled(False)
+        self.total_lbl = QtWidgets.QLabel("")
+        self.total_lbl.setStyleSheet("padding: 6px; font-weight: bold;")
+
+        mode = QtWidgets.QHBoxLayout()
+        mode.addWidget(self.one_to_many_rb)
+        mode.addWidget(self.many_to_one_rb)
+        mode.addStretch(1)
+        one = QtWidgets.QHBoxLayout()
+        one.addWidget(self.one_lbl)
+        one.addWidget(self.one_combo, 1)
+        one.addWidget(self.available_lbl)
+        form = QtWidgets.QFormLayout()
+        form.addRow("Дата:", self.date_edit)
+        form.addRow("Комментарий:", self.note_edit)
+        memo = QtWidgets.QHBoxLayout()
+        memo.addWidget(self.memo_chk)
+        memo.addWidget(self.bundle_combo, 1)
+        form.addRow("", memo)
+        btns = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Ok | QtWidgets.QDialogButtonBox.StandardButton.Cancel
+        )
+        btns.accepted.connect(self.on_accept)
+        btns.rejected.connect(self.reject)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(mode)
+        layout.addLayout(one)
+        layout.addWidget(self.filter_edit)
+        layout.addWidget(self.table, 1)
+        layout.addWidget(self.total_lbl)
+        layout.addLayout(form)
+        layout.addWidget(btns)
+
+        self.one_to_many_rb.toggled.connect(self._sync)
+        self.one_combo.currentIndexChanged.connect(self._sync)
+        self.filter_edit.textChanged.connect(self._apply_filter)
+        self.table.itemChanged.connect(self._update_total)
+        self.memo_chk.toggled.connect(self.bundle_combo.setEnabled)
+        self._sync()
+
+    def _one_to_many(self) -> bool:
+        return self.one_to_many_rb.isChecked()
+
+    def _sync(self):
+        """Смена режима или статьи «один»: подписи, скрытие этой статьи из таблицы, итог."""
+        self.one_lbl.setText("Источник:" if self._one_to_many() else "Назначение:")
+        self.table.horizontalHeaderItem(0).setText("Назначение" if self._one_to_many() else "Источник")
+        one = self.one_combo.currentData()
+        self.available_lbl.setText(f"Имеется: {utils.money(self._have.get(one, 0.0))}")
+        self._apply_filter()
+        self._update_total()
+
+    def _apply_filter(self):
+        text = self.filter_edit.text().casefold().strip()
+        one = self.one_combo.currentData()
+        for r in range(self.table.rowCount()):
+            pid = self.table.item(r, 0).data(PID_ROLE)
+            has_amount = bool(self.table.item(r, 3).text().strip())
+            match = not text or text in self.table.item(r, 0).text().casefold()
+            self.table.setRowHidden(r, pid == one or not (match or has_amount))
+
+    def _items(self) -> list[tuple[int, float]]:
+        """(статья, сумма) по заполненным строкам, кроме статьи «один»."""
+        one = self.one_combo.currentData()
+        out = []
+        for r in range(self.table.rowCount()):
+            pid = self.table.item(r, 0).data(PID_ROLE)
+            amt = to_float(self.table.item(r, 3).text())
+            if pid != one and amt > 0:
+                out.append((pid, amt))
+        return out
+
+    def _update_total(self, _item=None):
+        items = self._items()
+        total = sum(a for _p, a in items)
+        text = f"Статей: {len(items)} | Итого: {utils.money(total)}"
+        over = []
+        if self._one_to_many():
+            available = self._have.get(self.one_combo.currentData(), 0.0)
+            if total - available > db.REVISION_EPS:
+                text += f" — больше, чем имеется ({utils.money(available)})"
+        else:
+            over = [pid for pid, a in items if a - self._have.get(pid, 0.0) > db.REVISION_EPS]
+            if over:
+                text += f" — у {len(over)} источников не хватает средств"
+        self.total_lbl.setText(text)
+        self.table.blockSignals(True)
+        for r in range(self.table.rowCount()):
+            bad = self.table.item(r, 0).data(PID_ROLE) in over
+            self.table.item(r, 3).setForeground(_BAD if bad else QBrush())
+        self.table.blockSignals(False)
+
+    def on_accept(self):
+        items = self._items()
+        if not items:
+            QtWidgets.QMessageBox.warning(self, "Пакетная ревизия", "Введите суммы хотя бы для одной статьи.")
+            return
+        one = self.one_combo.currentData()
+        if self._one_to_many():
+            pairs = [(one, pid, amt) for pid, amt in items]
+        else:
+            pairs = [(pid, one, amt) for pid, amt in items]
+        date = self.date_edit.date().toString("yyyy-MM-dd")
+        try:
+            self.inserted = db.record_revisions_bulk(pairs, date, self.note_edit.text().strip())
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Пакетная ревизия", str(e))
+            return
+
+        if self.memo_chk.isChecked():
+            QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.CursorShape.WaitCursor)
+            try:
+                paths = doc_generator.generate_revision_memos(self.inserted, bundle=self.bundle_combo.currentData())
+            except Exception as e:
+                QtWidgets.QApplication.restoreOverrideCursor()
+                QtWidgets.QMessageBox.critical(self, "Служебные записки",
+                                               f"Ревизии проведены, но записки сформировать не удалось:\n{e}")
+                self.accept()
+                return
+            QtWidgets.QApplication.restoreOverrideCursor()
+            msg = f"Готово:\n{paths[0]}" if len(paths) == 1 else f"Сформировано записок: {len(paths)}."
+            QtWidgets.QMessageBox.information(self, "Служебные записки", msg)
+        self.accept()
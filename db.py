@@ -1,5 +1,5 @@
 # db.py
-import os, sqlite3, datetime
+import os, sqlite3, datetime, hashlib
 
 DATA_DIR = "data"
 DB_PATH = os.path.join(DATA_DIR, "budget.db")
@@ -34,7 +34,9 @@ _recalc_dirs()
 import shutil
 
 # Версия схемы БД: при открытии старой базы выполняются миграции от текущей версии до SCHEMA_VERSION
-SCHEMA_VERSION = 4
+SCHEMA_VERSION = 8
+# Версия схемы базы «Услуги и работы» (хранится в том же ключе _meta.schema_version)
+SERVICES_SCHEMA_VERSION = 4
 
 # Статус закупки (порядок возрастания). Пустое значение = «—».
 PROCUREMENT_STATUSES = [
@@ -60,6 +62,13 @@ def _procurement_status_index(status: str | None) -> int:
             return i
     return -1
 
+# Ветви WHEN '<статус>' THEN <индекс> строятся один раз — порядок статусов в SQL не может разойтись
+_STATUS_RANK_WHEN = " ".join(f"WHEN '{v.replace(chr(39), chr(39) * 2)}' THEN {i}" for i, v in enumerate(PROCUREMENT_STATUSES))
+
+def _status_rank_sql(expr: str) -> str:
+    """То же, что _procurement_status_index, выражением SQL над expr (наборы фильтров, пакетное повышение статуса)."""
+    return f"(CASE TRIM(COALESCE({expr}, '')) {_STATUS_RANK_WHEN} ELSE -1 END)"
+
 
 def _get_schema_version(cur) -> int:
     cur.execute("SELECT value FROM _meta WHERE key='schema_version'")
@@ -133,8 +142,162 @@ def _migrate_3_to_4(cur):
     """)
 
 
+def _migrate_4_to_5(cur):
+    """Версия 5: индексы для расчёта статусов одним запросом и счётчик изменений data_version."""
+    _create_invest_indexes(cur)
+
+
+def _migrate_5_to_6(cur):
+    """Версия 6: именованные наборы фильтров (filter_presets)."""
+    _create_filter_presets_table(cur)
+
+
+def _create_filter_presets_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS filter_presets(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            expression TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+
+def _migrate_6_to_7(cur):
+    """Версия 7: поисковый индекс project_search (FTS5 trigram) с триггерами (если ещё не создан схемой)."""
+    _create_search_index(cur)
+
+
+def _migrate_7_to_8(cur):
+    """
+    Версия 8: projects.initial_budget — бюджет при создании (budget перезаписывают корректировки;
+    нужен для расчёта «на дату», см. asof.py). Известен только у статей без корректировок.
+    """
+    cur.execute("PRAGMA table_info(projects)")
+    columns = [row[1] for row in cur.fetchall()]
+    if "initial_budget" not in columns:
+        cur.execute("ALTER TABLE projects ADD COLUMN initial_budget REAL")
+    cur.execute("""UPDATE projects SET initial_budget = budget
+                   WHERE initial_budget IS NULL AND id NOT IN (SELECT project_id FROM corrections)""")
+
+
+# -------- Поисковый индекс (быстрый поиск Ctrl+K, см. project_search.py)
+# Латинские буквы, похожие на кириллические, приводятся к кириллице и в индексе, и в запросе:
+# «ПНA» (с латинской A) находится по «ПНА». Регистр FTS5 trigram сворачивает сам, поэтому у каждой
+# заменяемой буквы заменяется и вторая форма (H→Н и h→н): иначе «ALPHA» и «alpha» разошлись бы.
+LOOKALIKES = {
+    "A": "А", "a": "а", "B": "В", "b": "в", "C": "С", "c": "с", "E": "Е", "e": "е", "H": "Н", "h": "н",
+    "K": "К", "k": "к", "M": "М", "m": "м", "O": "О", "o": "о", "P": "Р", "p": "р", "T": "Т", "t": "т",
+    "X": "Х", "x": "х", "Y": "У", "y": "у", "Ё": "Е", "ё": "е",
+}
+
+def normalize_search_text(text: str) -> str:
+    """Текст для поискового индекса: латинские «двойники» → кириллица, ё → е."""
+    return (text or "").translate(str.maketrans(LOOKALIKES))
+
+def _lookalike_sql(expr: str) -> str:
+    """То же, что normalize_search_text, выражением SQL (цепочка replace) — для триггеров."""
+    for lat, cyr in LOOKALIKES.items():
+        expr = f"replace({expr}, '{lat}', '{cyr}')"
+    return expr
+
+# Источники индекса: (таблица, код, вид, id статьи, текст). rowid в индексе = id записи * 8 + код,
+# поэтому триггер удаляет свою строку по rowid, без просмотра индекса. Ревизия попадает в обе статьи.
+SEARCH_SOURCES = (
+    ("projects", 0, "name", "{r}.id", "{r}.name"),
+    ("projects", 1, "comment", "{r}.id", "{r}.comment"),
+    ("contracts", 2, "contract", "{r}.project_id", "COALESCE({r}.contractor, '') || ' ' || COALESCE({r}.note, '')"),
+    ("marketing", 3, "marketing", "{r}.project_id", "{r}.note"),
+    ("corrections", 4, "correction", "{r}.project_id", "{r}.note"),
+    ("revisions", 5, "revision", "{r}.source_project_id", "{r}.note"),
+    ("revisions", 6, "revision", "{r}.target_project_id", "{r}.note"),
+)
+
+def _search_insert_sql(table: str, code: int, kind: str, pid: str, text: str, row: str) -> str:
+    """INSERT в project_search для строки row ('new' в триггере) или для всей таблицы (row='src')."""
+    pid, text = pid.format(r=row), text.format(r=row)
+    source = f" FROM {table} AS src" if row == "src" else ""
+    return (f"INSERT INTO project_search(rowid, project_id, kind, text) "
+            f"SELECT {row}.id * 8 + {code}, {pid}, '{kind}', {_lookalike_sql(text)}{source} "
+            f"WHERE TRIM(COALESCE({text}, '')) <> ''")
+
+def _create_search_index(cur) -> bool:
+    """
+    Виртуальная таблица project_search (FTS5, токенизатор trigram) и триггеры синхронизации. Идемпотентно:
+    таблица заполняется только при создании, дальше её поддерживают триггеры.
+    False — если SQLite собран без FTS5/trigram: тогда project_search ищет по индексу в памяти.
+    """
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='project_search'")
+    if cur.fetchone() is None:
+        try:
+            cur.execute("""
+                CREATE VIRTUAL TABLE project_search
+                USING fts5(project_id UNINDEXED, kind UNINDEXED, text, tokenize='trigram')
+            """)
+        except sqlite3.OperationalError:
+            return False
+        for table, code, kind, pid, text in SEARCH_SOURCES:
+            cur.execute(_search_insert_sql(table, code, kind, pid, text, "src"))
+    for table in dict.fromkeys(t for t, *_ in SEARCH_SOURCES):
+        codes = [src for src in SEARCH_SOURCES if src[0] == table]
+        delete = " ".join(f"DELETE FROM project_search WHERE rowid = old.id * 8 + {c[1]};" for c in codes)
+        insert = " ".join(_search_insert_sql(*c, "new") + ";" for c in codes)
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_search_{table}_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_search_{table}_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END")
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_search_{table}_delete AFTER DELETE ON {table} BEGIN {delete} END")
+    return True
+
+def list_search_documents() -> list[tuple]:
+    """Все тексты источников поиска одним запросом: [(id статьи, вид, текст)] — для индекса в памяти."""
+    parts = [f"SELECT {pid.format(r='src')}, '{kind}', {text.format(r='src')} FROM {table} AS src"
+             for table, _code, kind, pid, text in SEARCH_SOURCES]
+    con = connect()
+    cur = con.cursor()
+    cur.execute(" UNION ALL ".join(parts))
+    rows = [(r[0], r[1], r[2]) for r in cur.fetchall() if r[2] and str(r[2]).strip()]
+    con.close()
+    return rows
+
+def has_search_index() -> bool:
+    """Есть ли в текущей базе таблица project_search."""
+    con = connect()
+    cur = con.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='project_search'")
+    ok = cur.fetchone() is not None
+    con.close()
+    return ok
+
+
+# Таблицы, от которых зависит главная таблица: любое изменение в них увеличивает _meta.data_version
+DATA_VERSION_TABLES = ("projects", "corrections", "marketing", "contracts", "revisions", "mines", "sections")
+# То же для базы «Услуги и работы» (кэш прогноза service_forecast)
+SERVICES_DATA_VERSION_TABLES = ("service_contracts", "service_acts")
+
+
+def _create_invest_indexes(cur):
+    """Индексы (последний маркетинг/договор, суммы ревизий) и триггеры data_version. Идемпотентно."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_marketing_project_date ON marketing(project_id, date, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_contracts_project_date ON contracts(project_id, date, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_revisions_source ON revisions(source_project_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_revisions_target ON revisions(target_project_id)")
+    _create_data_version_triggers(cur, DATA_VERSION_TABLES)
+
+
+def _create_data_version_triggers(cur, tables):
+    """Триггеры: любое изменение в tables увеличивает _meta.data_version. Идемпотентно."""
+    cur.execute("INSERT OR IGNORE INTO _meta (key, value) VALUES ('data_version', '0')")
+    for table in tables:
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_dv_{table}_{op.lower()} AFTER {op} ON {table}
+                BEGIN
+                    UPDATE _meta SET value = CAST(value AS INTEGER) + 1 WHERE key='data_version';
+                END""")
+
+
 # Список миграций: индекс i — переход с версии i на i+1
-_MIGRATIONS = [_migrate_0_to_1, _migrate_1_to_2, _migrate_2_to_3, _migrate_3_to_4]
+_MIGRATIONS = [_migrate_0_to_1, _migrate_1_to_2, _migrate_2_to_3, _migrate_3_to_4, _migrate_4_to_5,
+               _migrate_5_to_6, _migrate_6_to_7, _migrate_7_to_8]
 
 
 def _run_migrations(con):
@@ -157,7 +320,7 @@ def save_db_as(new_path: str):
     shutil.copy2(src, dst)
     set_db_path(dst)        # переключаемся на новый файл
     ensure_data_dirs()
-    init_db()               # убеждаемся, что структура есть
+    open_db()               # убеждаемся, что структура есть
     return dst
 
 
@@ -177,23 +340,70 @@ def _safe_foldername(name: str) -> str:
         s = s.replace(c, "_")
     return s.strip() or "project"
 
+# Кэш папок проектов: (путь к БД, id, название) → абсолютный путь. Название входит в ключ: после
+# переименования (в том числе в другом экземпляре программы) старая запись просто не находится.
+# Название читается лёгким запросом по id, папка создаётся только при записи файла.
+_project_dir_cache: dict[tuple[str, int, str], str] = {}
+
+def _project_dir_key(project_id: int, name: str) -> tuple[str, int, str]:
+    return (os.path.abspath(DB_PATH), int(project_id), name)
+
+def _project_dir_path(project_id: int, name: str | None) -> str:
+    folder_name = f"{project_id}_{_safe_foldername(name if name is not None else str(project_id))}"
+    return os.path.abspath(os.path.join(FILES_DIR, get_db_basename(), folder_name))
+
+def _project_names(project_ids) -> dict[int, str]:
+    """Названия статей по id одним запросом на 500 id."""
+    ids = list(project_ids)
+    names = {}
+    con = connect()
+    cur = con.cursor()
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        cur.execute(f"SELECT id, name FROM projects WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        names.update(cur.fetchall())
+    con.close()
+    return names
+
+def _cached_project_dir(project_id: int, name: str | None) -> str:
+    if name is None:
+        return _project_dir_path(project_id, None)  # статьи нет — не кэшируем
+    key = _project_dir_key(project_id, name)
+    path = _project_dir_cache.get(key)
+    if path is None:
+        invalidate_project_dir_cache(project_id)  # запись со старым названием больше не нужна
+        path = _project_dir_cache[key] = _project_dir_path(project_id, name)
+    return path
+
+def invalidate_project_dir_cache(project_id: int | None = None):
+    """Сбросить кэш папки статьи (или весь кэш, если project_id не задан)."""
+    if project_id is None:
+        _project_dir_cache.clear()
+    else:
+        db_key = os.path.abspath(DB_PATH)
+        for key in [k for k in _project_dir_cache if k[0] == db_key and k[1] == int(project_id)]:
+            del _project_dir_cache[key]
+
 def get_project_folder_name(project_id: int) -> str:
     """Имя папки проекта: id_Название (уникально и читаемо)."""
-    proj = get_project(project_id)
-    name = proj[1] if proj else str(project_id)
-    return f"{project_id}_{_safe_foldername(name)}"
+    return os.path.basename(get_project_files_dir(project_id))
 
-def get_project_files_dir(project_id: int) -> str:
+def get_project_files_dir(project_id: int, create: bool = False) -> str:
     """
-    Путь к папке файлов проекта: Files/{имя_базы}/{id_НазваниеПроекта}/.
-    Папка создаётся при первом обращении. Возвращает абсолютный путь.
+    Путь к папке файлов проекта: Files/{имя_базы}/{id_НазваниеПроекта}/. Возвращает абсолютный путь.
+    Папка создаётся только при create=True — когда в неё действительно пишется файл.
     """
-    ensure_data_dirs()
-    base = get_db_basename()
-    folder_name = get_project_folder_name(project_id)
-    path = os.path.join(FILES_DIR, base, folder_name)
-    os.makedirs(path, exist_ok=True)
-    return os.path.abspath(path)
+    path = _cached_project_dir(project_id, _project_names([int(project_id)]).get(int(project_id)))
+    if create:
+        ensure_data_dirs()
+        os.makedirs(path, exist_ok=True)
+    return path
+
+def get_project_files_dirs(project_ids) -> dict[int, str]:
+    """Папки файлов нескольких статей одним запросом (для экспорта и проверки файлов). Папки не создаются."""
+    ids = {int(i) for i in project_ids}
+    names = _project_names(ids) if ids else {}
+    return {pid: _cached_project_dir(pid, names.get(pid)) for pid in ids}
 
 def get_windows_user() -> str:
     """Имя учётной записи Windows (кто внёс изменения)."""
@@ -202,24 +412,269 @@ def get_windows_user() -> str:
     except Exception:
         return ""
 
-def copy_attachment_to_files(source_path: str, kind: str, project_id: int) -> str:
+def copy_attachment_to_files(source_path: str, kind: str, project_id: int, progress=None, cancelled=None) -> str:
     """
     Копирует файл в папку проекта Files/{имя_базы}/{id_Название}/. Возвращает путь относительно DATA_DIR.
     kind по-прежнему передаётся для совместимости вызовов, структура папок от него не зависит.
+    Если в базе включено хранение по содержимому — файл кладётся в общее хранилище (см. store_attachment).
+    Копирование по частям через временный файл с проверкой SHA-256; progress(скопировано, всего) и
+    cancelled() -> bool — необязательные обратные вызовы (см. attachment_transfer).
     """
     if not source_path or not os.path.isfile(source_path):
         return ""
-    folder = get_project_files_dir(project_id)
+    if get_attachment_dedup():
+        return store_attachment(source_path, project_id, progress, cancelled)
+    folder = get_project_files_dir(project_id, create=True)
     base = os.path.basename(source_path)
     base = "".join(c for c in base if c.isalnum() or c in "._- ()") or "file"
     stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     name = f"{project_id}_{stamp}_{base}"
     dst = os.path.join(folder, name)
+    tmp = dst + ".part"
     try:
-        shutil.copy2(source_path, dst)
-        return os.path.relpath(dst, DATA_DIR)
-    except Exception:
+        digest = _copy_with_hash(source_path, tmp, progress, cancelled)
+        _verify_sha256(tmp, digest)
+        os.replace(tmp, dst)
+    except BaseException:
+        _remove_quietly(tmp)
         raise
+    return os.path.relpath(dst, DATA_DIR)
+
+# -------- Хранилище вложений по содержимому (Files/{имя_базы}/_store/ab/abcdef….ext)
+ATTACHMENT_STORE_DIRNAME = "_store"
+_COPY_CHUNK = 1024 * 1024
+
+# Таблицы, в которых хранятся ссылки на файлы (file_path относительно DATA_DIR)
+ATTACHMENT_TABLES = ("marketing", "contracts", "project_file_uploads")
+
+def get_attachment_dedup() -> bool:
+    """Включено ли для текущей базы хранение одинаковых файлов в одном экземпляре."""
+    con = connect()
+    cur = con.cursor()
+    try:
+        cur.execute("SELECT value FROM _meta WHERE key='attachment_dedup'")
+        row = cur.fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    con.close()
+    return bool(row) and str(row[0]).strip() == "1"
+
+def set_attachment_dedup(enabled: bool):
+    """Включить/выключить хранение по содержимому. Уже сохранённые файлы не переносятся."""
+    con = connect()
+    cur = con.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value TEXT)")
+    cur.execute("DELETE FROM _meta WHERE key='attachment_dedup'")
+    cur.execute("INSERT INTO _meta (key, value) VALUES ('attachment_dedup', ?)", ("1" if enabled else "0",))
+    con.commit()
+    con.close()
+
+def get_attachment_store_dir() -> str:
+    """Абсолютный путь к хранилищу по содержимому текущей базы (папка не создаётся)."""
+    return os.path.abspath(os.path.join(FILES_DIR, get_db_basename(), ATTACHMENT_STORE_DIRNAME))
+
+def is_in_attachment_store(path: str) -> bool:
+    """Лежит ли файл (абсолютный путь) внутри хранилища по содержимому."""
+    store = get_attachment_store_dir()
+    return os.path.normcase(os.path.abspath(path)).startswith(os.path.normcase(store) + os.sep)
+
+class CopyCancelled(Exception):
+    """Копирование вложения отменено пользователем (временный файл уже удалён)."""
+
+
+def _copy_with_hash(source_path: str, dst_path: str, progress=None, cancelled=None) -> str:
+    """Потоковое копирование с подсчётом SHA-256 по ходу чтения. Возвращает hex-хэш содержимого."""
+    h = hashlib.sha256()
+    total = os.path.getsize(source_path)
+    done = 0
+    with open(source_path, "rb") as src, open(dst_path, "wb") as dst:
+        while True:
+            if cancelled is not None and cancelled():
+                raise CopyCancelled()
+            chunk = src.read(_COPY_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+            dst.write(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+        dst.flush()
+        os.fsync(dst.fileno())
+    shutil.copystat(source_path, dst_path)
+    return h.hexdigest()
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_COPY_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _verify_sha256(path: str, expected: str):
+    """Перечитать записанный файл и сверить хэш с посчитанным при чтении источника."""
+    if _file_sha256(path) != expected:
+        raise OSError(f"Контрольная сумма скопированного файла не совпадает: {os.path.basename(path)}")
+
+def _remove_quietly(path: str):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+def _attachment_ext(name: str) -> str:
+    ext = os.path.splitext(name)[1].lower()
+    return ext if ext and all(c.isalnum() or c == "." for c in ext) else ""
+
+def _commit_blob(tmp_path: str, digest: str, ext: str) -> str:
+    """Переместить временный файл в хранилище под именем хэша (если такой уже есть — временный удаляется)."""
+    blob_dir = os.path.join(get_attachment_store_dir(), digest[:2])
+    blob = os.path.join(blob_dir, digest + ext)
+    if os.path.isfile(blob):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(blob_dir, exist_ok=True)
+        os.replace(tmp_path, blob)
+    return blob
+
+def store_attachment(source_path: str, project_id: int, progress=None, cancelled=None) -> str:
+    """
+    Кладёт файл в хранилище по содержимому: один экземпляр на одинаковое содержимое.
+    В папке проекта создаётся жёсткая ссылка с исходным именем (если ФС позволяет).
+    Возвращает путь относительно DATA_DIR — его и пишем в file_path.
+    """
+    store = get_attachment_store_dir()
+    os.makedirs(store, exist_ok=True)
+    tmp = os.path.join(store, f".tmp_{os.getpid()}_{datetime.datetime.now().strftime('%H%M%S%f')}")
+    try:
+        digest = _copy_with_hash(source_path, tmp, progress, cancelled)
+        _verify_sha256(tmp, digest)
+        blob = _commit_blob(tmp, digest, _attachment_ext(source_path))
+    except BaseException:
+        _remove_quietly(tmp)
+        raise
+    _link_into_project_dir(blob, project_id, os.path.basename(source_path))
+    return os.path.relpath(blob, DATA_DIR)
+
+def _link_into_project_dir(blob_path: str, project_id: int, display_name: str) -> str | None:
+    """Жёсткая ссылка на файл хранилища в папке проекта. None — если ФС не поддерживает ссылки."""
+    folder = get_project_files_dir(project_id, create=True)
+    base = "".join(c for c in display_name if c.isalnum() or c in "._- ()") or "file"
+    stem, ext = os.path.splitext(base)
+    h8 = os.path.splitext(os.path.basename(blob_path))[0][:8]
+    # Имя занято другим файлом — пробуем «имя (хэш)», затем «имя (хэш_2)» и т.д.
+    names = [base, f"{stem} ({h8}){ext}"] + [f"{stem} ({h8}_{i}){ext}" for i in range(2, 100)]
+    for name in names:
+        dst = os.path.join(folder, name)
+        if not os.path.exists(dst):
+            break
+        try:
+            if os.path.samefile(dst, blob_path):
+                return dst
+        except OSError:
+            pass
+    else:
+        return None
+    try:
+        os.link(blob_path, dst)
+        return dst
+    except (OSError, NotImplementedError):
+        return None
+
+def materialize_project_views(project_id: int) -> int:
+    """
+    Создать недостающие ссылки в папке проекта на файлы хранилища, на которые ссылается проект
+    (имя ссылки: Тип_дата_хэш.ext). Вызывается при открытии папки проекта. Возвращает число новых ссылок.
+    """
+    labels = {"marketing": "Маркетинг", "contracts": "Договор", "project_file_uploads": "Файл"}
+    con = connect()
+    cur = con.cursor()
+    refs = []
+    for table in ATTACHMENT_TABLES:
+        cur.execute(f"SELECT file_path, date FROM {table} WHERE project_id=? AND file_path IS NOT NULL AND file_path<>''",
+                    (project_id,))
+        refs.extend((r[0], labels[table], r[1] or "") for r in cur.fetchall())
+    con.close()
+    folder = get_project_files_dir(project_id)
+    present = set()
+    try:
+        for e in os.scandir(folder):
+            if e.is_file():
+                st = e.stat()
+                present.add((st.st_dev, st.st_ino))
+    except OSError:
+        pass
+    n = 0
+    for stored, label, date in refs:
+        full = resolve_file_path(stored)
+        if not full or not is_in_attachment_store(full):
+            continue
+        st = os.stat(full)
+        if (st.st_dev, st.st_ino) in present:
+            continue
+        digest, ext = os.path.splitext(os.path.basename(full))
+        if _link_into_project_dir(full, project_id, f"{label}_{date}_{digest[:8]}{ext}"):
+            present.add((st.st_dev, st.st_ino))
+            n += 1
+    return n
+
+def attachment_ref_count(stored_path: str, cur=None, project_id: int | None = None) -> int:
+    """Сколько записей (маркетинг, договоры, загрузки) ссылаются на файл stored_path (project_id — только этой статьи)."""
+    own = cur is None
+    if own:
+        con = connect()
+        cur = con.cursor()
+    total = 0
+    for table in ATTACHMENT_TABLES:
+        if project_id is None:
+            cur.execute(f"SELECT COUNT(*) FROM {table} WHERE file_path=?", (stored_path,))
+        else:
+            cur.execute(f"SELECT COUNT(*) FROM {table} WHERE file_path=? AND project_id=?", (stored_path, project_id))
+        total += cur.fetchone()[0]
+    if own:
+        con.close()
+    return total
+
+def _remove_views_in(folder: str, blob_path: str) -> int:
+    """Удалить из папки жёсткие ссылки на файл хранилища. Возвращает число удалённых."""
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return 0
+    n = 0
+    for e in entries:
+        try:
+            if e.is_file() and os.path.samefile(e.path, blob_path):
+                os.remove(e.path)
+                n += 1
+        except OSError:
+            pass
+    return n
+
+def _remove_project_views(blob_path: str, project_id: int):
+    """Удалить из папки проекта жёсткие ссылки на файл хранилища."""
+    _remove_views_in(get_project_files_dir(project_id), blob_path)
+
+def _remove_all_views(blob_path: str):
+    """
+    Удалить ссылки на файл хранилища из папок всех проектов базы — иначе после удаления самого
+    файла место на диске не освобождается. Обход прекращается, когда удалены все ссылки (st_nlink).
+    """
+    try:
+        left = os.stat(blob_path).st_nlink - 1
+    except OSError:
+        return
+    root = os.path.abspath(os.path.join(FILES_DIR, get_db_basename()))
+    try:
+        folders = [e.path for e in os.scandir(root)
+                   if e.is_dir(follow_symlinks=False) and e.name != ATTACHMENT_STORE_DIRNAME]
+    except OSError:
+        return
+    for folder in folders:
+        if left <= 0:
+            break
+        left -= _remove_views_in(folder, blob_path)
 
 def resolve_file_path(stored_path: str | None) -> str | None:
     """Преобразует путь из БД (относительный или абсолютный) в абсолютный для открытия. Возвращает None если файл недоступен."""
@@ -253,22 +708,85 @@ def _ensure_meta(cur):
     if cur.fetchone() is None:
         cur.execute("INSERT INTO _meta (key, value) VALUES ('db_type', 'invest')")
 
+# -------- Быстрое открытие: состояние базы читается одним запросом и кэшируется по (путь, mtime, размер)
+_open_cache: dict[str, tuple[int, int, str]] = {}
+
+def _file_stamp(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _cached_db_type() -> str | None:
+    path = os.path.abspath(DB_PATH)
+    cached = _open_cache.get(path)
+    if cached is None:
+        return None
+    if _file_stamp(path) != cached[:2]:
+        _open_cache.pop(path, None)
+        return None
+    return cached[2]
+
+def _remember_db_state(db_type: str):
+    path = os.path.abspath(DB_PATH)
+    stamp = _file_stamp(path)
+    if stamp is not None:
+        _open_cache[path] = (stamp[0], stamp[1], db_type)
+
+def _read_db_state(cur) -> tuple[str | None, int, bool]:
+    """(db_type из _meta, версия схемы, есть ли таблица service_contracts) — одним запросом."""
+    try:
+        cur.execute("""
+            SELECT (SELECT value FROM _meta WHERE key='db_type'),
+                   (SELECT value FROM _meta WHERE key='schema_version'),
+                   EXISTS(SELECT 1 FROM sqlite_master WHERE type='table' AND name='service_contracts')
+        """)
+    except sqlite3.OperationalError:
+        return None, 0, False  # нет _meta — новая или очень старая база
+    stored, version, has_services = cur.fetchone()
+    try:
+        version = int(str(version).strip())
+    except (ValueError, TypeError):
+        version = 0
+    return ((stored or "").strip() or None), version, bool(has_services)
+
+def _effective_db_type(stored: str | None, has_services: bool) -> str:
+    # Если в _meta указано 'services', но таблицы услуг нет — это старая база товаров
+    if stored == "services" and has_services:
+        return "services"
+    return "invest"
+
+def open_db() -> str:
+    """
+    Открыть текущую базу (DB_PATH) и вернуть её тип ('invest' / 'services').
+    Если схема уже актуальна — одно чтение без DDL; если файл не менялся с прошлой проверки — без обращения к БД.
+    Иначе — полная инициализация и миграции (init_db).
+    """
+    cached = _cached_db_type()
+    if cached is not None:
+        return cached
+    con = connect()
+    cur = con.cursor()
+    stored, version, has_services = _read_db_state(cur)
+    con.close()
+    db_type = _effective_db_type(stored, has_services)
+    current = SERVICES_SCHEMA_VERSION if db_type == "services" else SCHEMA_VERSION
+    if stored != db_type or version < current:
+        init_db()
+    _remember_db_state(db_type)
+    return db_type
+
 def get_db_type() -> str:
     """Тип базы: 'invest' (инвест-проекты/товары) или 'services' (услуги и работы)."""
+    cached = _cached_db_type()
+    if cached is not None:
+        return cached
     con = connect()
     cur = con.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value TEXT)")
-    cur.execute("SELECT value FROM _meta WHERE key='db_type'")
-    row = cur.fetchone()
-    stored = (row[0] if row else "invest").strip() or "invest"
-    # Если в _meta указано 'services', но таблицы услуг нет — это старая база товаров
-    if stored == "services":
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='service_contracts'")
-        if cur.fetchone() is None:
-            con.close()
-            return "invest"
+    stored, _version, has_services = _read_db_state(cur)
     con.close()
-    return stored
+    return _effective_db_type(stored, has_services)
 
 def set_db_type_meta(value: str):
     """Записать в _meta тип базы ('invest' или 'services'). Нужно для исправления старых БД."""
@@ -279,6 +797,7 @@ def set_db_type_meta(value: str):
     cur.execute("INSERT INTO _meta (key, value) VALUES ('db_type', ?)", (value.strip(),))
     con.commit()
     con.close()
+    _open_cache.pop(os.path.abspath(DB_PATH), None)
 
 def init_db(db_type: str | None = None):
     """
@@ -297,9 +816,9 @@ def init_db(db_type: str | None = None):
         # Создание новой базы с заданным типом
         cur.execute("DELETE FROM _meta WHERE key='db_type'")
         cur.execute("INSERT INTO _meta (key, value) VALUES ('db_type', ?)", (db_type,))
-        if db_type == "invest":
-            cur.execute("DELETE FROM _meta WHERE key='schema_version'")
-            cur.execute("INSERT INTO _meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        cur.execute("DELETE FROM _meta WHERE key='schema_version'")
+        cur.execute("INSERT INTO _meta (key, value) VALUES ('schema_version', ?)",
+                    (str(SCHEMA_VERSION if db_type == "invest" else SERVICES_SCHEMA_VERSION),))
         con.commit()
         if db_type == "invest":
             _create_mines_sections_schema(cur)
@@ -311,6 +830,7 @@ def init_db(db_type: str | None = None):
             _create_services_schema(cur)
         con.commit()
         con.close()
+        _remember_db_state(db_type)
         return
 
     # Открытие существующей — миграция схемы до текущей версии
@@ -331,8 +851,10 @@ def init_db(db_type: str | None = None):
         _create_mines_sections_schema(cur)
         _seed_mines(cur)
         _create_services_schema(cur)
+        _set_schema_version(cur, SERVICES_SCHEMA_VERSION)
     con.commit()
     con.close()
+    _remember_db_state(existing_type)
 
 def _create_mines_sections_schema(cur):
     cur.execute("""
@@ -366,6 +888,7 @@ def _create_invest_schema(cur):
         mine_id INTEGER,
         section_id INTEGER,
         procurement_status TEXT,
+        initial_budget REAL,
         FOREIGN KEY(mine_id) REFERENCES mines(id),
         FOREIGN KEY(section_id) REFERENCES sections(id)
     )""")
@@ -424,6 +947,12 @@ def _create_invest_schema(cur):
         added_by TEXT DEFAULT '',
         FOREIGN KEY(project_id) REFERENCES projects(id)
     )""")
+    _create_invest_indexes(cur)
+    _create_filter_presets_table(cur)
+    _create_search_index(cur)
+
+# Месяц акта ГГГГ-ММ: по началу периода, без него — по дате акта
+SERVICE_ACT_MONTH_SQL = "substr(COALESCE(NULLIF(period_start, ''), act_date), 1, 7)"
 
 def _create_services_schema(cur):
     cur.execute("""
@@ -452,6 +981,11 @@ def _create_services_schema(cur):
         note TEXT,
         FOREIGN KEY(contract_id) REFERENCES service_contracts(id)
     )""")
+    # Суммы актов по договору (таблица договоров, карточка) — по индексу, без просмотра всех актов
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_service_acts_contract ON service_acts(contract_id, act_date, id)")
+    # Месяц акта (свод по месяцам, расшифровка ячейки) — индекс по тому же выражению, что в запросах
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_service_acts_month ON service_acts({SERVICE_ACT_MONTH_SQL})")
+    _create_data_version_triggers(cur, SERVICES_DATA_VERSION_TABLES)
 
 def seed_if_empty():
     con = connect()
@@ -465,7 +999,8 @@ def seed_if_empty():
             ("ПНA МРПН", 15_000_000, "Исходный бюджет", now),
             ("Hilux для ГТП", 25_000_000, "Исходный бюджет", now),
         ]
-        cur.executemany("INSERT INTO projects(name, budget, comment, created_at) VALUES(?,?,?,?)", demo)
+        cur.executemany("INSERT INTO projects(name, budget, comment, created_at, initial_budget) VALUES(?,?,?,?,?)",
+                        [d + (d[1],) for d in demo])
         con.commit()
     con.close()
 
@@ -583,6 +1118,18 @@ def list_projects():
         result.append((r[0], r[1], r[2], r[3], r[4], 1 if ob else 0, mid, sid, pstatus))
     return result
 
+def get_project_names(project_ids) -> dict[int, str]:
+    """{id: название} для нескольких статей одним запросом."""
+    ids = [int(i) for i in project_ids]
+    if not ids:
+        return {}
+    con = connect()
+    cur = con.cursor()
+    cur.execute(f"SELECT id, name FROM projects WHERE id IN ({','.join('?' * len(ids))})", ids)
+    names = {r[0]: r[1] for r in cur.fetchall()}
+    con.close()
+    return names
+
 def get_project(project_id: int):
     con = connect()
     cur = con.cursor()
@@ -592,6 +1139,9 @@ def get_project(project_id: int):
     con.close()
     if not r:
         return None
+    return _project_tuple(r)
+
+def _project_tuple(r) -> tuple:
     ob = r[5] if len(r) > 5 else 0
     pstatus = (r[8].strip() if len(r) > 8 and r[8] else None) or None
     return (r[0], r[1], r[2], r[3], r[4], 1 if ob else 0, r[6] if len(r) > 6 else None, r[7] if len(r) > 7 else None, pstatus)
@@ -599,9 +1149,10 @@ def get_project(project_id: int):
 def create_project(name: str, budget: float, comment: str | None, out_of_budget: bool = False, mine_id: int | None = None, section_id: int | None = None):
     con = connect()
     cur = con.cursor()
-    cur.execute("""INSERT INTO projects(name, budget, comment, created_at, out_of_budget, mine_id, section_id)
-                   VALUES(?,?,?,?,?,?,?)""",
-                (name, float(budget or 0), comment or "", datetime.date.today().isoformat(), 1 if out_of_budget else 0, mine_id, section_id))
+    cur.execute("""INSERT INTO projects(name, budget, comment, created_at, out_of_budget, mine_id, section_id, initial_budget)
+                   VALUES(?,?,?,?,?,?,?,?)""",
+                (name, float(budget or 0), comment or "", datetime.date.today().isoformat(), 1 if out_of_budget else 0, mine_id, section_id,
+                 float(budget or 0)))
     con.commit()
     con.close()
 
@@ -628,6 +1179,62 @@ def update_project_procurement_status(project_id: int, status: str | None):
     con.commit()
     con.close()
 
+# Поля, которые можно менять сразу у набора статей (update_projects_bulk)
+BULK_PROJECT_FIELDS = ("mine_id", "section_id", "out_of_budget", "procurement_status")
+_BULK_CHUNK = 900   # не больше параметров в одном запросе, чем допускают старые сборки SQLite
+
+def update_projects_bulk(project_ids, values: dict) -> int:
+    """
+    Установить поля values ({поле: значение}, поля — BULK_PROJECT_FIELDS) у статей project_ids
+    одним UPDATE … WHERE id IN (…) (по частям) в одной транзакции. Возвращает число изменённых строк.
+    Участок должен относиться к руднику: section_id другого рудника — ValueError; section_id без
+    mine_id задаёт и рудник участка; mine_id без section_id сбрасывает участки других рудников.
+    """
+    unknown = [k for k in values if k not in BULK_PROJECT_FIELDS]
+    if unknown:
+        raise ValueError(f"Недопустимое поле: {unknown[0]}")
+    ids = sorted({int(i) for i in project_ids})
+    if not ids or not values:
+        return 0
+    vals = dict(values)
+    if "out_of_budget" in vals:
+        vals["out_of_budget"] = 1 if vals["out_of_budget"] else 0
+    if "procurement_status" in vals:
+        st = vals["procurement_status"]
+        vals["procurement_status"] = st.strip() if st and str(st).strip() else None
+    con = connect()
+    try:
+        cur = con.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        extra, extra_args = "", []
+        if vals.get("section_id") is not None:
+            cur.execute("SELECT mine_id FROM sections WHERE id=?", (vals["section_id"],))
+            r = cur.fetchone()
+            if r is None:
+                raise ValueError(f"Участок не найден (id={vals['section_id']}).")
+            if "mine_id" not in vals:
+                vals["mine_id"] = r[0]
+            elif vals["mine_id"] != r[0]:
+                raise ValueError("Участок относится к другому руднику.")
+        elif "mine_id" in vals and "section_id" not in vals:
+            extra = ", section_id = CASE WHEN section_id IN (SELECT id FROM sections WHERE mine_id=?) THEN section_id END"
+            extra_args = [vals["mine_id"]]
+        cols = list(vals)
+        assign = ", ".join(f"{c}=?" for c in cols) + extra
+        changed = 0
+        for i in range(0, len(ids), _BULK_CHUNK):
+            part = ids[i:i + _BULK_CHUNK]
+            cur.execute(f"UPDATE projects SET {assign} WHERE id IN ({','.join('?' * len(part))})",
+                        [vals[c] for c in cols] + extra_args + part)
+            changed += cur.rowcount
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+    return changed
+
 def _ensure_procurement_status_at_least(project_id: int, cur, min_status: str):
     """Если текущий статус проекта ниже min_status — установить min_status. cur — курсор в уже открытом соединении."""
     cur.execute("SELECT procurement_status FROM projects WHERE id=?", (project_id,))
@@ -642,16 +1249,30 @@ def _ensure_procurement_status_at_least(project_id: int, cur, min_status: str):
     if idx_current < idx_min:
         cur.execute("UPDATE projects SET procurement_status=? WHERE id=?", (min_status, project_id))
 
+def _ensure_procurement_status_at_least_bulk(cur, project_ids, min_status: str):
+    """То же, что _ensure_procurement_status_at_least, для набора статей — одним UPDATE."""
+    ids = sorted({int(i) for i in project_ids})
+    idx_min = _procurement_status_index(min_status)
+    if not ids or idx_min < 0:
+        return
+    cur.execute(f"""UPDATE projects SET procurement_status=?
+                    WHERE id IN ({','.join('?' * len(ids))})
+                      AND {_status_rank_sql("procurement_status")} < ?""",
+                [min_status, *ids, idx_min])
+
 # -------- Corrections
 def record_correction(project_id: int, new_budget: float, date: str, note: str | None, added_by: str | None = None):
     con = connect()
     cur = con.cursor()
     who = (added_by or get_windows_user()) or ""
+    _insert_correction(cur, project_id, new_budget, date, note, who)
+    con.commit()
+    con.close()
+
+def _insert_correction(cur, project_id: int, new_budget: float, date: str, note: str | None, who: str):
     cur.execute("INSERT INTO corrections(project_id, new_budget, date, note, added_by) VALUES(?,?,?,?,?)",
                 (project_id, float(new_budget), date, note or "", who))
     cur.execute("UPDATE projects SET budget=? WHERE id=?", (float(new_budget), project_id))
-    con.commit()
-    con.close()
 
 def get_correction(corr_id: int):
     con = connect()
@@ -736,11 +1357,15 @@ def record_contract(project_id: int, amount: float, date: str, contractor: str |
     con = connect()
     cur = con.cursor()
     who = (added_by or get_windows_user()) or ""
+    _insert_contract(cur, project_id, amount, date, contractor, file_path, note, who)
+    con.commit()
+    con.close()
+
+def _insert_contract(cur, project_id: int, amount: float, date: str, contractor: str | None, file_path: str | None,
+                     note: str | None, who: str):
     cur.execute("INSERT INTO contracts(project_id, amount, date, contractor, file_path, note, added_by) VALUES(?,?,?,?,?,?,?)",
                 (project_id, float(amount), date, contractor, file_path, note or "", who))
     _ensure_procurement_status_at_least(project_id, cur, "заключен договор")
-    con.commit()
-    con.close()
 
 def get_contract(cnt_id: int):
     con = connect()
@@ -778,46 +1403,157 @@ def delete_contract(cnt_id: int):
     con.close()
 
 # -------- Revisions
-def record_revision(source_project_id: int, target_project_id: int, amount: float, date: str, note: str | None, added_by: str | None = None):
+REVISION_EPS = 1e-6
+
+def check_revision(source_project_id: int, target_project_id: int, amount: float) -> float:
+    """Проверки ревизии, не зависящие от остатков (общие с scenario.py). Возвращает сумму."""
     if source_project_id == target_project_id:
         raise ValueError("Нельзя делать ревизию в ту же статью.")
     amt = float(amount)
     if amt <= 0:
         raise ValueError("Сумма должна быть больше нуля.")
+    return amt
 
+def check_revision_funds(amount: float, available: float):
+    """Запрет перерасхода: сумма ревизии не больше «имеется» у источника."""
+    if amount - available > REVISION_EPS:
+        raise ValueError(f"Недостаточно средств в источнике. Доступно: {available:.2f}")
+
+def record_revision(source_project_id: int, target_project_id: int, amount: float, date: str, note: str | None, added_by: str | None = None):
+    amt = check_revision(source_project_id, target_project_id, amount)
     con = connect()
     try:
         cur = con.cursor()
         who = (added_by or get_windows_user()) or ""
+        _insert_revision(cur, source_project_id, target_project_id, amt, date, note, who)
+        con.commit()
+    finally:
+        con.close()
+
+def _insert_revision(cur, source_project_id: int, target_project_id: int, amt: float, date: str, note: str | None, who: str):
+    # считаем доступную сумму у источника (have)
+    # have = base + rev_in - rev_out
+    cur.execute("SELECT budget FROM projects WHERE id=?", (source_project_id,))
+    r = cur.fetchone()
+    base = float(r[0]) if r else 0.0
 
-        # считаем доступную сумму у источника (have)
-        # have = base + rev_in - rev_out
-        cur.execute("SELECT budget FROM projects WHERE id=?", (source_project_id,))
-        r = cur.fetchone()
-        base = float(r[0]) if r else 0.0
+    cur.execute("SELECT COALESCE(SUM(amount),0) FROM revisions WHERE target_project_id=?", (source_project_id,))
+    rev_in = float(cur.fetchone()[0] or 0.0)
+    cur.execute("SELECT COALESCE(SUM(amount),0) FROM revisions WHERE source_project_id=?", (source_project_id,))
+    rev_out = float(cur.fetchone()[0] or 0.0)
 
-        cur.execute("SELECT COALESCE(SUM(amount),0) FROM revisions WHERE target_project_id=?", (source_project_id,))
-        rev_in = float(cur.fetchone()[0] or 0.0)
-        cur.execute("SELECT COALESCE(SUM(amount),0) FROM revisions WHERE source_project_id=?", (source_project_id,))
-        rev_out = float(cur.fetchone()[0] or 0.0)
+    # запрещаем перерасход
+    check_revision_funds(amt, base + rev_in - rev_out)
 
-        available = base + rev_in - rev_out
+    # если хватает — проводим ревизию
+    cur.execute("""
+        INSERT INTO revisions(source_project_id, target_project_id, amount, date, note, added_by)
+        VALUES(?,?,?,?,?,?)
+    """, (source_project_id, target_project_id, amt, date, note or "", who))
+    _ensure_procurement_status_at_least(target_project_id, cur, "отправлена служебка на ревизию")
 
-        # запрещаем перерасход
-        EPS = 1e-6
-        if amt - available > EPS:
-            raise ValueError(f"Недостаточно средств в источнике. Доступно: {available:.2f}")
+def record_revisions_bulk(items: list[tuple], date: str, note: str | None, added_by: str | None = None) -> list[dict]:
+    """
+    Пакет ревизий одной транзакцией: items — (источник, назначение, сумма); допускается один источник
+    и несколько назначений или несколько источников и одно назначение. Остаток каждого источника
+    читается один раз и сравнивается с его суммой по пакету (правила те же, что в record_revision);
+    записи вставляются executemany, статусы назначений поднимаются одним UPDATE. При ошибке не
+    записывается ничего. Возвращает вставленные ревизии в формате list_revisions_for_period.
+    """
+    items = [(int(s), int(t), check_revision(int(s), int(t), a)) for s, t, a in items]
+    if not items:
+        return []
+    sources = {s for s, _t, _a in items}
+    targets = {t for _s, t, _a in items}
+    if len(sources) > 1 and len(targets) > 1:
+        raise ValueError("Пакет ревизий: либо один источник, либо одно назначение.")
+    if sources & targets:
+        raise ValueError("Статья не может быть в пакете и источником, и назначением.")
+    totals: dict[int, float] = {}
+    for s, _t, a in items:
+        totals[s] = totals.get(s, 0.0) + a
 
-        # если хватает — проводим ревизию
-        cur.execute("""
+    con = connect()
+    try:
+        cur = con.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        ids = sorted(sources | targets)
+        cur.execute(f"SELECT id, name FROM projects WHERE id IN ({','.join('?' * len(ids))})", ids)
+        names = {r[0]: r[1] for r in cur.fetchall()}
+        missing = [i for i in ids if i not in names]
+        if missing:
+            raise ValueError(f"Статья не найдена (id={missing[0]}).")
+        src_ids = sorted(totals)
+        cur.execute(f"""
+            SELECT p.id, COALESCE(p.budget, 0)
+                   + COALESCE((SELECT SUM(amount) FROM revisions WHERE target_project_id = p.id), 0)
+                   - COALESCE((SELECT SUM(amount) FROM revisions WHERE source_project_id = p.id), 0)
+            FROM projects p WHERE p.id IN ({','.join('?' * len(src_ids))})""", src_ids)
+        for pid, available in cur.fetchall():
+            try:
+                check_revision_funds(totals[pid], float(available or 0))
+            except ValueError as e:
+                raise ValueError(f"«{names[pid]}»: {e}") from None
+
+        who = (added_by or get_windows_user()) or ""
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM revisions")
+        last_id = cur.fetchone()[0]
+        cur.executemany("""
             INSERT INTO revisions(source_project_id, target_project_id, amount, date, note, added_by)
             VALUES(?,?,?,?,?,?)
-        """, (source_project_id, target_project_id, amt, date, note or "", who))
-        _ensure_procurement_status_at_least(target_project_id, cur, "отправлена служебка на ревизию")
+        """, [(s, t, a, date, note or "", who) for s, t, a in items])
+        _ensure_procurement_status_at_least_bulk(cur, targets, "отправлена служебка на ревизию")
+        cur.execute("""
+            SELECT id, date, amount, note, source_project_id, target_project_id
+            FROM revisions WHERE id > ? ORDER BY id""", (last_id,))
+        inserted = [dict(r) for r in cur.fetchall()]
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+    for r in inserted:
+        r["source_name"], r["target_name"] = names[r["source_project_id"]], names[r["target_project_id"]]
+    return inserted
 
+def apply_scenario(ops: list[tuple], expected_version: int | None = None, added_by: str | None = None) -> int:
+    """
+    Провести операции сценария (scenario.py) одной транзакцией — все или ни одной.
+    Операция: ("revision", источник, назначение, сумма, дата, комментарий),
+              ("correction", статья, новый бюджет, дата, комментарий),
+              ("contract", статья, сумма, дата, контрагент, комментарий).
+    Ревизии проверяются на перерасход с учётом предыдущих операций. expected_version — data_version,
+    на котором сценарий считался: если база с тех пор изменилась, ValueError и ничего не записывается.
+    Возвращает число проведённых операций.
+    """
+    con = connect()
+    try:
+        cur = con.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        if expected_version is not None and _read_data_version(cur) != expected_version:
+            raise ValueError("База изменилась после расчёта сценария — пересчитайте его.")
+        who = (added_by or get_windows_user()) or ""
+        for op in ops:
+            kind = op[0]
+            if kind == "revision":
+                _k, src, dst, amount, date, note = op
+                _insert_revision(cur, src, dst, check_revision(src, dst, amount), date, note, who)
+            elif kind == "correction":
+                _k, pid, new_budget, date, note = op
+                _insert_correction(cur, pid, new_budget, date, note, who)
+            elif kind == "contract":
+                _k, pid, amount, date, contractor, note = op
+                _insert_contract(cur, pid, amount, date, contractor, None, note, who)
+            else:
+                raise ValueError(f"Неизвестная операция сценария: {kind}")
         con.commit()
+    except BaseException:
+        con.rollback()
+        raise
     finally:
         con.close()
+    return len(ops)
 
 
 def get_revision(rev_id: int):
@@ -843,6 +1579,85 @@ def delete_revision(rev_id: int):
     con.commit()
     con.close()
 
+def list_revisions_for_period(date_from: str, date_to: str, mine_id: int | None = None, project_id: int | None = None) -> list[dict]:
+    """
+    Ревизии за период (даты включительно, YYYY-MM-DD) с названиями статей — одним запросом.
+    mine_id — только ревизии, где источник или назначение относится к руднику; project_id — где участвует статья.
+    """
+    q = """
+        SELECT r.id, r.date, r.amount, r.note,
+               r.source_project_id, s.name AS source_name,
+               r.target_project_id, t.name AS target_name
+        FROM revisions r
+        JOIN projects s ON s.id = r.source_project_id
+        JOIN projects t ON t.id = r.target_project_id
+        WHERE r.date BETWEEN ? AND ?
+    """
+    args: list = [date_from, date_to]
+    if mine_id is not None:
+        q += " AND (s.mine_id=? OR t.mine_id=?)"
+        args += [mine_id, mine_id]
+    if project_id is not None:
+        q += " AND (r.source_project_id=? OR r.target_project_id=?)"
+        args += [project_id, project_id]
+    q += " ORDER BY r.date, r.id"
+    con = connect()
+    cur = con.cursor()
+    cur.execute(q, args)
+    rows = [dict(r) for r in cur.fetchall()]
+    con.close()
+    return rows
+
+
+def list_asof_data() -> tuple[list[tuple], list[tuple], int]:
+    """
+    Исходные данные для расчёта «на дату» (asof.py) в одной транзакции:
+    статьи (id, название, рудник, участок, создана, бюджет при создании или None, текущий бюджет,
+            вне бюджета, статус закупки, бюджет первой корректировки или None),
+    события по порядку (дата, вид, статья, сумма, вторая статья) — вид: 'C' корректировка (сумма —
+    новый бюджет), 'R' ревизия (статья — источник, вторая — назначение), 'M' маркетинг, 'K' договор;
+    и data_version.
+    """
+    con = connect()
+    cur = con.cursor()
+    cur.execute("BEGIN")
+    cur.execute("""
+        SELECT p.id, p.name, COALESCE(m.name, ''), COALESCE(s.name, ''), p.created_at, p.initial_budget,
+               p.budget, p.out_of_budget, p.procurement_status,
+               (SELECT c.new_budget FROM corrections c WHERE c.project_id = p.id ORDER BY c.date, c.id LIMIT 1)
+        FROM projects p LEFT JOIN mines m ON m.id = p.mine_id LEFT JOIN sections s ON s.id = p.section_id
+        ORDER BY p.id""")
+    projects = [tuple(r) for r in cur.fetchall()]
+    cur.execute("""
+        SELECT date, kind, pid, amount, other FROM (
+            SELECT date, 'C' AS kind, project_id AS pid, new_budget AS amount, NULL AS other, id FROM corrections
+            UNION ALL SELECT date, 'R', source_project_id, amount, target_project_id, id FROM revisions
+            UNION ALL SELECT date, 'M', project_id, amount, NULL, id FROM marketing
+            UNION ALL SELECT date, 'K', project_id, amount, NULL, id FROM contracts)
+        ORDER BY date, kind, id""")
+    events = [tuple(r) for r in cur.fetchall()]
+    version = _read_data_version(cur)
+    con.commit()
+    con.close()
+    return projects, events, version
+
+def list_revision_graph_data() -> tuple[list[tuple], list[tuple]]:
+    """
+    Все ревизии и статьи для анализа потоков (revision_graph) — в одной транзакции:
+    ревизии (id, источник, назначение, сумма, дата) и статьи (id, название, рудник, участок).
+    """
+    con = connect()
+    cur = con.cursor()
+    cur.execute("BEGIN")
+    cur.execute("SELECT id, source_project_id, target_project_id, amount, date FROM revisions ORDER BY date, id")
+    edges = [tuple(r) for r in cur.fetchall()]
+    cur.execute("""SELECT p.id, p.name, COALESCE(m.name, ''), COALESCE(s.name, '')
+                   FROM projects p LEFT JOIN mines m ON m.id = p.mine_id LEFT JOIN sections s ON s.id = p.section_id""")
+    nodes = [tuple(r) for r in cur.fetchall()]
+    con.commit()
+    con.close()
+    return edges, nodes
+
 
 def record_project_file_upload(project_id: int, file_path: str, date: str, comment: str, added_by: str):
     """Добавить запись о загруженном файле (файл уже скопирован в папку проекта)."""
@@ -857,25 +1672,40 @@ def record_project_file_upload(project_id: int, file_path: str, date: str, comme
 
 
 def delete_project_file_upload(upload_id: int, delete_file: bool):
-    """Удалить запись о загрузке. Если delete_file=True — удалить файл с диска (если доступен)."""
+    """
+    Удалить запись о загрузке. Если delete_file=True — удалить файл с диска (если доступен),
+    но только когда на него больше не ссылается ни одна запись (маркетинг, договор, другая загрузка).
+    Для файла хранилища удаляются и его ссылки в папках проектов: все — вместе с файлом, иначе —
+    ссылка в папке этой статьи, если другие её записи на файл не ссылаются.
+    """
     con = connect()
     cur = con.cursor()
-    cur.execute("SELECT file_path FROM project_file_uploads WHERE id=?", (upload_id,))
+    cur.execute("SELECT file_path, project_id FROM project_file_uploads WHERE id=?", (upload_id,))
     row = cur.fetchone()
     if not row:
         con.close()
         return
     stored_path = (row[0] or "").strip()
-    if delete_file and stored_path:
-        full = resolve_file_path(stored_path)
-        if full and os.path.isfile(full):
-            try:
-                os.remove(full)
-            except OSError:
-                pass
+    project_id = row[1]
     cur.execute("DELETE FROM project_file_uploads WHERE id=?", (upload_id,))
+    refs_left = attachment_ref_count(stored_path, cur) if stored_path else 0
+    own_refs_left = attachment_ref_count(stored_path, cur, project_id) if refs_left else 0
     con.commit()
     con.close()
+    if not (delete_file and stored_path):
+        return
+    full = resolve_file_path(stored_path)
+    if not full or not os.path.isfile(full):
+        return
+    if refs_left == 0:
+        if is_in_attachment_store(full):
+            _remove_all_views(full)
+        try:
+            os.remove(full)
+        except OSError:
+            pass
+    elif own_refs_left == 0 and is_in_attachment_store(full):
+        _remove_project_views(full, project_id)  # файл нужен другим записям, но этой статье — уже нет
 
 
 # -------- Aggregations
@@ -884,10 +1714,30 @@ def _sum(cur, query, args):
     row = cur.fetchone()
     return float((row[0] if row else 0) or 0.0)
 
+def _status_values(base: float, rev_in: float, rev_out: float,
+                   contract_amount: float | None, marketing_amount: float | None) -> dict:
+    """Имеется / необходимо / остаток / стадия по бюджету, ревизиям и последним маркетингу и договору."""
+    have = base + rev_in - rev_out
+    if contract_amount is not None:
+        need = contract_amount
+        stage = "contract"
+    elif marketing_amount is not None:
+        need = marketing_amount
+        stage = "marketing"
+    else:
+        need = base
+        stage = "none"
+    diff = have - need
+    return {"have": have, "need": need, "diff": diff, "stage": stage, "marketing_amount": marketing_amount, "contract_amount": contract_amount}
+
 def compute_project_status(project_id: int) -> dict:
     con = connect()
     cur = con.cursor()
+    st = _project_status(cur, project_id)
+    con.close()
+    return st
 
+def _project_status(cur, project_id: int) -> dict:
     cur.execute("SELECT budget FROM projects WHERE id=?", (project_id,))
     r = cur.fetchone()
     base = float(r[0]) if r else 0.0
@@ -895,8 +1745,6 @@ def compute_project_status(project_id: int) -> dict:
     rev_in = _sum(cur, "SELECT SUM(amount) FROM revisions WHERE target_project_id=?", (project_id,))
     rev_out = _sum(cur, "SELECT SUM(amount) FROM revisions WHERE source_project_id=?", (project_id,))
 
-    have = base + rev_in - rev_out
-
     cur.execute("SELECT amount FROM contracts WHERE project_id=? ORDER BY date DESC, id DESC LIMIT 1", (project_id,))
     contract_row = cur.fetchone()
 
@@ -905,75 +1753,313 @@ def compute_project_status(project_id: int) -> dict:
 
     contract_amount = float(contract_row[0]) if contract_row else None
     marketing_amount = float(marketing_row[0]) if marketing_row else None
+    return _status_values(base, rev_in, rev_out, contract_amount, marketing_amount)
+
+# Статусы всех статей одним запросом: суммы ревизий и последние маркетинг/договор через оконные функции
+_STATUS_CTES = """
+    WITH rin AS (
+        SELECT target_project_id AS pid, SUM(amount) AS s FROM revisions GROUP BY target_project_id
+    ), rout AS (
+        SELECT source_project_id AS pid, SUM(amount) AS s FROM revisions GROUP BY source_project_id
+    ), lm AS (
+        SELECT project_id AS pid, amount,
+               ROW_NUMBER() OVER (PARTITION BY project_id ORDER BY date DESC, id DESC) AS rn
+        FROM marketing
+    ), lc AS (
+        SELECT project_id AS pid, amount,
+               ROW_NUMBER() OVER (PARTITION BY project_id ORDER BY date DESC, id DESC) AS rn
+        FROM contracts
+    )
+"""
+
+_PROJECT_ROWS_SQL = _STATUS_CTES + """
+    SELECT p.id, p.name, COALESCE(m.name, ''), COALESCE(s.name, ''), p.budget,
+           COALESCE(rin.s, 0), COALESCE(rout.s, 0), lm.amount, lc.amount,
+           p.out_of_budget, p.procurement_status
+    FROM projects p
+    LEFT JOIN mines m ON m.id = p.mine_id
+    LEFT JOIN sections s ON s.id = p.section_id
+    LEFT JOIN rin ON rin.pid = p.id
+    LEFT JOIN rout ON rout.pid = p.id
+    LEFT JOIN lm ON lm.pid = p.id AND lm.rn = 1
+    LEFT JOIN lc ON lc.pid = p.id AND lc.rn = 1
+"""
+
+def _project_row(r) -> tuple:
+    base = float(r[4]) if r[4] is not None else 0.0
+    st = _status_values(base, float(r[5] or 0), float(r[6] or 0),
+                        float(r[8]) if r[8] is not None else None,
+                        float(r[7]) if r[7] is not None else None)
+    pstatus = (r[10].strip() if r[10] else None) or None
+    return (r[0], r[1], r[2], r[3], base, st["have"], st["need"], st["marketing_amount"],
+            st["contract_amount"], st["diff"], st["stage"], 1 if r[9] else 0, pstatus)
+
+def list_project_rows(project_ids=None) -> tuple[list[tuple], int]:
+    """
+    Строки главной таблицы одним запросом (вместо compute_project_status по каждой статье).
+    Строка: (id, название, рудник, участок, заложено, имеется, необходимо, маркетинг, договор,
+             остаток, стадия, вне бюджета 0/1, статус закупки). Возвращает (строки, data_version) —
+    обе части прочитаны в одной транзакции. project_ids — только эти статьи.
+    """
+    con = connect()
+    cur = con.cursor()
+    cur.execute("BEGIN")
+    q = _PROJECT_ROWS_SQL
+    args: list = []
+    if project_ids is not None:
+        ids = [int(i) for i in project_ids]
+        if not ids:
+            con.close()
+            return [], get_data_version()
+        q += f" WHERE p.id IN ({','.join('?' * len(ids))})"
+        args = ids
+    cur.execute(q + " ORDER BY p.id ASC", args)
+    rows = [_project_row(r) for r in cur.fetchall()]
+    version = _read_data_version(cur)
+    con.commit()
+    con.close()
+    return rows, version
+
+# Статус каждой статьи именованными столбцами (те же правила, что в _status_values) — основа
+# для итогов по группам и для наборов фильтров (filter_presets компилирует выражение в WHERE по st)
+_STATUS_TABLE_SQL = _STATUS_CTES + """
+    , st0 AS (
+        SELECT p.id, p.mine_id, p.section_id, p.name,
+               COALESCE(m.name, '') AS mine, COALESCE(s.name, '') AS section,
+               COALESCE(p.budget, 0) AS budget,
+               COALESCE(p.budget, 0) + COALESCE(rin.s, 0) - COALESCE(rout.s, 0) AS have,
+               COALESCE(lc.amount, lm.amount, p.budget, 0) AS need,
+               lm.amount AS marketing, lc.amount AS contract,
+               CASE WHEN p.budget THEN ROUND(COALESCE(lc.amount, 0) / p.budget * 100, 1) END AS pct,
+               CASE WHEN p.out_of_budget THEN 1 ELSE 0 END AS out_of_budget,
+               COALESCE(TRIM(p.procurement_status), '') AS status
+        FROM projects p
+        LEFT JOIN mines m ON m.id = p.mine_id
+        LEFT JOIN sections s ON s.id = p.section_id
+        LEFT JOIN rin ON rin.pid = p.id
+        LEFT JOIN rout ON rout.pid = p.id
+        LEFT JOIN lm ON lm.pid = p.id AND lm.rn = 1
+        LEFT JOIN lc ON lc.pid = p.id AND lc.rn = 1
+    ), st AS (
+        SELECT st0.*, have - need AS diff,
+               %s AS status_rank
+        FROM st0
+    )
+""" % _status_rank_sql("status")
+
+# Промежуточные итоги по группам «рудник → участок»
+_GROUP_TOTALS_SQL = _STATUS_TABLE_SQL + """
+    SELECT mine_id, mine, section_id, section, COUNT(*),
+           SUM(budget), SUM(have), SUM(need), SUM(COALESCE(contract, 0)), SUM(diff)
+    FROM st
+    GROUP BY mine_id, section_id
+    ORDER BY mine_id IS NULL, mine, section_id IS NULL, section
+"""
+
+def list_group_totals() -> tuple[list[dict], int]:
+    """
+    Промежуточные итоги по парам (рудник, участок) одним запросом с GROUP BY.
+    Элемент: {"mine_id", "mine", "section_id", "section", "count", "budget", "have", "need",
+    "contract", "diff"}; mine_id/section_id — None для статей без рудника/участка.
+    Возвращает (группы, data_version) — прочитаны в одной транзакции.
+    """
+    con = connect()
+    cur = con.cursor()
+    cur.execute("BEGIN")
+    cur.execute(_GROUP_TOTALS_SQL)
+    groups = [{
+        "mine_id": r[0], "mine": r[1], "section_id": r[2], "section": r[3], "count": int(r[4]),
+        "budget": float(r[5] or 0), "have": float(r[6] or 0), "need": float(r[7] or 0),
+        "contract": float(r[8] or 0), "diff": float(r[9] or 0),
+    } for r in cur.fetchall()]
+    version = _read_data_version(cur)
+    con.commit()
+    con.close()
+    return groups, version
 
-    if contract_row:
-        need = float(contract_row[0])
-        stage = "contract"
-    elif marketing_row:
-        need = float(marketing_row[0])
-        stage = "marketing"
-    else:
-        need = base
-        stage = "none"
+def list_group_project_rows(mine_id: int | None, section_id: int | None) -> list[tuple]:
+    """Строки главной таблицы (как list_project_rows) для статей одной группы «рудник → участок»."""
+    con = connect()
+    cur = con.cursor()
+    cur.execute(_PROJECT_ROWS_SQL + " WHERE p.mine_id IS ? AND p.section_id IS ? ORDER BY p.name",
+                (mine_id, section_id))
+    rows = [_project_row(r) for r in cur.fetchall()]
+    con.close()
+    return rows
 
-    diff = have - need
+def list_project_ids_where(where_sql: str, args=()) -> list[int]:
+    """
+    id статей, для которых выполняется условие where_sql над столбцами st (см. _STATUS_TABLE_SQL):
+    name, mine, section, budget, have, need, marketing, contract, diff, pct, out_of_budget, status,
+    status_rank. Условие собирает filter_presets.compile_expression — значения только через параметры.
+    Функция fold(x) — регистронезависимое сравнение (lower() SQLite не понимает кириллицу).
+    """
+    con = connect()
+    con.create_function("fold", 1, lambda v: (v or "").casefold(), deterministic=True)
+    cur = con.cursor()
+    cur.execute(_STATUS_TABLE_SQL + f" SELECT id FROM st WHERE {where_sql} ORDER BY id", tuple(args))
+    ids = [r[0] for r in cur.fetchall()]
     con.close()
-    return {"have": have, "need": need, "diff": diff, "stage": stage, "marketing_amount": marketing_amount, "contract_amount": contract_amount}
+    return ids
 
-# -------- Timeline & last revision
-def get_project_timeline(project_id: int) -> list[dict]:
-    con = connect(); cur = con.cursor()
-    rows = []
+# -------- Наборы фильтров (хранятся в базе, у каждой базы — свои)
+def list_filter_presets() -> list[tuple]:
+    """[(id, название, выражение)] по названию."""
+    con = connect()
+    cur = con.cursor()
+    cur.execute("SELECT id, name, expression FROM filter_presets ORDER BY name")
+    rows = [(r[0], r[1], r[2]) for r in cur.fetchall()]
+    con.close()
+    return rows
 
-    # corrections
-    cur.execute("SELECT id, date, new_budget, note, added_by FROM corrections WHERE project_id=?", (project_id,))
-    for r in cur.fetchall():
-        rows.append({"id": r["id"], "kind": "correction", "date": r["date"], "type": "Корректировка",
-                     "amount": float(r["new_budget"]), "note": r["note"] or "", "file_path": None, "added_by": (r["added_by"] or "")})
-
-    # marketing
-    cur.execute("SELECT id, date, amount, note, file_path, added_by FROM marketing WHERE project_id=?", (project_id,))
-    for r in cur.fetchall():
-        rows.append({"id": r["id"], "kind": "marketing", "date": r["date"], "type": "Маркетинг",
-                     "amount": float(r["amount"]), "note": r["note"] or "", "file_path": r["file_path"], "added_by": (r["added_by"] or "")})
-
-    # contracts
-    cur.execute("SELECT id, date, amount, note, file_path, contractor, added_by FROM contracts WHERE project_id=?", (project_id,))
-    for r in cur.fetchall():
-        t = "Договор" + (f" ({r['contractor']})" if r["contractor"] else "")
-        rows.append({"id": r["id"], "kind": "contract", "date": r["date"], "type": t,
-                     "amount": float(r["amount"]), "note": r["note"] or "", "file_path": r["file_path"], "added_by": (r["added_by"] or "")})
-
-    # revisions in (+)
-    cur.execute("SELECT id, date, amount, note, source_project_id, added_by FROM revisions WHERE target_project_id=?", (project_id,))
-    for r in cur.fetchall():
-        cur2 = con.cursor()
-        cur2.execute("SELECT name FROM projects WHERE id=?", (r["source_project_id"],))
-        src_name = cur2.fetchone()
-        t = f"Ревизия (+) из «{(src_name['name'] if src_name else str(r['source_project_id']))}»"
-        rows.append({"id": r["id"], "kind": "revision_in", "date": r["date"], "type": t,
-                     "amount": float(r["amount"]), "note": r["note"] or "", "file_path": None, "sign": "+", "added_by": (r["added_by"] or "")})
-
-    # revisions out (−)
-    cur.execute("SELECT id, date, amount, note, target_project_id, added_by FROM revisions WHERE source_project_id=?", (project_id,))
-    for r in cur.fetchall():
-        cur2 = con.cursor()
-        cur2.execute("SELECT name FROM projects WHERE id=?", (r["target_project_id"],))
-        dst_name = cur2.fetchone()
-        t = f"Ревизия (−) в «{(dst_name['name'] if dst_name else str(r['target_project_id']))}»"
-        rows.append({"id": r["id"], "kind": "revision_out", "date": r["date"], "type": t,
-                     "amount": float(r["amount"]), "note": r["note"] or "", "file_path": None, "sign": "-", "added_by": (r["added_by"] or "")})
-
-    # загрузки файлов (без суммы)
-    cur.execute("SELECT id, date, file_path, comment, added_by FROM project_file_uploads WHERE project_id=?", (project_id,))
-    for r in cur.fetchall():
-        rows.append({"id": r["id"], "kind": "file_upload", "date": r["date"], "type": "Загрузка файла",
-                     "amount": None, "note": r["comment"] or "", "file_path": r["file_path"], "added_by": (r["added_by"] or "")})
+def get_filter_preset(name: str) -> str | None:
+    """Выражение набора по названию или None."""
+    con = connect()
+    cur = con.cursor()
+    cur.execute("SELECT expression FROM filter_presets WHERE name=?", (name.strip(),))
+    row = cur.fetchone()
+    con.close()
+    return row[0] if row else None
 
+def save_filter_preset(name: str, expression: str):
+    """Создать набор или заменить выражение у набора с тем же названием."""
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("Название набора не может быть пустым.")
+    con = connect()
+    cur = con.cursor()
+    cur.execute("""
+        INSERT INTO filter_presets(name, expression, created_at) VALUES(?,?,?)
+        ON CONFLICT(name) DO UPDATE SET expression=excluded.expression
+    """, (name, expression.strip(), datetime.datetime.now().isoformat(timespec="seconds")))
+    con.commit()
     con.close()
+
+def delete_filter_preset(name: str):
+    con = connect()
+    cur = con.cursor()
+    cur.execute("DELETE FROM filter_presets WHERE name=?", (name.strip(),))
+    con.commit()
+    con.close()
+
+def _read_data_version(cur) -> int:
+    try:
+        cur.execute("SELECT value FROM _meta WHERE key='data_version'")
+    except sqlite3.OperationalError:
+        return 0
+    row = cur.fetchone()
+    try:
+        return int(row[0]) if row else 0
+    except (TypeError, ValueError):
+        return 0
+
+def get_data_version() -> int:
+    """Счётчик изменений данных (увеличивается триггерами, см. DATA_VERSION_TABLES / SERVICES_DATA_VERSION_TABLES)."""
+    con = connect()
+    cur = con.cursor()
+    v = _read_data_version(cur)
+    con.close()
+    return v
+
+# -------- Timeline & last revision
+# События карточки статьи: вид → (запрос с подстановкой {where}, столбец статьи для списка).
+# Название второй статьи ревизии — через JOIN, без запроса на каждую строку.
+_TIMELINE_QUERIES = {
+    "correction": ("SELECT id, date, new_budget AS amount, note, NULL AS file_path, added_by, NULL AS extra "
+                   "FROM corrections WHERE {where}", "project_id"),
+    "marketing": ("SELECT id, date, amount, note, file_path, added_by, NULL AS extra "
+                  "FROM marketing WHERE {where}", "project_id"),
+    "contract": ("SELECT id, date, amount, note, file_path, added_by, contractor AS extra "
+                 "FROM contracts WHERE {where}", "project_id"),
+    "revision_in": ("SELECT r.id, r.date, r.amount, r.note, NULL AS file_path, r.added_by, "
+                    "COALESCE(p.name, CAST(r.source_project_id AS TEXT)) AS extra "
+                    "FROM revisions r LEFT JOIN projects p ON p.id = r.source_project_id WHERE {where}",
+                    "target_project_id"),
+    "revision_out": ("SELECT r.id, r.date, r.amount, r.note, NULL AS file_path, r.added_by, "
+                     "COALESCE(p.name, CAST(r.target_project_id AS TEXT)) AS extra "
+                     "FROM revisions r LEFT JOIN projects p ON p.id = r.target_project_id WHERE {where}",
+                     "source_project_id"),
+    "file_upload": ("SELECT id, date, NULL AS amount, comment AS note, file_path, added_by, NULL AS extra "
+                    "FROM project_file_uploads WHERE {where}", "project_id"),
+}
+
+def _timeline_where(kind: str, *cols: str) -> str:
+    alias = "r." if kind.startswith("revision") else ""
+    return " AND ".join(f"{alias}{c}=?" for c in cols)
+
+def _timeline_event(kind: str, r) -> dict:
+    if kind == "correction":
+        t = "Корректировка"
+    elif kind == "marketing":
+        t = "Маркетинг"
+    elif kind == "contract":
+        t = "Договор" + (f" ({r['extra']})" if r["extra"] else "")
+    elif kind == "revision_in":
+        t = f"Ревизия (+) из «{r['extra']}»"
+    elif kind == "revision_out":
+        t = f"Ревизия (−) в «{r['extra']}»"
+    else:
+        t = "Загрузка файла"
+    ev = {"id": r["id"], "kind": kind, "date": r["date"], "type": t,
+          "amount": float(r["amount"]) if r["amount"] is not None else None,
+          "note": r["note"] or "", "file_path": r["file_path"], "added_by": (r["added_by"] or "")}
+    if kind in ("revision_in", "revision_out"):
+        ev["sign"] = "+" if kind == "revision_in" else "-"
+    return ev
+
+def _project_timeline(cur, project_id: int) -> list[dict]:
+    rows = []
+    for kind, (sql, owner) in _TIMELINE_QUERIES.items():
+        cur.execute(sql.format(where=_timeline_where(kind, owner)), (project_id,))
+        rows += [_timeline_event(kind, r) for r in cur.fetchall()]
     rows.sort(key=lambda x: (x["date"] or "", x["type"]))
     return rows
 
+def get_project_timeline(project_id: int) -> list[dict]:
+    con = connect(); cur = con.cursor()
+    rows = _project_timeline(cur, project_id)
+    con.close()
+    return rows
+
+def get_timeline_event(kind: str, record_id: int, project_id: int) -> dict | None:
+    """Одно событие карточки статьи (после изменения записи); None — записи нет или она уже не этой статьи."""
+    if kind not in _TIMELINE_QUERIES:
+        raise ValueError(f"Неизвестный вид события: {kind}")
+    sql, owner = _TIMELINE_QUERIES[kind]
+    con = connect(); cur = con.cursor()
+    cur.execute(sql.format(where=_timeline_where(kind, "id", owner)), (record_id, project_id))
+    r = cur.fetchone()
+    con.close()
+    return _timeline_event(kind, r) if r else None
+
+def get_project_card_snapshot(project_id: int, with_timeline: bool = True) -> dict | None:
+    """
+    Всё для карточки статьи из одного соединения в одной транзакции чтения:
+    {"project" (как get_project), "status" (как compute_project_status), "timeline",
+     "mines" [(id, name)], "sections" {mine_id: [(id, name)]}}. None — статьи нет.
+    with_timeline=False — без событий и справочников (после изменения одной записи).
+    """
+    con = connect(); cur = con.cursor()
+    cur.execute("BEGIN")
+    cur.execute("""SELECT id, name, budget, comment, created_at, out_of_budget, mine_id, section_id, procurement_status
+                   FROM projects WHERE id=?""", (project_id,))
+    r = cur.fetchone()
+    if r is None:
+        con.commit(); con.close()
+        return None
+    snap = {"project": _project_tuple(r), "status": _project_status(cur, project_id)}
+    if with_timeline:
+        snap["timeline"] = _project_timeline(cur, project_id)
+        cur.execute("SELECT id, name FROM mines ORDER BY name")
+        snap["mines"] = [(m[0], m[1]) for m in cur.fetchall()]
+        cur.execute("SELECT id, mine_id, name FROM sections ORDER BY mine_id, name")
+        sections: dict = {}
+        for sid, mid, sname in cur.fetchall():
+            sections.setdefault(mid, []).append((sid, sname))
+        snap["sections"] = sections
+    con.commit(); con.close()
+    return snap
+
 def get_last_revision_for_project(project_id: int) -> dict | None:
     con = connect(); cur = con.cursor()
     cur.execute("""
@@ -1011,6 +2097,7 @@ def update_project_name(project_id: int, new_name: str):
     con = connect(); cur = con.cursor()
     cur.execute("UPDATE projects SET name=? WHERE id=?", (new_name.strip(), project_id))
     con.commit(); con.close()
+    invalidate_project_dir_cache(project_id)
 
 def delete_project(project_id: int):
     """Удаляет статью, ЕСЛИ по ней не было действий; иначе бросает ValueError."""
@@ -1028,6 +2115,7 @@ def delete_project(project_id: int):
     cur.execute("DELETE FROM project_file_uploads WHERE project_id=?", (project_id,))
     cur.execute("DELETE FROM projects WHERE id=?", (project_id,))
     con.commit(); con.close()
+    invalidate_project_dir_cache(project_id)
 
 # -------- Услуги и работы (service_contracts + service_acts)
 def list_service_contracts():
@@ -1040,6 +2128,111 @@ def list_service_contracts():
     con.close()
     return [tuple(r) for r in rows]
 
+# Договоры с суммами актов: акты сворачиваются GROUP BY один раз, рудник/участок — LEFT JOIN
+_SERVICE_CONTRACT_ROWS_SQL = """
+    SELECT c.id, c.name, c.contractor, c.total_amount, COALESCE(a.spent, 0) AS spent,
+           c.total_amount - COALESCE(a.spent, 0) AS remaining, COALESCE(m.name, '') AS mine,
+           COALESCE(s.name, '') AS section, c.start_date, c.end_date, COALESCE(a.acts, 0) AS acts
+    FROM service_contracts c
+    LEFT JOIN (SELECT contract_id, SUM(amount) AS spent, COUNT(*) AS acts
+               FROM service_acts GROUP BY contract_id) a ON a.contract_id = c.id
+    LEFT JOIN mines m ON m.id = c.mine_id
+    LEFT JOIN sections s ON s.id = c.section_id"""
+
+def list_service_contract_rows(contract_ids=None) -> list[dict]:
+    """
+    Строки таблицы договоров одним запросом (вместо get_service_contract_totals и get_mine_name
+    по каждому договору): id, name, contractor, total, spent, remaining, mine, section, start_date,
+    end_date, acts. contract_ids — только эти договоры.
+    """
+    q = _SERVICE_CONTRACT_ROWS_SQL
+    args: list = []
+    if contract_ids is not None:
+        args = [int(i) for i in contract_ids]
+        if not args:
+            return []
+        q += f" WHERE c.id IN ({','.join('?' * len(args))})"
+    con = connect()
+    cur = con.cursor()
+    cur.execute(q + " ORDER BY c.id ASC", args)
+    rows = [{"id": r[0], "name": r[1] or "", "contractor": r[2] or "", "total": float(r[3] or 0),
+             "spent": float(r[4] or 0), "remaining": float(r[5] or 0), "mine": r[6], "section": r[7],
+             "start_date": r[8] or "", "end_date": r[9] or "", "acts": int(r[10] or 0)}
+            for r in cur.fetchall()]
+    con.close()
+    return rows
+
+def list_service_forecast_inputs() -> tuple[list[tuple], int]:
+    """
+    Исходные данные прогноза по всем договорам одним запросом с GROUP BY по актам:
+    (id, сумма договора, дата начала, дата окончания, списано, начало первого периода,
+     конец последнего периода, число актов). Начало периода — period_start, иначе дата акта
+    (как в SERVICE_ACT_MONTH_SQL); конец — period_end, иначе дата акта.
+    Возвращает (строки, data_version) — прочитаны в одной транзакции.
+    """
+    con = connect()
+    cur = con.cursor()
+    cur.execute("BEGIN")
+    cur.execute("""
+        SELECT c.id, c.total_amount, c.start_date, c.end_date, COALESCE(a.spent, 0),
+               a.first_start, a.last_end, COALESCE(a.acts, 0)
+        FROM service_contracts c
+        LEFT JOIN (SELECT contract_id, SUM(amount) AS spent, MIN(COALESCE(NULLIF(period_start, ''), act_date)) AS first_start,
+                          MAX(COALESCE(NULLIF(period_end, ''), NULLIF(act_date, ''), period_start)) AS last_end,
+                          COUNT(*) AS acts
+                   FROM service_acts GROUP BY contract_id) a ON a.contract_id = c.id
+        ORDER BY c.id ASC""")
+    rows = [tuple(r) for r in cur.fetchall()]
+    version = _read_data_version(cur)
+    con.commit()
+    con.close()
+    return rows, version
+
+# Измерения свода актов: ключ → SQL-выражение (акты a, договоры c, рудники m, участки s)
+SERVICE_PIVOT_DIMENSIONS = {
+    "month": SERVICE_ACT_MONTH_SQL,
+    "mine": "COALESCE(m.name, '')",
+    "section": "COALESCE(s.name, '')",
+    "contractor": "COALESCE(c.contractor, '')",
+}
+_SERVICE_PIVOT_FROM = """
+    FROM service_acts
+    JOIN service_contracts c ON c.id = service_acts.contract_id
+    LEFT JOIN mines m ON m.id = c.mine_id
+    LEFT JOIN sections s ON s.id = c.section_id"""
+
+def list_service_pivot_cells() -> list[tuple]:
+    """Суммы актов одним GROUP BY: (месяц, рудник, участок, контрагент, сумма, число актов)."""
+    dims = ", ".join(SERVICE_PIVOT_DIMENSIONS[k] for k in ("month", "mine", "section", "contractor"))
+    con = connect()
+    cur = con.cursor()
+    cur.execute(f"SELECT {dims}, SUM(service_acts.amount), COUNT(*) {_SERVICE_PIVOT_FROM} GROUP BY 1, 2, 3, 4")
+    rows = [(r[0] or "", r[1], r[2], r[3], float(r[4] or 0), int(r[5])) for r in cur.fetchall()]
+    con.close()
+    return rows
+
+def list_service_pivot_acts(filters: dict) -> list[dict]:
+    """Акты, попавшие в ячейку свода: filters — {измерение: значение} (ключи SERVICE_PIVOT_DIMENSIONS)."""
+    where, args = [], []
+    for key, value in filters.items():
+        if key not in SERVICE_PIVOT_DIMENSIONS:
+            raise ValueError(f"Неизвестное измерение свода: {key}")
+        where.append(f"{SERVICE_PIVOT_DIMENSIONS[key]} = ?")
+        args.append(value or "")
+    con = connect()
+    cur = con.cursor()
+    cur.execute(f"""SELECT service_acts.id, service_acts.contract_id, c.name, COALESCE(c.contractor, ''),
+                           COALESCE(m.name, ''), COALESCE(s.name, ''), service_acts.period_start,
+                           service_acts.period_end, service_acts.act_date, service_acts.amount, service_acts.note
+                    {_SERVICE_PIVOT_FROM}
+                    {"WHERE " + " AND ".join(where) if where else ""}
+                    ORDER BY service_acts.act_date, service_acts.id""", args)
+    keys = ("id", "contract_id", "contract", "contractor", "mine", "section",
+            "period_start", "period_end", "act_date", "amount", "note")
+    rows = [dict(zip(keys, r)) for r in cur.fetchall()]
+    con.close()
+    return rows
+
 def get_service_contract(contract_id: int):
     con = connect()
     cur = con.cursor()
@@ -1089,6 +2282,38 @@ def get_service_contract_totals(contract_id: int) -> dict:
     con.close()
     return {"total": total, "spent": spent, "remaining": total - spent}
 
+def get_service_contract_snapshot(contract_id: int) -> dict | None:
+    """
+    Всё для карточки договора из одного соединения в одной транзакции чтения:
+    {"contract", "totals" (total/spent/remaining), "mine_name", "section_name", "acts"}.
+    None — договора нет.
+    """
+    con = connect()
+    cur = con.cursor()
+    cur.execute("BEGIN")
+    cur.execute("""SELECT c.id, c.name, c.contractor, c.total_amount, c.start_date, c.end_date, c.mine_id,
+                          c.section_id, c.note, c.created_at, COALESCE(m.name, ''), COALESCE(s.name, '')
+                   FROM service_contracts c
+                   LEFT JOIN mines m ON m.id = c.mine_id
+                   LEFT JOIN sections s ON s.id = c.section_id
+                   WHERE c.id=?""", (contract_id,))
+    r = cur.fetchone()
+    if r is None:
+        con.commit()
+        con.close()
+        return None
+    contract = {k: r[k] for k in ("id", "name", "contractor", "total_amount", "start_date", "end_date",
+                                  "mine_id", "section_id", "note", "created_at")}
+    cur.execute("""SELECT id, contract_id, period_start, period_end, act_date, amount, note
+                   FROM service_acts WHERE contract_id=? ORDER BY act_date, id""", (contract_id,))
+    acts = [dict(a) for a in cur.fetchall()]
+    con.commit()
+    con.close()
+    total = float(contract["total_amount"] or 0)
+    spent = sum(float(a["amount"] or 0) for a in acts)
+    return {"contract": contract, "totals": {"total": total, "spent": spent, "remaining": total - spent},
+            "mine_name": r[10], "section_name": r[11], "acts": acts}
+
 def list_service_acts(contract_id: int) -> list[dict]:
     con = connect()
     cur = con.cursor()
@@ -1114,7 +2339,9 @@ def add_service_act(contract_id: int, period_start: str, period_end: str | None,
                    VALUES(?,?,?,?,?,?)""",
                 (contract_id, period_start, period_end or "", act_date, float(amount), note or ""))
     con.commit()
+    lid = cur.lastrowid
     con.close()
+    return lid
 
 def update_service_act(act_id: int, period_start: str, period_end: str | None, act_date: str, amount: float, note: str | None):
     con = connect()
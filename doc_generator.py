@@ -10,10 +10,15 @@
 Интерфейс:
 generate_revision_memo(src_project: str, dst_project: str, amount: float, date: str, note: str = "") -> str
 Возвращает абсолютный путь к созданному .docx в папке data/memos/.
+generate_revision_memos(revisions, out_dir=None, bundle="") -> list[str]
+Записки по всем ревизиям за период (шаблон собирается один раз, файлы пишутся в пуле процессов).
 """
 
 from __future__ import annotations
+import io
 import os
+import shutil
+import tempfile
 import zipfile
 import textwrap
 from xml.sax.saxutils import escape
@@ -127,16 +132,142 @@ def _xml_p(text: str) -> str:
     return "\n".join(xml)
 
 def _docx_minimal(text: str, out_path: str) -> None:
+    _docx_minimal_xml(_xml_p(text), out_path)
+
+def _docx_minimal_xml(paras_xml: str, out_path: str) -> None:
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     with zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as z:
         z.writestr("[Content_Types].xml", _CONTENT_TYPES)
         z.writestr("_rels/.rels", _RELS)
-        doc_xml = _DOC_TPL.format(paras=_xml_p(text))
+        doc_xml = _DOC_TPL.format(paras=paras_xml)
         z.writestr("word/document.xml", doc_xml)
 
+_XML_PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+# ===== Шаблон python-docx: собирается один раз, для каждой записки — копия с подстановкой значений =====
+
+_TEMPLATE_BYTES: bytes | None = None
+
+
+def _build_template() -> bytes:
+    """Оформленный документ с метками {{SRC}}, {{DST}} и т.д. (каждая метка — внутри одного run)."""
+    doc = Document()
+
+    # Заголовок
+    p_title = doc.add_paragraph("Служебная записка")
+    p_title.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    run = p_title.runs[0]
+    run.bold = True
+    run.font.size = Pt(14)
+
+    p_theme = doc.add_paragraph("Тема: Ревизия бюджетных средств")
+    p_theme.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    p_theme.runs[0].font.size = Pt(11)
+
+    doc.add_paragraph()  # пустая строка
+
+    # Вводная
+    p_intro = doc.add_paragraph(
+        "В рамках реализации сводного плана инвестиций на {{YEAR}} год по руднику «Жалпак» "
+        "прошу рассмотреть возможность проведения ревизии бюджетных средств."
+    )
+    p_intro.runs[0].font.size = Pt(11)
+
+    doc.add_paragraph()
+
+    # Блок предложения
+    doc.add_paragraph("Предлагается перераспределить средства:")
+    ul = [
+        "Источник финансирования: «{{SRC}}»",
+        "Назначение: «{{DST}}»",
+        "Сумма: {{AMOUNT}}",
+        "Дата проведения: {{DATE}}",
+    ]
+    for item in ul:
+        para = doc.add_paragraph(item, style=None)
+        para_format = para.paragraph_format
+        para_format.left_indent = Pt(12)  # лёгкий отступ
+        # маркер «- » спереди
+        para.runs[0].text = "- " + para.runs[0].text
+        para.runs[0].font.size = Pt(11)
+
+    doc.add_paragraph()
+
+    # Обоснование
+    doc.add_paragraph("Обоснование:")
+    p_note = doc.add_paragraph("{{NOTE}}")
+    p_note.paragraph_format.left_indent = Pt(12)
+    for r in p_note.runs:
+        r.font.size = Pt(11)
+
+    doc.add_paragraph()
+
+    # Финальный абзац
+    p_final = doc.add_paragraph(
+        "В связи с вышеизложенным, прошу Вас оказать содействие в проведении ревизии указанной статьи "
+        "и поручить ДЗиМТО начать закупочные процедуры."
+    )
+    p_final.runs[0].font.size = Pt(11)
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _template() -> bytes:
+    global _TEMPLATE_BYTES
+    if _TEMPLATE_BYTES is None:
+        _TEMPLATE_BYTES = _build_template()
+    return _TEMPLATE_BYTES
+
+
+def _memo_values(src_project: str, dst_project: str, amount: float, date: str, note: str) -> dict:
+    return {
+        "{{YEAR}}": _year_from_iso(date) or "текущий",
+        "{{SRC}}": src_project or "",
+        "{{DST}}": dst_project or "",
+        "{{AMOUNT}}": _format_amount_tenge(amount),
+        "{{DATE}}": date or "",
+        "{{NOTE}}": note.strip() if note and note.strip() else "—",
+    }
+
+
+def _fill_template(values: dict):
+    """Копия шаблона (python-docx Document) с подставленными значениями."""
+    doc = Document(io.BytesIO(_template()))
+    for p in doc.paragraphs:
+        for r in p.runs:
+            t = r.text
+            if "{{" in t:
+                for key, val in values.items():
+                    t = t.replace(key, val)
+                r.text = t
+    return doc
+
+
+def _render_memo(job: tuple) -> str:
+    """Записать одну записку: job = (out_path, src, dst, amount, date, note). Выполняется и в процессах пула."""
+    out_path, src, dst, amount, date, note = job
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    if _HAS_PYDOCX:
+        _fill_template(_memo_values(src, dst, amount, date, note)).save(out_path)
+    else:
+        _docx_minimal(_build_text(src, dst, amount, date, note), out_path)
+    return out_path
+
+
+def _init_worker(template: bytes | None):
+    global _TEMPLATE_BYTES
+    _TEMPLATE_BYTES = template
+
 
 # ===== Основная функция =====
 
+def _memo_filename(src_project: str, dst_project: str, date: str) -> str:
+    return f"Мемо_ревизия_{_safe_name(src_project)}_→_{_safe_name(dst_project)}_{date}.docx"
+
+
 def generate_revision_memo(src_project: str, dst_project: str, amount: float, date: str, note: str = "", project_id: int | None = None) -> str:
     """
     Создаёт черновик служебной записки в папке проекта Files/{база}/{проект}/ и возвращает абсолютный путь к .docx.
@@ -144,87 +275,125 @@ def generate_revision_memo(src_project: str, dst_project: str, amount: float, da
     Имя файла: Мемо_ревизия_[Источник]_→_[Назначение]_[YYYY-MM-DD].docx
     """
     if project_id is not None:
-        memos_dir = db.get_project_files_dir(project_id)
+        memos_dir = db.get_project_files_dir(project_id, create=True)
     else:
         db.ensure_data_dirs()
         memos_dir = os.path.join(db.FILES_DIR, "memos")
         os.makedirs(memos_dir, exist_ok=True)
 
-    safe_src = _safe_name(src_project)
-    safe_dst = _safe_name(dst_project)
-    fname = f"Мемо_ревизия_{safe_src}_→_{safe_dst}_{date}.docx"
-    out_path = os.path.join(memos_dir, fname)
-    out_path = os.path.abspath(out_path)
+    out_path = os.path.abspath(os.path.join(memos_dir, _memo_filename(src_project, dst_project, date)))
+    return _render_memo((out_path, src_project, dst_project, amount, date, note))
 
-    # Содержимое
-    text = _build_text(src_project, dst_project, amount, date, note)
 
-    # 1) Если есть python-docx — оформленный документ
-    if _HAS_PYDOCX:
-        doc = Document()
-
-        # Заголовок
-        p_title = doc.add_paragraph("Служебная записка")
-        p_title.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        run = p_title.runs[0]
-        run.bold = True
-        run.font.size = Pt(14)
-
-        p_theme = doc.add_paragraph("Тема: Ревизия бюджетных средств")
-        p_theme.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        p_theme.runs[0].font.size = Pt(11)
-
-        doc.add_paragraph()  # пустая строка
-
-        # Вводная
-        year = _year_from_iso(date) or "текущий"
-        p_intro = doc.add_paragraph(
-            f"В рамках реализации сводного плана инвестиций на {year} год по руднику «Жалпак» "
-            f"прошу рассмотреть возможность проведения ревизии бюджетных средств."
-        )
-        p_intro.runs[0].font.size = Pt(11)
-
-        doc.add_paragraph()
-
-        # Блок предложения
-        doc.add_paragraph("Предлагается перераспределить средства:")
-        ul = [
-            f"Источник финансирования: «{src_project}»",
-            f"Назначение: «{dst_project}»",
-            f"Сумма: {_format_amount_tenge(amount)}",
-            f"Дата проведения: {date}",
-        ]
-        for item in ul:
-            para = doc.add_paragraph(item, style=None)
-            para_format = para.paragraph_format
-            para_format.left_indent = Pt(12)  # лёгкий отступ
-            # маркер «- » спереди
-            para.runs[0].text = "- " + para.runs[0].text
-            para.runs[0].font.size = Pt(11)
-
-        doc.add_paragraph()
-
-        # Обоснование
-        doc.add_paragraph("Обоснование:")
-        p_note = doc.add_paragraph(note.strip() if note and note.strip() else "—")
-        p_note.paragraph_format.left_indent = Pt(12)
-        for r in p_note.runs:
-            r.font.size = Pt(11)
-
-        doc.add_paragraph()
-
-        # Финальный абзац
-        p_final = doc.add_paragraph(
-            "В связи с вышеизложенным, прошу Вас оказать содействие в проведении ревизии указанной статьи "
-            "и поручить ДЗиМТО начать закупочные процедуры."
-        )
-        p_final.runs[0].font.size = Pt(11)
-
-        # Сохранение
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        doc.save(out_path)
-        return out_path
-
-    # 2) Fallback: минимальный DOCX без python-docx
-    _docx_minimal(text, out_path)
-    return out_path
+# ===== Пакетная генерация за период =====
+
+BUNDLE_NONE = ""
+BUNDLE_ZIP = "zip"
+BUNDLE_DOCX = "docx"
+
+
+def _bundle_docx(revisions: list[dict], out_path: str) -> None:
+    """Один .docx со всеми записками, каждая — с новой страницы."""
+    if not _HAS_PYDOCX:
+        texts = [_build_text(r["source_name"], r["target_name"], r["amount"], r["date"], r.get("note") or "") for r in revisions]
+        _docx_minimal_xml(("\n" + _XML_PAGE_BREAK + "\n").join(_xml_p(t) for t in texts), out_path)
+        return
+    combined = None
+    for r in revisions:
+        doc = _fill_template(_memo_values(r["source_name"], r["target_name"], r["amount"], r["date"], r.get("note") or ""))
+        if combined is None:
+            combined = doc
+            continue
+        combined.add_page_break()
+        body = combined.element.body
+        sect = body.sectPr
+        for el in list(doc.element.body):
+            if el.tag.endswith("}sectPr"):
+                continue
+            if sect is not None:
+                sect.addprevious(el)
+            else:
+                body.append(el)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    combined.save(out_path)
+
+
+def generate_revision_memos(revisions: list[dict], out_dir: str | None = None, bundle: str = BUNDLE_NONE,
+                            progress=None, max_workers: int | None = None) -> list[str]:
+    """
+    Служебные записки по списку ревизий (см. db.list_revisions_for_period). Возвращает пути созданных файлов.
+    out_dir=None — каждая записка в папку статьи-назначения; иначе все в out_dir.
+    bundle: BUNDLE_ZIP — один архив со всеми записками, BUNDLE_DOCX — один документ (каждая записка с новой страницы).
+    Отдельные файлы пишутся параллельно в процессах пула; progress(готово, всего) вызывается в текущем потоке.
+    """
+    if not revisions:
+        return []
+    if bundle and not out_dir:
+        db.ensure_data_dirs()
+        out_dir = os.path.join(db.FILES_DIR, "memos")
+    stamp = f"{revisions[0]['date']}_{revisions[-1]['date']}"
+
+    if bundle == BUNDLE_DOCX:
+        out_path = os.path.abspath(os.path.join(out_dir, f"Мемо_ревизии_{stamp}.docx"))
+        _bundle_docx(revisions, out_path)
+        if progress:
+            progress(len(revisions), len(revisions))
+        return [out_path]
+
+    if bundle == BUNDLE_ZIP:
+        work_dir = tempfile.mkdtemp(prefix="memos_", dir=out_dir if os.path.isdir(out_dir) else None)
+        dirs = {}
+    elif out_dir:
+        work_dir, dirs = out_dir, {}
+    else:
+        work_dir = None
+        dirs = db.get_project_files_dirs(r["target_project_id"] for r in revisions)
+
+    jobs = []
+    used = set()
+    for r in revisions:
+        folder = work_dir or dirs[r["target_project_id"]]
+        name = _memo_filename(r["source_name"], r["target_name"], r["date"])
+        path = os.path.abspath(os.path.join(folder, name))
+        if path in used:
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}_{r['id']}{ext}"
+        used.add(path)
+        jobs.append((path, r["source_name"], r["target_name"], r["amount"], r["date"], r.get("note") or ""))
+
+    written = _run_jobs(jobs, progress, max_workers)
+
+    if bundle == BUNDLE_ZIP:
+        os.makedirs(out_dir, exist_ok=True)
+        zip_path = os.path.abspath(os.path.join(out_dir, f"Мемо_ревизии_{stamp}.zip"))
+        try:
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+                for path in written:
+                    z.write(path, os.path.basename(path))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return [zip_path]
+    return written
+
+
+def _run_jobs(jobs: list[tuple], progress=None, max_workers: int | None = None) -> list[str]:
+    """Выполнить _render_memo по заданиям: мало заданий — в текущем процессе, иначе пулом процессов."""
+    total = len(jobs)
+    workers = max_workers or min(total, os.cpu_count() or 1, 8)
+    template = _template() if _HAS_PYDOCX else None
+    if workers <= 1 or total < 4:
+        out = []
+        for i, job in enumerate(jobs, start=1):
+            out.append(_render_memo(job))
+            if progress:
+                progress(i, total)
+        return out
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    out = [None] * total
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template,)) as pool:
+        futures = {pool.submit(_render_memo, job): i for i, job in enumerate(jobs)}
+        for done, fut in enumerate(as_completed(futures), start=1):
+            out[futures[fut]] = fut.result()
+            if progress:
+                progress(done, total)
+    return out
@@ -66,6 +66,43 @@ def export_table_to_excel(xlsx_path: str, headers: list[str], rows: list[list])
     return os.path.abspath(xlsx_path)
 
 
+def export_rows_streaming(xlsx_path: str, headers: list[str], rows, sheet_title: str = "Сводная",
+                          widths: list[int] | None = None) -> str:
+    """
+    Экспорт большой таблицы в режиме write_only: строки (любой итерируемый объект) пишутся в файл
+    по одной и не держатся в памяти. Ширины столбцов задаются заранее (widths, в символах).
+    Возвращает абсолютный путь к файлу.
+    """
+    return export_sheets_streaming(xlsx_path, [(sheet_title, headers, rows, widths)])
+
+
+def export_sheets_streaming(xlsx_path: str, sheets: list[tuple]) -> str:
+    """То же для нескольких листов: sheets — [(название, заголовки, строки, ширины или None)]."""
+    if not _HAS_OPENPYXL:
+        raise RuntimeError("Не установлен пакет 'openpyxl'. Установите: pip install openpyxl")
+    from openpyxl.cell import WriteOnlyCell
+    wb = Workbook(write_only=True)
+    head_fill = PatternFill("solid", fgColor="333333")
+    head_font = Font(bold=True, color="FFFFFF")
+    used: set[str] = set()
+    for title, headers, rows, widths in sheets:
+        ws = wb.create_sheet(title=_uniq_sheet_name(title, used))
+        for c, w in enumerate(widths or [max(10, len(str(h)) + 2) for h in headers], start=1):
+            ws.column_dimensions[get_column_letter(c)].width = min(max(10, w), 60)
+        head = []
+        for h in headers:
+            cell = WriteOnlyCell(ws, value=h)
+            cell.fill = head_fill
+            cell.font = head_font
+            head.append(cell)
+        ws.append(head)
+        for row in rows:
+            ws.append(list(row))
+    os.makedirs(os.path.dirname(os.path.abspath(xlsx_path)) or ".", exist_ok=True)
+    wb.save(xlsx_path)
+    return os.path.abspath(xlsx_path)
+
+
 def export_to_excel(xlsx_path: str) -> str:
     """
     Экспортирует все проекты в Excel:
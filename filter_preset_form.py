@@ -0,0 +1,65 @@
+# filter_preset_form.py
+from PyQt6 import QtWidgets
+import db
+import filter_presets
+from theme import apply_dialog_theme
+
+class FilterPresetDialog(QtWidgets.QDialog):
+    """Сохранение набора фильтров: название и выражение (проверяется и считается при вводе)."""
+
+    def __init__(self, name: str = "", expression: str = "", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Набор фильтров")
+        self.resize(560, 260)
+        apply_dialog_theme(self)
+        self.saved_name = ""
+
+        self.name_edit = QtWidgets.QLineEdit(name)
+        self.expr_edit = QtWidgets.QPlainTextEdit(expression)
+        self.expr_edit.setPlaceholderText('diff < 0 AND mine = Жалпак AND status >= "объявлен тендер"')
+        self.check_label = QtWidgets.QLabel("")
+        self.check_label.setWordWrap(True)
+        hint = QtWidgets.QLabel(
+            "Поля: name, mine, section, budget, have, need, marketing, contract, diff, pct, out, status "
+            "(или по-русски: название, рудник, остаток…). Операторы: = != < <= > >= ~ (содержит). "
+            "Связки: AND / OR / NOT, скобки. «пусто» — нет значения.")
+        hint.setWordWrap(True)
+        hint.setStyleSheet("color: gray;")
+
+        form = QtWidgets.QFormLayout()
+        form.addRow("Название:", self.name_edit)
+        form.addRow("Условие:", self.expr_edit)
+        form.addRow("", self.check_label)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.StandardButton.Ok |
+                                          QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        btns.accepted.connect(self.on_accept); btns.rejected.connect(self.reject)
+
+        layout = QtWidgets.QVBoxLayout(self); layout.addLayout(form); layout.addWidget(hint); layout.addWidget(btns)
+        self.expr_edit.textChanged.connect(self._check)
+        self._check()
+
+    def _check(self) -> bool:
+        text = self.expr_edit.toPlainText().strip()
+        if not text:
+            self.check_label.setText("")
+            return False
+        try:
+            n = len(filter_presets.matching_ids(text))
+        except ValueError as e:
+            self.check_label.setText(f"⚠ {e}")
+            return False
+        self.check_label.setText(f"Подходит статей: {n}")
+        return True
+
+    def on_accept(self):
+        name = self.name_edit.text().strip()
+        if not name:
+            QtWidgets.QMessageBox.warning(self, "Набор фильтров", "Введите название набора.")
+            return
+        if not self._check():
+            QtWidgets.QMessageBox.warning(self, "Набор фильтров", self.check_label.text() or "Введите условие.")
+            return
+        db.save_filter_preset(name, self.expr_edit.toPlainText().strip())
+        self.saved_name = name
+        self.accept()
@@ -0,0 +1,301 @@
+# filter_presets.py
+# Наборы фильтров главной таблицы: выражение → параметризованное условие WHERE над статусами статей
+# (db._STATUS_TABLE_SQL), так что отбор делает SQLite. Наборы хранятся в самой базе (таблица filter_presets).
+#
+# Синтаксис:  поле оператор значение, связки AND / OR / NOT (или И / ИЛИ / НЕ) и скобки.
+#   diff < 0 AND mine = Жалпак AND status >= "объявлен тендер"
+#   (остаток < 0 OR договор = пусто) AND НЕ out = да
+# Поля: name/название, mine/рудник, section/участок (текст: = != ~ «содержит», без учёта регистра);
+#       budget/заложено, have/имеется, need/необходимо, marketing/маркетинг, contract/договор,
+#       diff/остаток, pct/процент (числа: = != < <= > >=, «пусто» — нет значения);
+#       out/вне_бюджета (да/нет); status/статус (= != ~, а < <= > >= — по порядку PROCUREMENT_STATUSES).
+# Значение — число, строка в "…" или «…», или слова подряд без кавычек (Центральный Мынкудук).
+#
+# Без интерфейса:
+#   python filter_presets.py --db data/invest.db --list
+#   python filter_presets.py --db data/invest.db --expr "diff < 0" [--save "Перерасход"]
+#   python filter_presets.py --db data/invest.db --preset "Перерасход" [--export out.xlsx]
+import argparse
+import re
+import sys
+
+import db
+
+TEXT_FIELDS = {"name": "name", "название": "name", "mine": "mine", "рудник": "mine",
+               "section": "section", "участок": "section"}
+NUM_FIELDS = {"budget": "budget", "заложено": "budget", "have": "have", "имеется": "have",
+              "need": "need", "необходимо": "need", "marketing": "marketing", "маркетинг": "marketing",
+              "contract": "contract", "договор": "contract", "diff": "diff", "остаток": "diff",
+              "pct": "pct", "процент": "pct"}
+BOOL_FIELDS = {"out": "out_of_budget", "вне_бюджета": "out_of_budget"}
+STATUS_FIELDS = {"status": "status", "статус": "status"}
+
+# Столбцы диапазонов строки фильтров (Заложено … Исполн. %) → поля выражения
+RANGE_FIELDS = ("budget", "have", "need", "marketing", "contract", "diff", "pct")
+
+_OPS = {"=": "=", "==": "=", "!=": "<>", "<>": "<>", "≠": "<>", "<": "<", "<=": "<=", "≤": "<=",
+        ">": ">", ">=": ">=", "≥": ">=", "~": "~"}
+_AND, _OR, _NOT = {"and", "и"}, {"or", "или"}, {"not", "не"}
+_EMPTY = {"пусто", "null", "—"}
+_TRUE, _FALSE = {"да", "1", "true", "yes"}, {"нет", "0", "false", "no"}
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<str>"[^"]*"|«[^»]*»)
+  | (?P<op><=|>=|!=|<>|==|[=<>≤≥≠~])
+  | (?P<lp>\()
+  | (?P<rp>\))
+  | (?P<word>[^\s()<>=!~≤≥≠"«»]+)
+''', re.VERBOSE)
+
+
+def _tokenize(text: str) -> list[tuple[str, str, int]]:
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            raise ValueError(f"Непонятный символ «{text[pos]}» (позиция {pos + 1}).")
+        kind = m.lastgroup
+        if kind != "ws":
+            value = m.group()
+            if kind == "str":
+                value = value[1:-1]
+            tokens.append((kind, value, pos + 1))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.i = 0
+        self.args: list = []
+
+    def _peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else (None, None, None)
+
+    def _is_keyword(self, words) -> bool:
+        kind, value, _ = self._peek()
+        return kind == "word" and value.casefold() in words
+
+    def parse(self) -> str:
+        if not self.tokens:
+            raise ValueError("Пустое выражение.")
+        sql = self._or()
+        kind, value, pos = self._peek()
+        if kind is not None:
+            raise ValueError(f"Лишнее «{value}» (позиция {pos}).")
+        return sql
+
+    def _or(self) -> str:
+        parts = [self._and()]
+        while self._is_keyword(_OR):
+            self.i += 1
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else "(" + " OR ".join(parts) + ")"
+
+    def _and(self) -> str:
+        parts = [self._not()]
+        while self._is_keyword(_AND):
+            self.i += 1
+            parts.append(self._not())
+        return parts[0] if len(parts) == 1 else "(" + " AND ".join(parts) + ")"
+
+    def _not(self) -> str:
+        if self._is_keyword(_NOT):
+            self.i += 1
+            return f"NOT ({self._not()})"
+        kind, _value, pos = self._peek()
+        if kind == "lp":
+            self.i += 1
+            sql = self._or()
+            if self._peek()[0] != "rp":
+                raise ValueError(f"Нет закрывающей скобки для «(» (позиция {pos}).")
+            self.i += 1
+            return sql
+        return self._comparison()
+
+    def _comparison(self) -> str:
+        kind, field, pos = self._peek()
+        if kind != "word":
+            raise ValueError(f"Ожидалось название поля (позиция {pos or 'конец'}).")
+        self.i += 1
+        kind, op, op_pos = self._peek()
+        if kind != "op":
+            raise ValueError(f"После «{field}» ожидался оператор: = != < <= > >= ~ (позиция {op_pos or 'конец'}).")
+        self.i += 1
+        value = self._value()
+        return self._compile(field.casefold(), _OPS[op], value, pos)
+
+    def _value(self) -> str:
+        kind, value, pos = self._peek()
+        if kind == "str":
+            self.i += 1
+            return value
+        words = []
+        while kind == "word" and not (words and value.casefold() in _AND | _OR):
+            words.append(value)
+            self.i += 1
+            kind, value, _ = self._peek()
+        if not words:
+            raise ValueError(f"Ожидалось значение (позиция {pos or 'конец'}).")
+        return " ".join(words)
+
+    def _compile(self, field: str, op: str, value: str, pos: int) -> str:
+        empty = value.strip().casefold() in _EMPTY
+        if field in TEXT_FIELDS:
+            col = TEXT_FIELDS[field]
+            if op not in ("=", "<>", "~"):
+                raise ValueError(f"Для «{field}» допустимы только = != ~ (позиция {pos}).")
+            self.args.append("" if empty else value.strip().casefold())
+            return f"instr(fold({col}), ?) > 0" if op == "~" else f"fold({col}) {op} ?"
+        if field in NUM_FIELDS:
+            col = NUM_FIELDS[field]
+            if empty:
+                if op not in ("=", "<>"):
+                    raise ValueError(f"«пусто» сравнивается только через = или != (позиция {pos}).")
+                return f"{col} IS NULL" if op == "=" else f"{col} IS NOT NULL"
+            if op == "~":
+                raise ValueError(f"Для числового поля «{field}» оператор ~ не подходит (позиция {pos}).")
+            self.args.append(_parse_number(value, pos))
+            return f"{col} {op} ?"
+        if field in BOOL_FIELDS:
+            v = value.strip().casefold()
+            if op not in ("=", "<>") or v not in _TRUE | _FALSE:
+                raise ValueError(f"«{field}» сравнивается с да/нет через = или != (позиция {pos}).")
+            self.args.append(1 if v in _TRUE else 0)
+            return f"{BOOL_FIELDS[field]} {op} ?"
+        if field in STATUS_FIELDS:
+            if op == "~":
+                self.args.append(value.strip().casefold())
+                return "instr(fold(status), ?) > 0"
+            rank = -1 if empty else _status_rank(value, pos)
+            if op in ("=", "<>"):
+                self.args.append("" if rank < 0 else db.PROCUREMENT_STATUSES[rank])
+                return f"status {op} ?"
+            if rank < 0:
+                raise ValueError(f"Пустой статус нельзя сравнивать через {op} (позиция {pos}).")
+            self.args.append(rank)
+            return f"(status_rank >= 0 AND status_rank {op} ?)"
+        raise ValueError(f"Неизвестное поле «{field}» (позиция {pos}).")
+
+
+def _parse_number(value: str, pos: int) -> float:
+    s = value.replace(" ", "").replace(" ", "").replace(",", ".").rstrip("%")
+    try:
+        return float(s)
+    except ValueError:
+        raise ValueError(f"«{value}» — не число (позиция {pos}).") from None
+
+
+def _status_rank(value: str, pos: int) -> int:
+    v = value.strip().casefold()
+    for i, s in enumerate(db.PROCUREMENT_STATUSES):
+        if s.casefold() == v:
+            return i
+    raise ValueError(f"Неизвестный статус закупки «{value}» (позиция {pos}).")
+
+
+def compile_expression(text: str) -> tuple[str, list]:
+    """Выражение → (условие WHERE, параметры). Ошибка синтаксиса — ValueError с позицией."""
+    p = _Parser(text or "")
+    return p.parse(), p.args
+
+
+def matching_ids(text: str) -> list[int]:
+    """id статей текущей базы, подходящих под выражение."""
+    where, args = compile_expression(text)
+    return db.list_project_ids_where(where, args)
+
+
+def _quote(value: str) -> str:
+    return f"«{value}»" if '"' in value else f'"{value}"'
+
+
+def _number_text(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def expression_from_filter(state: dict) -> str:
+    """Выражение из состояния строки фильтров (MainWindow._filter_state) — чтобы сохранить её как набор."""
+    parts = []
+    name = (state.get("name") or "").strip()
+    if name:
+        parts.append(f"name ~ {_quote(name)}")
+    for field, lo, hi in zip(RANGE_FIELDS, state.get("from") or [], state.get("to") or []):
+        if lo is not None:
+            parts.append(f"{field} >= {_number_text(lo)}")
+        if hi is not None:
+            parts.append(f"{field} <= {_number_text(hi)}")
+    out = state.get("out") or 0
+    if out == 1:
+        parts.append("out = нет")
+    elif out == 2:
+        parts.append("out = да")
+    status = state.get("status") or 0
+    if 0 < status <= len(db.PROCUREMENT_STATUSES):
+        parts.append(f"status = {_quote(db.PROCUREMENT_STATUSES[status - 1])}")
+    return " AND ".join(parts)
+
+
+def export_rows(ids: list[int]) -> tuple[list[str], list[list]]:
+    """Заголовки и строки (как в экспорте главной таблицы) для статей ids."""
+    import table_style
+    rows, _version = db.list_project_rows(ids)
+    out = []
+    for row in sorted(rows, key=lambda r: (r[1] or "").casefold()):
+        values = table_style.column_values(row)
+        out.append([table_style.format_cell(c, v) for c, v in enumerate(values)])
+    return list(table_style.HEADERS), out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Наборы фильтров главной таблицы")
+    ap.add_argument("--db", help="путь к базе (по умолчанию — база по умолчанию в data/)")
+    ap.add_argument("--list", action="store_true", help="показать сохранённые наборы")
+    ap.add_argument("--preset", help="применить сохранённый набор")
+    ap.add_argument("--expr", help="применить выражение")
+    ap.add_argument("--save", metavar="NAME", help="сохранить --expr как набор NAME")
+    ap.add_argument("--delete", metavar="NAME", help="удалить набор")
+    ap.add_argument("--export", metavar="FILE.xlsx", help="выгрузить подходящие статьи в Excel")
+    args = ap.parse_args(argv)
+
+    if args.db:
+        db.set_db_path(args.db)
+    if db.open_db() != "invest":
+        print("Наборы фильтров есть только в базе инвест-проектов.", file=sys.stderr)
+        return 2
+    try:
+        if args.delete:
+            db.delete_filter_preset(args.delete)
+        if args.list:
+            for _id, name, expression in db.list_filter_presets():
+                print(f"{name}\t{expression}")
+        expression = args.expr
+        if args.preset:
+            expression = db.get_filter_preset(args.preset)
+            if expression is None:
+                raise ValueError(f"Набор «{args.preset}» не найден.")
+        if expression is None:
+            return 0
+        ids = matching_ids(expression)
+        if args.save:
+            db.save_filter_preset(args.save, expression)
+        headers, rows = export_rows(ids)
+        if args.export:
+            from export_excel import export_table_to_excel
+            print(export_table_to_excel(args.export, headers, rows))
+        else:
+            print("\t".join(headers))
+            for r in rows:
+                print("\t".join(r))
+        print(f"Статей: {len(rows)}", file=sys.stderr)
+    except ValueError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# group_tree.py
+# Режим «По рудникам» главного окна: дерево рудник → участок → статьи.
+# Итоги групп — один запрос с GROUP BY (db.list_group_totals), статьи участка читаются
+# только при первом раскрытии (db.list_group_project_rows). reload() перечитывает итоги
+# и трогает лишь те группы, у которых они изменились (или в которых изменились статьи).
+from PyQt6 import QtCore, QtWidgets
+from PyQt6.QtGui import QBrush
+
+import db
+from utils import money
+
+HEADERS = ["Рудник / участок / статья", "Статей", "Заложено", "Имеется", "Необходимо", "Договор", "Остаток"]
+TOTAL_KEYS = ("count", "budget", "have", "need", "contract", "diff")
+
+KEY_ROLE = QtCore.Qt.ItemDataRole.UserRole          # у рудника — mine_id, у участка — (mine_id, section_id)
+PID_ROLE = QtCore.Qt.ItemDataRole.UserRole + 1      # id статьи (только у листьев)
+
+_RIGHT = QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter
+_GOOD = QBrush(QtCore.Qt.GlobalColor.green)
+_BAD = QBrush(QtCore.Qt.GlobalColor.red)
+
+
+def _set_values(item: QtWidgets.QTreeWidgetItem, count, budget, have, need, contract, diff):
+    texts = ["" if count is None else str(count), money(budget), money(have), money(need),
+             money(contract) if contract is not None else "—", money(diff)]
+    for col, text in enumerate(texts, start=1):
+        item.setText(col, text)
+        item.setTextAlignment(col, _RIGHT)
+    item.setForeground(6, _GOOD if diff >= 0 else _BAD)
+
+
+class GroupTreeWidget(QtWidgets.QTreeWidget):
+    projectActivated = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setColumnCount(len(HEADERS))
+        self.setHeaderLabels(HEADERS)
+        self.setAlternatingRowColors(True)
+        self.setUniformRowHeights(True)
+        self.header().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.header().setStretchLastSection(False)
+        self.itemExpanded.connect(self._on_expanded)
+        self.itemDoubleClicked.connect(self._on_double_clicked)
+        self.clear_groups()
+
+    def clear_groups(self):
+        """Забыть всё (смена базы). Заполнится при следующем reload()."""
+        self.clear()
+        self._mines: dict = {}          # mine_id → узел рудника
+        self._sections: dict = {}       # (mine_id, section_id) → узел участка
+        self._totals: dict = {}         # (mine_id, section_id) → итоги группы
+        self._loaded: set = set()       # участки, статьи которых уже прочитаны
+        self._group_of: dict = {}       # id статьи → (mine_id, section_id) для прочитанных участков
+
+    def reload(self, changed_pids=None):
+        """
+        Перечитать итоги групп. Узлы с неизменными итогами не трогаются; у изменившихся
+        раскрытых участков статьи перечитываются, у свёрнутых — сбрасываются до следующего раскрытия.
+        changed_pids — статьи, изменившиеся без влияния на суммы (название, статус): их участки тоже перечитываются.
+        """
+        groups, _version = db.list_group_totals()
+        new = {(g["mine_id"], g["section_id"]): g for g in groups}
+        dirty = {self._group_of[pid] for pid in (changed_pids or ()) if pid in self._group_of}
+
+        touched_mines = set()
+        for key in [k for k in self._sections if k not in new]:
+            self._remove_section(key)
+            touched_mines.add(key[0])
+        for key, g in new.items():
+            node = self._sections.get(key)
+            if node is None:
+                node = self._add_section(key, g)
+                touched_mines.add(key[0])
+            elif self._totals.get(key) != g or key in dirty:
+                self._totals[key] = g
+                _set_values(node, *(g[k] for k in TOTAL_KEYS))
+                touched_mines.add(key[0])
+                if key in self._loaded:
+                    if node.isExpanded():
+                        self._load_children(node, key)
+                    else:
+                        self._unload_children(node, key)
+        for mine_id in touched_mines:
+            self._update_mine(mine_id)
+        for mine_id in [m for m in self._mines if not any(k[0] == m for k in self._sections)]:
+            self.takeTopLevelItem(self.indexOfTopLevelItem(self._mines.pop(mine_id)))
+
+    def _mine_node(self, mine_id, name: str) -> QtWidgets.QTreeWidgetItem:
+        node = self._mines.get(mine_id)
+        if node is None:
+            node = QtWidgets.QTreeWidgetItem([name or "(без рудника)"])
+            node.setData(0, KEY_ROLE, mine_id)
+            font = node.font(0)
+            font.setBold(True)
+            node.setFont(0, font)
+            self.addTopLevelItem(node)
+            self._mines[mine_id] = node
+        return node
+
+    def _add_section(self, key, g: dict) -> QtWidgets.QTreeWidgetItem:
+        parent = self._mine_node(key[0], g["mine"])
+        node = QtWidgets.QTreeWidgetItem([g["section"] or "(без участка)"])
+        node.setData(0, KEY_ROLE, key)
+        node.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
+        _set_values(node, *(g[k] for k in TOTAL_KEYS))
+        parent.addChild(node)
+        self._sections[key] = node
+        self._totals[key] = g
+        return node
+
+    def _remove_section(self, key):
+        node = self._sections.pop(key)
+        self._unload_children(node, key)
+        self._totals.pop(key, None)
+        parent = node.parent()
+        if parent is not None:
+            parent.removeChild(node)
+
+    def _update_mine(self, mine_id):
+        """Итоги рудника — сумма итогов его участков (уже прочитаны одним запросом)."""
+        node = self._mines.get(mine_id)
+        if node is None:
+            return
+        sums = dict.fromkeys(TOTAL_KEYS, 0)
+        for key, g in self._totals.items():
+            if key[0] == mine_id:
+                for k in TOTAL_KEYS:
+                    sums[k] += g[k]
+        _set_values(node, *(sums[k] for k in TOTAL_KEYS))
+
+    def _load_children(self, node: QtWidgets.QTreeWidgetItem, key):
+        self._unload_children(node, key)
+        rows = db.list_group_project_rows(key[0], key[1])
+        items = []
+        for (pid, name, _mine, _section, budget, have, need, _marketing, contract,
+             diff, _stage, _out, _status) in rows:
+            leaf = QtWidgets.QTreeWidgetItem([name])
+            leaf.setData(0, PID_ROLE, pid)
+            _set_values(leaf, None, budget, have, need, contract, diff)
+            items.append(leaf)
+            self._group_of[pid] = key
+        node.addChildren(items)
+        self._loaded.add(key)
+
+    def _unload_children(self, node: QtWidgets.QTreeWidgetItem, key):
+        for leaf in node.takeChildren():
+            self._group_of.pop(leaf.data(0, PID_ROLE), None)
+        self._loaded.discard(key)
+
+    def _on_expanded(self, node: QtWidgets.QTreeWidgetItem):
+        key = node.data(0, KEY_ROLE)
+        if isinstance(key, tuple) and key not in self._loaded:
+            self._load_children(node, key)
+
+    def _on_double_clicked(self, item: QtWidgets.QTreeWidgetItem, _col: int):
+        pid = item.data(0, PID_ROLE)
+        if pid is not None:
+            self.projectActivated.emit(int(pid))
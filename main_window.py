@@ -1,41 +1,94 @@
 # main_window.py
 from PyQt6 import QtWidgets, QtCore
-from PyQt6.QtGui import QBrush, QColor
-from PyQt6.QtCore import QSettings      # ← ДОБАВИТЬ
+from PyQt6.QtGui import QKeySequence, QShortcut
 import os                                # ← ДОБАВИТЬ
 
 import db
-import export_excel
+import filter_presets
+import preferences
+import services_model
+import startup_profile
+import table_snapshot
+import table_style
 
 from utils import money, to_float, format_number_for_edit
 from theme import apply_dark_theme
-from add_project_form import AddProjectDialog
-from about_dialog import AboutDialog
 from settings_dialog import SettingsDialog, load_column_order, load_column_visible
-from project_card import ProjectCard  # ⬅ импортируй вверху
-from bulk_import import BulkImportDialog
+# Карточка проекта, формы, экспорт и импорт (openpyxl, pyperclip, python-docx) импортируются
+# при первом использовании — чтобы не замедлять запуск.
 
 # Ключи настроек строки состояния (какие пункты показывать). По умолчанию все True.
 STATUS_BAR_KEYS = ("budget", "contract", "remainder", "pct", "need", "have", "count", "over_budget")
 STATUS_BAR_PREFIX = "status_bar/"
+CONTENT_INDEX_DELAY_MS = 3000   # пауза перед фоновой индексацией содержимого вложений
 
 def _load_status_bar_visible() -> dict:
-    s = QSettings()
     out = {}
     for k in STATUS_BAR_KEYS:
-        v = s.value(STATUS_BAR_PREFIX + k)
-        if v is None:
-            out[k] = True
-        elif isinstance(v, bool):
-            out[k] = v
-        else:
-            out[k] = str(v).lower() in ("1", "true", "yes")
+        out[k] = preferences.get_bool(STATUS_BAR_PREFIX + k, True)
     return out
 
 def _save_status_bar_visible(visible: dict):
-    s = QSettings()
     for k, v in visible.items():
-        s.setValue(STATUS_BAR_PREFIX + k, v)
+        preferences.set_value(STATUS_BAR_PREFIX + k, v)
+
+def _totals_from_rows(rows: list[tuple]) -> dict:
+    """Итоги для строки состояния по строкам db.list_project_rows."""
+    t = {"budget": 0.0, "contract": 0.0, "remainder": 0.0, "need": 0.0, "have": 0.0, "over_budget_count": 0}
+    for row in rows:
+        budget, have, need, contract, diff = row[4], row[5], row[6], row[8], row[9]
+        t["budget"] += budget
+        t["contract"] += contract if contract is not None else 0.0
+        t["remainder"] += diff
+        t["need"] += need
+        t["have"] += have
+        if diff < 0:
+            t["over_budget_count"] += 1
+    return t
+
+
+class _RowsLoader(QtCore.QThread):
+    """Фоновая проверка снимка таблицы: свежие строки, если data_version изменился."""
+    loaded = QtCore.pyqtSignal(object, object, object)   # поколение, строки (None — без изменений), data_version
+
+    def __init__(self, gen: int, known_version: int, parent=None):
+        super().__init__(parent)
+        self._gen = gen
+        self._known = known_version
+        self._cancelled = False
+
+    def cancel(self):
+        """Не читать строки, если ещё не начали (база сменилась); результат в любом случае отбросится по поколению."""
+        self._cancelled = True
+
+    def run(self):
+        try:
+            if db.get_data_version() == self._known or self._cancelled:
+                self.loaded.emit(self._gen, None, self._known)
+                return
+            rows, version = db.list_project_rows()
+            self.loaded.emit(self._gen, rows, version)
+        except Exception:
+            self.loaded.emit(self._gen, None, None)
+
+
+class _ContentIndexer(QtCore.QThread):
+    """Фоновое обновление индекса содержимого вложений (attachment_index.update_index)."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        import attachment_index
+        try:
+            attachment_index.update_index(cancelled=lambda: self._cancelled)
+        except Exception:
+            pass  # индекс — только для поиска; следующий проход (после refresh) попробует снова
+
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
@@ -43,74 +96,282 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setWindowTitle("Invest Manager")
         self.resize(980, 620)
         apply_dark_theme(self)
-        if db.get_db_type() == "services":
-            self._db_type = "services"
-            self._build_services_ui()
-            self._restore_window_geometry()
-            return
-        self._db_type = "invest"
-        self._build_invest_ui()
+        # Оба интерфейса (инвест и услуги) создаются один раз и живут в стеке; при смене базы
+        # переключается страница и перечитываются данные, виджеты не пересоздаются.
+        self._stack = QtWidgets.QStackedWidget()
+        self._content_indexer = None
+        self._content_index_again = False
+        self._content_index_timer = QtCore.QTimer(self)
+        self._content_index_timer.setSingleShot(True)
+        self._content_index_timer.timeout.connect(self._start_content_index)
+        self.setCentralWidget(self._stack)
+        self._invest_page = None
+        self._services_page = None
+        self._db_type = None
+        self._active_db_path = None
+        self._filter_states = {}  # путь к базе → состояние фильтров и сортировки (на время сеанса)
+        self._rows_by_id = {}     # id статьи → строка, как она нарисована (для точечного обновления)
+        self._rows_gen = 0        # поколение загрузки: устаревшие фоновые результаты отбрасываются
+        self._rows_version = None  # data_version, на котором строки таблицы прочитаны целиком
+        self._loaders = []
+        self._status_totals = {}
+        self._show_db_ui(db.get_db_type())
+        if self._db_type == "invest":
+            self._show_opened_toast()
         self._restore_window_geometry()
 
+    def _show_db_ui(self, db_type: str):
+        """Показать интерфейс под тип текущей базы и загрузить её данные."""
+        self._leave_current_db()
+        self._db_type = db_type
+        if db_type == "services":
+            if self._services_page is None:
+                self._services_page = self._build_services_ui()
+                self._stack.addWidget(self._services_page)
+            self._stack.setCurrentWidget(self._services_page)
+            self._services_restore_filter_state()
+            with startup_profile.span("первый refresh"):
+                self._services_refresh()
+            self._apply_db_title_services()
+        else:
+            if self._invest_page is None:
+                self._invest_page = self._build_invest_ui()
+                self._stack.addWidget(self._invest_page)
+                self._apply_column_settings()
+                grouped = preferences.get_bool("mainwindow/grouped", False)
+                self.group_btn.blockSignals(True)
+                self.group_btn.setChecked(grouped)
+                self.group_btn.blockSignals(False)
+                self._show_view(grouped)
+            self._stack.setCurrentWidget(self._invest_page)
+            self._restore_filter_state()
+            if self.group_tree is not None:
+                self.group_tree.clear_groups()  # другая база — другие группы
+            with startup_profile.span("первый refresh"):
+                # Сначала — снимок прошлой сессии (мгновенно), свежие данные дочитываются в фоне
+                if not self._paint_snapshot():
+                    self.refresh()
+                else:
+                    self._sync_group_tree()
+            self._apply_db_title()
+            self._schedule_content_index()
+        self._active_db_path = os.path.abspath(db.get_db_path())
+
+    def _leave_current_db(self):
+        """Перед сменой базы: запомнить фильтры текущей и отменить её фоновые загрузки."""
+        if self._active_db_path:
+            if self._db_type == "invest" and self._invest_page is not None:
+                self._filter_states[self._active_db_path] = self._filter_state()
+            elif self._db_type == "services" and self._services_page is not None:
+                self._filter_states[self._active_db_path] = self._services_filter_state()
+        if self._invest_page is not None and self.asof_btn.isChecked():
+            self.asof_btn.blockSignals(True)   # другая база открывается с текущими данными
+            self.asof_btn.setChecked(False)
+            self.asof_btn.blockSignals(False)
+            self.asof_date_edit.setVisible(False)
+            self.group_btn.setEnabled(True)
+        self._rows_gen += 1
+        for loader in self._loaders:
+            loader.cancel()
+        self._content_index_timer.stop()
+        self._content_index_again = False
+        if self._content_indexer is not None:
+            self._content_indexer.cancel()
+
+    def _filter_state(self) -> dict:
+        return {
+            "name": self.filter_name_edit.text(),
+            "from": list(self.filter_from_vals),
+            "to": list(self.filter_to_vals),
+            "out": self.filter_out_combo.currentIndex(),
+            "status": self.filter_status_combo.currentIndex(),
+            "sort": (self._sort_column, self._sort_order),
+            "preset": self.preset_combo.currentText() if self.preset_combo.currentIndex() > 0 else "",
+        }
+
+    def _restore_filter_state(self):
+        """Фильтры и сортировка для текущей базы (как их оставили), для новой — сброшенные."""
+        st = self._filter_states.get(os.path.abspath(db.get_db_path()))
+        if not st or "name" not in st:  # нет состояния или оно от базы услуг по тому же пути
+            st = {"name": "", "from": [None] * 7, "to": [None] * 7, "out": 0, "status": 0,
+                  "sort": (-1, QtCore.Qt.SortOrder.AscendingOrder), "preset": ""}
+        for w in (self.filter_name_edit, self.filter_out_combo, self.filter_status_combo):
+            w.blockSignals(True)
+        self.filter_name_edit.setText(st["name"])
+        self.filter_from_vals[:] = st["from"]
+        self.filter_to_vals[:] = st["to"]
+        self.filter_out_combo.setCurrentIndex(st["out"])
+        self.filter_status_combo.setCurrentIndex(st["status"])
+        for w in (self.filter_name_edit, self.filter_out_combo, self.filter_status_combo):
+            w.blockSignals(False)
+        self._sort_column, self._sort_order = st["sort"]
+        self._reload_presets(st.get("preset", ""))  # у каждой базы свои наборы
+        header = self.table.horizontalHeader()
+        header.setSortIndicatorShown(self._sort_column >= 0)
+        if self._sort_column >= 0:
+            header.setSortIndicator(self._sort_column, self._sort_order)
+
     def _build_services_ui(self):
-        """Интерфейс для базы «Услуги и работы»: список договоров, акты в карточке."""
+        """Интерфейс для базы «Услуги и работы»: список договоров, акты в карточке. Возвращает страницу."""
         central = QtWidgets.QWidget()
-        self.setCentralWidget(central)
         layout = QtWidgets.QVBoxLayout(central)
         top = QtWidgets.QHBoxLayout()
         self.add_contract_btn = QtWidgets.QPushButton("➕ Добавить договор")
-        self.refresh_btn = QtWidgets.QPushButton("⟳ Обновить")
-        self.db_btn = QtWidgets.QPushButton("🗂 База…")
-        self.about_btn = QtWidgets.QPushButton("⚙ Настройки")
+        self.services_refresh_btn = QtWidgets.QPushButton("⟳ Обновить")
+        self.services_pivot_btn = QtWidgets.QPushButton("📊 Свод по месяцам")
+        self.services_db_btn = QtWidgets.QPushButton("🗂 База…")
+        self.services_about_btn = QtWidgets.QPushButton("⚙ Настройки")
         top.addWidget(self.add_contract_btn)
-        top.addWidget(self.db_btn)
-        top.addWidget(self.refresh_btn)
+        top.addWidget(self.services_db_btn)
+        top.addWidget(self.services_refresh_btn)
+        top.addWidget(self.services_pivot_btn)
         top.addStretch(1)
-        top.addWidget(self.about_btn)
+        top.addWidget(self.services_about_btn)
         layout.addLayout(top)
-        self.services_table = QtWidgets.QTableWidget(0, 6)
-        self.services_table.setHorizontalHeaderLabels(["Название", "Контрагент", "Сумма договора", "Списано", "Остаток", "Рудник"])
+        # Таблица договоров: модель + прокси (services_model) — суммы одним запросом, сортировка по числам
+        self.services_model = services_model.ServicesTableModel(self)
+        self.services_proxy = services_model.ServicesFilterProxy(self.services_model, self)
+        self.services_table = QtWidgets.QTableView()
+        self.services_table.setModel(self.services_proxy)
+        self.services_table.setSortingEnabled(True)
+        self.services_table.sortByColumn(-1, QtCore.Qt.SortOrder.AscendingOrder)
         self.services_table.horizontalHeader().setStretchLastSection(True)
         self.services_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.services_table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.services_table.setAlternatingRowColors(True)
+        self.services_table.verticalHeader().setDefaultSectionSize(24)
+
+        # Строка фильтров: текст (название, контрагент, рудник) и ОТ/ДО по суммам
+        filter_row = QtWidgets.QHBoxLayout()
+        filter_row.addWidget(QtWidgets.QLabel("Фильтр:"))
+        self.services_filter_edit = QtWidgets.QLineEdit()
+        self.services_filter_edit.setPlaceholderText("Название, контрагент, рудник")
+        self.services_filter_edit.setClearButtonEnabled(True)
+        self.services_filter_edit.textChanged.connect(self.services_proxy.set_text)
+        filter_row.addWidget(self.services_filter_edit)
+        self.services_range_edits = {}
+        titles = dict(services_model.COLUMNS)
+        for key in services_model.RANGE_KEYS:
+            btn = QtWidgets.QToolButton()
+            btn.setText(f"{titles[key]} ▾")
+            btn.setPopupMode(QtWidgets.QToolButton.ToolButtonPopupMode.InstantPopup)
+            menu = QtWidgets.QMenu(self)
+            w = QtWidgets.QWidget()
+            form = QtWidgets.QFormLayout(w)
+            le_from = QtWidgets.QLineEdit()
+            le_from.setPlaceholderText("мин")
+            le_to = QtWidgets.QLineEdit()
+            le_to.setPlaceholderText("макс")
+            form.addRow("ОТ:", le_from)
+            form.addRow("ДО:", le_to)
+            reset_btn = QtWidgets.QPushButton("Сбросить фильтр")
+            form.addRow(reset_btn)
+            action = QtWidgets.QWidgetAction(menu)
+            action.setDefaultWidget(w)
+            menu.addAction(action)
+            btn.setMenu(menu)
+            le_from.textChanged.connect(lambda _t, k=key: self._services_on_range_changed(k))
+            le_to.textChanged.connect(lambda _t, k=key: self._services_on_range_changed(k))
+            le_from.editingFinished.connect(lambda f=le_from: self._format_range_edit(f))
+            le_to.editingFinished.connect(lambda t=le_to: self._format_range_edit(t))
+            reset_btn.clicked.connect(lambda _c, k=key, m=menu: (self._services_reset_range(k), m.close()))
+            self.services_range_edits[key] = (btn, le_from, le_to)
+            filter_row.addWidget(btn)
+        services_reset_btn = QtWidgets.QPushButton("🔄")
+        services_reset_btn.setToolTip("Сбросить все фильтры")
+        services_reset_btn.clicked.connect(self._services_reset_filters)
+        filter_row.addWidget(services_reset_btn)
+        filter_row.addStretch(1)
+        layout.addLayout(filter_row)
         layout.addWidget(self.services_table)
+
+        # Итоги по показанным договорам (прокси держит их сам и сообщает об изменении)
+        self.services_status_label = QtWidgets.QLabel("")
+        self.services_status_label.setStyleSheet("padding: 6px; font-weight: bold;")
+        layout.addWidget(self.services_status_label)
+        self.services_proxy.totalsChanged.connect(self._services_update_status)
+
         self.add_contract_btn.clicked.connect(self._services_add_contract)
-        self.refresh_btn.clicked.connect(self._services_refresh)
-        self.db_btn.clicked.connect(self._show_db_menu)
-        self.about_btn.clicked.connect(self._open_settings)
-        self.services_table.cellDoubleClicked.connect(self._services_open_contract_card)
-        self._services_refresh()
-        self._apply_db_title_services()
+        self.services_refresh_btn.clicked.connect(self._services_refresh)
+        self.services_pivot_btn.clicked.connect(self._services_open_pivot)
+        self.services_db_btn.clicked.connect(self._show_db_menu)
+        self.services_about_btn.clicked.connect(self._open_settings)
+        self.services_table.doubleClicked.connect(self._services_open_contract_card)
+        return central
+
+    def _services_filter_state(self) -> dict:
+        header = self.services_table.horizontalHeader()
+        return {
+            "text": self.services_filter_edit.text(),
+            "ranges": {k: (le_from.text(), le_to.text()) for k, (_b, le_from, le_to) in self.services_range_edits.items()},
+            "sort": (header.sortIndicatorSection(), header.sortIndicatorOrder()),
+        }
+
+    def _services_restore_filter_state(self):
+        """Фильтры и сортировка договоров для текущей базы (как их оставили), для новой — сброшенные."""
+        st = self._filter_states.get(os.path.abspath(db.get_db_path()))
+        if not st or "ranges" not in st:  # нет состояния или оно от инвест-базы по тому же пути
+            st = {"text": "", "ranges": {}, "sort": (-1, QtCore.Qt.SortOrder.AscendingOrder)}
+        self.services_filter_edit.setText(st["text"])
+        for key, (_btn, le_from, le_to) in self.services_range_edits.items():
+            lo, hi = st["ranges"].get(key, ("", ""))
+            le_from.setText(lo)
+            le_to.setText(hi)
+        self.services_table.sortByColumn(*st["sort"])
 
     def _services_refresh(self):
-        rows = db.list_service_contracts()
-        self.services_table.setRowCount(len(rows))
-        for r, row in enumerate(rows):
-            cid, name, contractor, total, start, end, mine_id, section_id, note, created = row
-            tot = db.get_service_contract_totals(cid)
-            mine_name = db.get_mine_name(mine_id) if mine_id else ""
-            self.services_table.setItem(r, 0, QtWidgets.QTableWidgetItem(name))
-            self.services_table.setItem(r, 1, QtWidgets.QTableWidgetItem(contractor or ""))
-            self.services_table.setItem(r, 2, QtWidgets.QTableWidgetItem(money(tot["total"])))
-            self.services_table.setItem(r, 3, QtWidgets.QTableWidgetItem(money(tot["spent"])))
-            self.services_table.setItem(r, 4, QtWidgets.QTableWidgetItem(money(tot["remaining"])))
-            self.services_table.setItem(r, 5, QtWidgets.QTableWidgetItem(mine_name))
-            self.services_table.item(r, 0).setData(QtCore.Qt.ItemDataRole.UserRole, cid)
-        self.services_table.setAlternatingRowColors(True)
+        import service_forecast
+        self.services_model.set_rows(service_forecast.attach(db.list_service_contract_rows()))
+
+    def _services_patch(self, contract_ids):
+        """Перечитать только указанные договоры (после карточки или добавления)."""
+        import service_forecast
+        ids = [int(c) for c in contract_ids]
+        self.services_model.patch_rows(ids, service_forecast.attach(db.list_service_contract_rows(ids)))
+
+    def _services_update_status(self):
+        t = self.services_proxy.totals
+        self.services_status_label.setText(
+            f"Сумма договоров: {money(t['total'])} | Списано: {money(t['spent'])} | "
+            f"Остаток: {money(t['remaining'])} | Показано: {t['count']} из {self.services_model.rowCount()}")
+
+    def _services_on_range_changed(self, key: str):
+        btn, le_from, le_to = self.services_range_edits[key]
+        lo = to_float(le_from.text()) if le_from.text().strip() else None
+        hi = to_float(le_to.text()) if le_to.text().strip() else None
+        self.services_proxy.set_range(key, lo, hi)
+        font = btn.font()
+        font.setBold(lo is not None or hi is not None)
+        btn.setFont(font)
+
+    def _services_reset_range(self, key: str):
+        _btn, le_from, le_to = self.services_range_edits[key]
+        le_from.clear()
+        le_to.clear()
+
+    def _services_reset_filters(self):
+        self.services_filter_edit.clear()
+        for key in self.services_range_edits:
+            self._services_reset_range(key)
 
     def _services_add_contract(self):
         from service_contract_form import ServiceContractDialog
         if ServiceContractDialog(self).exec():
             self._services_refresh()
 
-    def _services_open_contract_card(self, row: int, col: int):
-        item = self.services_table.item(row, 0)
-        cid = item.data(QtCore.Qt.ItemDataRole.UserRole) if item else None
+    def _services_open_contract_card(self, index: QtCore.QModelIndex):
+        cid = index.data(services_model.ID_ROLE) if index.isValid() else None
         if cid is None:
             return
         from service_contract_card import ServiceContractCard
         dlg = ServiceContractCard(cid, self)
         dlg.exec()
-        self._services_refresh()
+        self._services_patch([cid])
+
+    def _services_open_pivot(self):
+        from service_pivot_dialog import ServicePivotDialog
+        ServicePivotDialog(self).exec()
+        self._services_refresh()  # из расшифровки можно открыть карточку договора и изменить акты
 
     def _apply_db_title_services(self):
         try:
@@ -121,9 +382,8 @@ class MainWindow(QtWidgets.QMainWindow):
             self.setWindowTitle("Invest Manager — Услуги")
 
     def _build_invest_ui(self):
-        """Интерфейс для базы «Инвест-проекты»."""
+        """Интерфейс для базы «Инвест-проекты». Возвращает страницу (данные загружает _show_db_ui)."""
         central = QtWidgets.QWidget()
-        self.setCentralWidget(central)
 
         self.add_btn = QtWidgets.QPushButton("➕ Добавить статью")
         self.import_btn = QtWidgets.QPushButton("📥 Импорт проектов")
@@ -131,7 +391,27 @@ class MainWindow(QtWidgets.QMainWindow):
         self.about_btn = QtWidgets.QPushButton("⚙ Настройки")
         self.export_btn = QtWidgets.QPushButton("📤 Экспорт в Excel")
         self.db_btn = QtWidgets.QPushButton("🗂 База…")  # ← ДОБАВИТЬ
-
+        self.tools_btn = QtWidgets.QToolButton()
+        self.tools_btn.setText("🧰 Инструменты")
+        self.tools_btn.setPopupMode(QtWidgets.QToolButton.ToolButtonPopupMode.InstantPopup)
+        self.tools_menu = QtWidgets.QMenu(self)
+        self.tools_menu.addAction("Проверка файлов…", self._open_attachment_check)
+        self.tools_menu.addAction("Служебные записки за период…", self._open_batch_memos)
+        self.tools_menu.addAction("Быстрый поиск… (Ctrl+K)", self._open_search_palette)
+        self.tools_menu.addAction("Анализ потоков ревизий (Excel)…", self._export_revision_graph)
+        self.tools_menu.addAction("Пакетная ревизия…", self._open_bulk_revision)
+        self.tools_menu.addAction("Сценарий перераспределения…", self._open_scenario)
+        self.tools_btn.setMenu(self.tools_menu)
+        self.group_btn = QtWidgets.QPushButton("🌳 По рудникам")
+        self.group_btn.setCheckable(True)
+        self.group_btn.setToolTip("Дерево рудник → участок → статьи с промежуточными итогами")
+        self.asof_btn = QtWidgets.QPushButton("📅 На дату")
+        self.asof_btn.setCheckable(True)
+        self.asof_btn.setToolTip("Показать таблицу такой, какой она была на выбранную дату (только просмотр итогов)")
+        self.asof_date_edit = QtWidgets.QDateEdit(QtCore.QDate.currentDate())
+        self.asof_date_edit.setCalendarPopup(True)
+        self.asof_date_edit.setDisplayFormat("dd.MM.yyyy")
+        self.asof_date_edit.setVisible(False)
 
         
 
@@ -141,6 +421,10 @@ class MainWindow(QtWidgets.QMainWindow):
         top_bar.addWidget(self.import_btn)
         top_bar.addWidget(self.export_btn) 
         top_bar.addWidget(self.refresh_btn)   # ← новая кнопка
+        top_bar.addWidget(self.group_btn)
+        top_bar.addWidget(self.asof_btn)
+        top_bar.addWidget(self.asof_date_edit)
+        top_bar.addWidget(self.tools_btn)
         top_bar.addStretch(1)
         top_bar.addWidget(self.about_btn)
 
@@ -148,13 +432,11 @@ class MainWindow(QtWidgets.QMainWindow):
         
 
         # Таблица: 12 столбцов (+ Статус закупки)
-        self.TABLE_HEADERS = [
-            "Название", "Рудник", "Участок", "Заложено", "Имеется", "Необходимо",
-            "Маркетинг", "Договор", "Остаток", "Исполн. %", "Вне бюджета", "Статус закупки"
-        ]
+        self.TABLE_HEADERS = list(table_style.HEADERS)
         self.table = QtWidgets.QTableWidget(0, 12)
         self.table.setHorizontalHeaderLabels(self.TABLE_HEADERS)
         self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection)  # групповые действия в контекстном меню
         self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
         self.table.horizontalHeader().setSectionsClickable(True)
         self.table.horizontalHeader().sectionClicked.connect(self._on_header_clicked)
@@ -168,6 +450,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.table.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self._on_ctx_menu)
         self.table.setAlternatingRowColors(True)
+        self.table.setItemDelegate(table_style.MainTableDelegate(self.table))
 
         # Строка фильтров: название — текст; суммы — выпадающие меню с ОТ/ДО и кнопкой «Применить»; вне бюджета — выпадающий список
         filter_row = QtWidgets.QHBoxLayout()
@@ -230,6 +513,25 @@ class MainWindow(QtWidgets.QMainWindow):
         filter_row.addWidget(QtWidgets.QLabel("Статус закупки:"))
         filter_row.addWidget(self.filter_status_combo)
 
+        # Наборы фильтров: отбор по выражению делает SQLite (filter_presets), строка фильтров применяется поверх
+        self._preset_ids = None
+        self.preset_combo = QtWidgets.QComboBox()
+        self.preset_combo.setMinimumWidth(160)
+        self.preset_combo.addItem("—")
+        self.preset_combo.currentIndexChanged.connect(self._on_preset_changed)
+        preset_save_btn = QtWidgets.QToolButton()
+        preset_save_btn.setText("💾")
+        preset_save_btn.setToolTip("Сохранить набор фильтров (по умолчанию — из текущей строки фильтров)…")
+        preset_save_btn.clicked.connect(self._save_preset)
+        preset_del_btn = QtWidgets.QToolButton()
+        preset_del_btn.setText("✖")
+        preset_del_btn.setToolTip("Удалить выбранный набор")
+        preset_del_btn.clicked.connect(self._delete_preset)
+        filter_row.addWidget(QtWidgets.QLabel("Набор:"))
+        filter_row.addWidget(self.preset_combo)
+        filter_row.addWidget(preset_save_btn)
+        filter_row.addWidget(preset_del_btn)
+
         reset_all_btn = QtWidgets.QPushButton("🔄")
         reset_all_btn.setToolTip("Сбросить все фильтры")
         reset_all_btn.clicked.connect(self._reset_all_filters)
@@ -243,160 +545,233 @@ class MainWindow(QtWidgets.QMainWindow):
         self.status_label.setStyleSheet("padding: 6px; font-weight: bold;")
         self.status_label.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
         self.status_label.customContextMenuRequested.connect(self._on_status_bar_context_menu)
-        self._status_totals = {}  # заполняется в refresh()
 
         # Сборка лэйаута
         layout = QtWidgets.QVBoxLayout(central)
         layout.addLayout(top_bar)
         layout.addWidget(filter_widget)
-        layout.addWidget(self.table)
+        # Таблица и дерево «По рудникам» (дерево создаётся при первом включении режима)
+        self.filter_widget = filter_widget
+        self.group_tree = None
+        self._view_stack = QtWidgets.QStackedWidget()
+        self._view_stack.addWidget(self.table)
+        layout.addWidget(self._view_stack)
         layout.addWidget(self.status_label)
 
         # Сигналы
         self.add_btn.clicked.connect(self.add_project)
         self.import_btn.clicked.connect(self.on_import_projects)
         self.refresh_btn.clicked.connect(self.refresh)
+        self.group_btn.toggled.connect(self._set_grouped)
+        self.asof_btn.toggled.connect(self._set_asof)
+        self.asof_date_edit.dateChanged.connect(lambda _d: self.refresh())
         self.export_btn.clicked.connect(self.on_export_excel)
         self.about_btn.clicked.connect(self._open_settings)
         self.table.cellDoubleClicked.connect(self.open_project_card)
         self.db_btn.clicked.connect(self._show_db_menu)  # ← ДОБАВИТЬ
-
-
-        # Загрузка
-        self.refresh()
-        self._apply_column_settings()
-        self._apply_db_title()  # ← ДОБАВИТЬ
-        self._show_opened_toast()
+        search_shortcut = QShortcut(QKeySequence("Ctrl+K"), central)
+        search_shortcut.setContext(QtCore.Qt.ShortcutContext.WidgetWithChildrenShortcut)
+        search_shortcut.activated.connect(self._open_search_palette)
+        return central
 
     def _restore_window_geometry(self):
         """Восстановить положение, размер и состояние окна (развёрнуто/нормальное) из настроек."""
-        settings = QSettings()
-        geom = settings.value("mainwindow/geometry")
+        geom = preferences.value("mainwindow/geometry")
         if geom is not None:
             self.restoreGeometry(geom)
-        maximized = settings.value("mainwindow/maximized", False)
-        if maximized in (True, "true", 1, "1"):
+        if preferences.get_bool("mainwindow/maximized", False):
             self.showMaximized()
 
     def closeEvent(self, event):
         """Сохранить положение, размер и состояние окна перед закрытием."""
-        settings = QSettings()
-        settings.setValue("mainwindow/geometry", self.saveGeometry())
-        settings.setValue("mainwindow/maximized", self.isMaximized())
+        preferences.set_value("mainwindow/geometry", self.saveGeometry())
+        preferences.set_value("mainwindow/maximized", self.isMaximized())
+        preferences.flush()
+        for loader in list(getattr(self, "_loaders", [])):
+            loader.wait(2000)
+        self._content_index_timer.stop()
+        if self._content_indexer is not None:
+            self._content_indexer.cancel()
+            self._content_indexer.wait(5000)
         event.accept()
 
     def refresh(self):
-        rows = db.list_projects()
+        """Перечитать таблицу из БД (один запрос) и перерисовать."""
+        self._rows_gen += 1  # результат фоновой проверки снимка, запущенной раньше, уже не нужен
+        if self.asof_btn.isChecked():
+            import asof
+            rows = asof.project_rows(self.asof_date_edit.date().toString("yyyy-MM-dd"))
+            if not self._patch_rows(rows):
+                self._update_status_label()
+            return
+        rows, version = db.list_project_rows()
+        old = self._rows_by_id
+        changed = [row[0] for row in rows if old.get(row[0]) != row]
+        self._paint_rows(rows)
+        self._rows_version = version
+        table_snapshot.save(db.get_db_path(), version, rows, self._status_totals)
+        self._sync_group_tree(changed)
+        self._schedule_content_index()  # могли добавиться вложения
+
+    def _schedule_content_index(self):
+        """Обновить индекс содержимого вложений в фоне — через паузу, чтобы серия изменений дала один проход."""
+        self._content_index_timer.start(CONTENT_INDEX_DELAY_MS)
+
+    def _start_content_index(self):
+        if self._db_type != "invest":
+            return
+        if self._content_indexer is not None:
+            self._content_index_again = True  # дойдёт до конца и запустится ещё раз
+            return
+        self._content_indexer = _ContentIndexer(self)
+        self._content_indexer.finished.connect(self._on_content_index_finished)
+        self._content_indexer.start()
+
+    def _on_content_index_finished(self):
+        self._content_indexer.deleteLater()
+        self._content_indexer = None
+        if self._content_index_again:
+            self._content_index_again = False
+            self._start_content_index()
+
+    def _set_asof(self, on: bool):
+        """Режим «на дату»: таблица пересчитывается из журнала событий (asof.py), дерево по рудникам недоступно."""
+        self.asof_date_edit.setVisible(on)
+        if on and self.group_btn.isChecked():
+            self.group_btn.setChecked(False)
+        self.group_btn.setEnabled(not on)
+        self.refresh()
+
+    def _set_grouped(self, on: bool):
+        """Переключить вид: таблица или дерево «По рудникам» (режим запоминается)."""
+        preferences.set_value("mainwindow/grouped", bool(on))
+        self._show_view(on)
+        if on:
+            self.group_tree.reload()
+
+    def _show_view(self, grouped: bool):
+        if grouped and self.group_tree is None:
+            from group_tree import GroupTreeWidget
+            self.group_tree = GroupTreeWidget()
+            self.group_tree.projectActivated.connect(self._open_project_card_by_id)
+            self._view_stack.addWidget(self.group_tree)
+        self._view_stack.setCurrentWidget(self.group_tree if grouped else self.table)
+        self.filter_widget.setVisible(not grouped)  # фильтры относятся к таблице
+
+    def _sync_group_tree(self, changed_pids=None):
+        """После изменения данных: видимое дерево обновляет только затронутые группы, скрытое — сбрасывается."""
+        if self.group_tree is None:
+            return
+        if self.group_btn.isChecked():
+            self.group_tree.reload(changed_pids)
+        else:
+            self.group_tree.clear_groups()
+
+    def _paint_rows(self, rows: list[tuple]):
+        """Заполнить таблицу строками db.list_project_rows (или из снимка) и пересчитать итоги."""
+        self.table.setUpdatesEnabled(False)
         self.table.setRowCount(len(rows))
-        total_budget = 0.0
-        total_contract = 0.0
-        total_remainder = 0.0
-        total_need = 0.0
-        total_have = 0.0
-        over_budget_count = 0
-        for r, (pid, name, base_budget, comment, created_at, out_of_budget, mine_id, section_id, procurement_status) in enumerate(rows):
-            status = db.compute_project_status(pid)
-            mine_name = db.get_mine_name(mine_id) if mine_id else ""
-            section_name = db.get_section_name(section_id) if section_id else ""
-            budget_val = float(base_budget) if base_budget is not None else 0.0
-            have_val = status["have"] if status["have"] is not None else 0.0
-            contract_val = status["contract_amount"] if status["contract_amount"] is not None else 0.0
-            total_budget += budget_val
-            total_contract += contract_val
-            total_remainder += status["diff"] if status["diff"] is not None else 0.0
-            total_need += status["need"] if status["need"] is not None else 0.0
-            total_have += status["have"] if status["have"] is not None else 0.0
-            if status["diff"] is not None and status["diff"] < 0:
-                over_budget_count += 1
-
-            name_item = QtWidgets.QTableWidgetItem(name)
-            mine_item = QtWidgets.QTableWidgetItem(mine_name)
-            section_item = QtWidgets.QTableWidgetItem(section_name)
-            budget_item = QtWidgets.QTableWidgetItem(money(budget_val))
-            budget_item.setData(QtCore.Qt.ItemDataRole.UserRole, budget_val)
-            have_item = QtWidgets.QTableWidgetItem(money(status["have"]))
-            need_item = QtWidgets.QTableWidgetItem(money(status["need"]))
-            marketing_item = QtWidgets.QTableWidgetItem(money(status["marketing_amount"]) if status["marketing_amount"] is not None else "—")
-            contract_item = QtWidgets.QTableWidgetItem(money(status["contract_amount"]) if status["contract_amount"] is not None else "—")
-            diff_item = QtWidgets.QTableWidgetItem(money(status["diff"]))
-            have_item.setData(QtCore.Qt.ItemDataRole.UserRole, status["have"])
-            need_item.setData(QtCore.Qt.ItemDataRole.UserRole, status["need"])
-            marketing_item.setData(QtCore.Qt.ItemDataRole.UserRole, status["marketing_amount"] if status["marketing_amount"] is not None else -float("inf"))
-            contract_item.setData(QtCore.Qt.ItemDataRole.UserRole, status["contract_amount"] if status["contract_amount"] is not None else -float("inf"))
-            diff_item.setData(QtCore.Qt.ItemDataRole.UserRole, status["diff"])
-            # Исполн. % = по договорам исполнено / заложено × 100 (сколько от бюджета уже исполнено по договорам)
-            if budget_val and contract_val is not None:
-                pct = round((contract_val / budget_val) * 100, 1)
-                exec_pct_item = QtWidgets.QTableWidgetItem(f"{pct}%")
-                exec_pct_item.setData(QtCore.Qt.ItemDataRole.UserRole, pct)
-            else:
-                exec_pct_item = QtWidgets.QTableWidgetItem("—")
-                exec_pct_item.setData(QtCore.Qt.ItemDataRole.UserRole, -float("inf"))
-            out_item = QtWidgets.QTableWidgetItem()
-            out_item.setFlags(
-                (out_item.flags() & ~QtCore.Qt.ItemFlag.ItemIsEditable)
-                & ~QtCore.Qt.ItemFlag.ItemIsUserCheckable
-            )
-            out_item.setCheckState(QtCore.Qt.CheckState.Checked if out_of_budget else QtCore.Qt.CheckState.Unchecked)
-            out_item.setText("")
-            out_item.setData(QtCore.Qt.ItemDataRole.UserRole, pid)
-
-            status_item = QtWidgets.QTableWidgetItem(procurement_status if procurement_status else "—")
-            status_item.setFlags(status_item.flags() & ~QtCore.Qt.ItemFlag.ItemIsEditable)
-
-            for it in (budget_item, have_item, need_item, marketing_item, contract_item, diff_item, exec_pct_item):
-                it.setTextAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
-
-            self.table.setItem(r, 0, name_item)
-            self.table.setItem(r, 1, mine_item)
-            self.table.setItem(r, 2, section_item)
-            self.table.setItem(r, 3, budget_item)
-            self.table.setItem(r, 4, have_item)
-            self.table.setItem(r, 5, need_item)
-            self.table.setItem(r, 6, marketing_item)
-            self.table.setItem(r, 7, contract_item)
-            self.table.setItem(r, 8, diff_item)
-            self.table.setItem(r, 9, exec_pct_item)
-            self.table.setItem(r, 10, out_item)
-            self.table.setItem(r, 11, status_item)
-
-            # Подсветка строки по stage
-            stage = status["stage"]
-            if stage == "contract":
-                self._set_row_bg(r, "#0f3e5a")
-            elif stage == "marketing":
-                self._set_row_bg(r, "#1f4a3b")
-            else:
-                self._set_row_bg(r, "#2f2f2f")
-
-            if status["need"] <= status["have"]:
-                need_item.setForeground(QBrush(QtCore.Qt.GlobalColor.green))
-            else:
-                need_item.setForeground(QBrush(QtCore.Qt.GlobalColor.red))
-            if status["diff"] >= 0:
-                diff_item.setForeground(QBrush(QtCore.Qt.GlobalColor.green))
-            else:
-                diff_item.setForeground(QBrush(QtCore.Qt.GlobalColor.red))
-
-            name_item.setData(QtCore.Qt.ItemDataRole.UserRole, pid)
-
-        self._status_totals = {
-            "budget": total_budget, "contract": total_contract, "remainder": total_remainder,
-            "need": total_need, "have": total_have, "over_budget_count": over_budget_count,
-        }
+        for r, row in enumerate(rows):
+            self._fill_row(r, row)
+        self._rows_by_id = {row[0]: row for row in rows}
+        self._status_totals = _totals_from_rows(rows)
+        self._refresh_preset_ids()
         self._apply_sort()
         self._apply_filter()
+        self.table.setUpdatesEnabled(True)
         self._update_status_label()
 
-    def _set_row_bg(self, row: int, color_hex: str):
-        for col in range(self.table.columnCount()):
-            it = self.table.item(row, col)
-            if it:
-                it.setBackground(QBrush(QtCore.Qt.GlobalColor.transparent))
-        for col in range(self.table.columnCount()):
-            item = self.table.item(row, col)
-            if item:
-                item.setBackground(QColor(color_hex))
+    def _fill_row(self, r: int, row: tuple):
+        """Ячейки одной строки таблицы: только сырые значения, оформление — в table_style.MainTableDelegate."""
+        pid, stage = row[0], row[10]
+        values = table_style.column_values(row)
+        name, mine_name, section_name = values[:3]
+        out_of_budget, procurement_status = values[10], values[11]
+
+        name_item = QtWidgets.QTableWidgetItem(name)
+        name_item.setData(QtCore.Qt.ItemDataRole.UserRole, pid)
+        name_item.setData(table_style.STAGE_ROLE, stage)
+        self.table.setItem(r, 0, name_item)
+        self.table.setItem(r, 1, QtWidgets.QTableWidgetItem(mine_name))
+        self.table.setItem(r, 2, QtWidgets.QTableWidgetItem(section_name))
+        for col, val in enumerate(values[3:10], start=3):
+            it = QtWidgets.QTableWidgetItem()
+            it.setData(QtCore.Qt.ItemDataRole.UserRole, val if val is not None else -float("inf"))
+            self.table.setItem(r, col, it)
+
+        out_item = QtWidgets.QTableWidgetItem()
+        out_item.setFlags(
+            (out_item.flags() & ~QtCore.Qt.ItemFlag.ItemIsEditable)
+            & ~QtCore.Qt.ItemFlag.ItemIsUserCheckable
+        )
+        out_item.setCheckState(QtCore.Qt.CheckState.Checked if out_of_budget else QtCore.Qt.CheckState.Unchecked)
+        out_item.setData(QtCore.Qt.ItemDataRole.UserRole, pid)
+        self.table.setItem(r, 10, out_item)
+
+        status_item = QtWidgets.QTableWidgetItem(procurement_status)
+        status_item.setFlags(status_item.flags() & ~QtCore.Qt.ItemFlag.ItemIsEditable)
+        self.table.setItem(r, 11, status_item)
+
+    def _patch_rows(self, rows: list[tuple]) -> bool:
+        """Обновить только изменившиеся, добавленные и удалённые строки. False — если менять нечего."""
+        new = {row[0]: row for row in rows}
+        old = getattr(self, "_rows_by_id", {})
+        pos = {}
+        for r in range(self.table.rowCount()):
+            it = self.table.item(r, 0)
+            if it is not None:
+                pos[it.data(QtCore.Qt.ItemDataRole.UserRole)] = r
+        changed = [pid for pid, row in new.items() if pid in pos and old.get(pid) != row]
+        removed = [pid for pid in pos if pid not in new]
+        added = [pid for pid in new if pid not in pos]
+        if not (changed or removed or added):
+            return False
+        self.table.setUpdatesEnabled(False)
+        for pid in changed:
+            self._fill_row(pos[pid], new[pid])
+        for r in sorted((pos[pid] for pid in removed), reverse=True):
+            self.table.removeRow(r)
+        for pid in added:
+            n = self.table.rowCount()
+            self.table.insertRow(n)
+            self._fill_row(n, new[pid])
+        self._rows_by_id = new
+        self._status_totals = _totals_from_rows(rows)
+        if changed or added:
+            self._apply_sort()
+        self._refresh_preset_ids()
+        self._apply_filter()
+        self.table.setUpdatesEnabled(True)
+        return True
+
+    def _paint_snapshot(self) -> bool:
+        """Нарисовать сохранённый снимок таблицы и запустить фоновую проверку. False — снимка нет."""
+        snap = table_snapshot.load(db.get_db_path())
+        if snap is None:
+            return False
+        self._paint_rows(snap["rows"])
+        self._rows_version = snap["data_version"]
+        self._start_revalidate(snap["data_version"])
+        return True
+
+    def _start_revalidate(self, known_version: int):
+        """Дочитать свежие строки в фоне; если data_version не изменился — ничего не делать."""
+        self._rows_gen += 1
+        loader = _RowsLoader(self._rows_gen, known_version, self)
+        loader.loaded.connect(self._on_rows_revalidated)
+        loader.finished.connect(lambda l=loader: self._loaders.remove(l) if l in self._loaders else None)
+        loader.finished.connect(loader.deleteLater)
+        self._loaders.append(loader)
+        loader.start()
+
+    def _on_rows_revalidated(self, gen, rows, version):
+        if gen != self._rows_gen or self._db_type != "invest" or rows is None or self.asof_btn.isChecked():
+            return
+        old = self._rows_by_id
+        if self._patch_rows(rows):
+            self._sync_group_tree([row[0] for row in rows if old.get(row[0]) != row])
+        self._rows_version = version
+        table_snapshot.save(db.get_db_path(), version, rows, self._status_totals)
 
     def _get_sort_key(self, row: int, column: int):
         """Ключ для сортировки. Столбцы 0,1,2,11 — текст; 3–9 — числа; 10 — галочка."""
@@ -411,6 +786,8 @@ class MainWindow(QtWidgets.QMainWindow):
                 return (-float("inf"), 0.0)
         if column == 10:
             return (0, 1 if item.checkState() == QtCore.Qt.CheckState.Checked else 0)
+        if column == 11:
+            return (1, table_style.format_cell(11, item.text()).lower())
         return (1, (item.text() or "").lower())
 
     def _on_header_clicked(self, logical_index: int):
@@ -492,6 +869,62 @@ class MainWindow(QtWidgets.QMainWindow):
         self.filter_status_combo.blockSignals(True)
         self.filter_status_combo.setCurrentIndex(0)
         self.filter_status_combo.blockSignals(False)
+        self.preset_combo.blockSignals(True)
+        self.preset_combo.setCurrentIndex(0)
+        self.preset_combo.blockSignals(False)
+        self._preset_ids = None
+        self._apply_filter()
+
+    def _reload_presets(self, select: str = ""):
+        """Перечитать наборы текущей базы в список и выбрать select (если есть)."""
+        self.preset_combo.blockSignals(True)
+        self.preset_combo.clear()
+        self.preset_combo.addItem("—")
+        for _id, name, expression in db.list_filter_presets():
+            self.preset_combo.addItem(name, expression)
+        self.preset_combo.setCurrentIndex(max(self.preset_combo.findText(select), 0) if select else 0)
+        self.preset_combo.blockSignals(False)
+        self._refresh_preset_ids()
+
+    def _refresh_preset_ids(self):
+        """Статьи, подходящие под выбранный набор (запрос к БД); None — набор не выбран."""
+        expression = self.preset_combo.currentData() if self.preset_combo.currentIndex() > 0 else None
+        if not expression:
+            self._preset_ids = None
+            return
+        try:
+            self._preset_ids = set(filter_presets.matching_ids(expression))
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Набор фильтров", f"«{self.preset_combo.currentText()}»: {e}")
+            self.preset_combo.blockSignals(True)
+            self.preset_combo.setCurrentIndex(0)
+            self.preset_combo.blockSignals(False)
+            self._preset_ids = None
+
+    def _on_preset_changed(self, _index: int):
+        self._refresh_preset_ids()
+        self._apply_filter()
+
+    def _save_preset(self):
+        from filter_preset_form import FilterPresetDialog
+        if self.preset_combo.currentIndex() > 0:
+            name, expression = self.preset_combo.currentText(), self.preset_combo.currentData()
+        else:
+            name, expression = "", filter_presets.expression_from_filter(self._filter_state())
+        dlg = FilterPresetDialog(name, expression, self)
+        if dlg.exec():
+            self._reload_presets(dlg.saved_name)
+            self._apply_filter()
+
+    def _delete_preset(self):
+        if self.preset_combo.currentIndex() <= 0:
+            return
+        name = self.preset_combo.currentText()
+        reply = QtWidgets.QMessageBox.question(self, "Набор фильтров", f"Удалить набор «{name}»?")
+        if reply != QtWidgets.QMessageBox.StandardButton.Yes:
+            return
+        db.delete_filter_preset(name)
+        self._reload_presets()
         self._apply_filter()
 
     def _apply_filter(self):
@@ -506,6 +939,10 @@ class MainWindow(QtWidgets.QMainWindow):
                 cell_text = (item0.text() if item0 else "").lower()
                 if name_sub not in cell_text:
                     show = False
+            if show and self._preset_ids is not None:
+                item0 = self.table.item(r, 0)
+                if not item0 or item0.data(QtCore.Qt.ItemDataRole.UserRole) not in self._preset_ids:
+                    show = False
             if not show:
                 self.table.setRowHidden(r, True)
                 continue
@@ -571,6 +1008,8 @@ class MainWindow(QtWidgets.QMainWindow):
             parts.append(f"Показано: {visible_count} из {total_count}")
         if visible.get("over_budget", True):
             parts.append(f"С перерасходом: {t['over_budget_count']}")
+        if self.asof_btn.isChecked():
+            parts.insert(0, f"На {self.asof_date_edit.date().toString('dd.MM.yyyy')}")
         self.status_label.setText(" | ".join(parts) if parts else "—")
 
     def _on_status_bar_context_menu(self, _pos):
@@ -606,13 +1045,62 @@ class MainWindow(QtWidgets.QMainWindow):
             self._update_status_label()
 
     def add_project(self):
+        from add_project_form import AddProjectDialog
         dlg = AddProjectDialog(self)
         if dlg.exec():
             self.refresh()
 
     def show_about(self):
+        from about_dialog import AboutDialog
         AboutDialog(self).exec()
 
+    def _open_attachment_check(self):
+        """Проверка вложений: записи без файла, лишние файлы в папке базы, дубликаты."""
+        from attachment_check_dialog import AttachmentCheckDialog
+        dlg = AttachmentCheckDialog(self)
+        dlg.start_scan()
+        dlg.exec()
+        self.refresh()
+
+    def _open_search_palette(self):
+        from search_palette import SearchPalette
+        dlg = SearchPalette(self)
+        if dlg.exec() and dlg.project_id is not None:
+            self._open_project_card_by_id(dlg.project_id)
+
+    def _open_batch_memos(self):
+        """Пакетное формирование служебных записок по ревизиям за период."""
+        from batch_memo_dialog import BatchMemoDialog
+        BatchMemoDialog(self).exec()
+
+    def _open_bulk_revision(self):
+        """Ревизия из одной статьи в несколько (или наоборот) одной транзакцией; источник — выделенная статья."""
+        from bulk_revision_form import BulkRevisionDialog
+        item = self.table.item(self.table.currentRow(), 0) if self.table.currentRow() >= 0 else None
+        pid = item.data(QtCore.Qt.ItemDataRole.UserRole) if item else None
+        if BulkRevisionDialog(self, project_id=pid).exec() == QtWidgets.QDialog.DialogCode.Accepted:
+            self.refresh()
+
+    def _open_scenario(self):
+        """Сценарий «что если»: ревизии, корректировки и договоры в памяти, проведение одной транзакцией."""
+        from scenario_dialog import ScenarioDialog
+        if ScenarioDialog(self).exec() == QtWidgets.QDialog.DialogCode.Accepted:
+            self.refresh()
+
+    def _export_revision_graph(self):
+        """Сальдо между рудниками, встречные переводы, циклы и доноры — отчётом в Excel (revision_graph)."""
+        from PyQt6.QtWidgets import QFileDialog, QMessageBox
+        path, _ = QFileDialog.getSaveFileName(self, "Анализ потоков ревизий", "Потоки ревизий.xlsx", "Excel (*.xlsx)")
+        if not path:
+            return
+        import revision_graph
+        try:
+            out = revision_graph.export(path, revision_graph.RevisionGraph.load())
+        except (RuntimeError, OSError) as e:
+            QMessageBox.warning(self, "Анализ потоков ревизий", str(e))
+            return
+        QMessageBox.information(self, "Анализ потоков ревизий", f"Файл сохранён:\n{out}")
+
     def _open_settings(self):
         dlg = SettingsDialog(self, invest_mode=(self._db_type == "invest"))
         if dlg.exec():
@@ -641,27 +1129,24 @@ class MainWindow(QtWidgets.QMainWindow):
         """Восстановить ширину столбцов главной таблицы из QSettings (при первом запуске — разумные по умолчанию)."""
         if not hasattr(self, "table") or self.table.columnCount() != 12:
             return
-        settings = QSettings()
         for c in range(12):
-            w = settings.value(self.MAIN_TABLE_WIDTH_PREFIX + str(c))
-            if w is not None:
-                try:
-                    self.table.setColumnWidth(c, int(w))
-                except (ValueError, TypeError):
-                    self.table.setColumnWidth(c, self._DEFAULT_COL_WIDTHS[c])
-            else:
-                self.table.setColumnWidth(c, self._DEFAULT_COL_WIDTHS[c])
+            w = preferences.get_int(self.MAIN_TABLE_WIDTH_PREFIX + str(c))
+            self.table.setColumnWidth(c, w if w is not None else self._DEFAULT_COL_WIDTHS[c])
 
     def _on_column_resized(self, logical_index: int, old_size: int, new_size: int):
-        """Сохранить ширину столбца главной таблицы в QSettings."""
+        """Сохранить ширину столбца главной таблицы (в QSettings попадёт пакетом, см. preferences)."""
         if 0 <= logical_index < 12:
-            QSettings().setValue(self.MAIN_TABLE_WIDTH_PREFIX + str(logical_index), new_size)
+            preferences.set_value(self.MAIN_TABLE_WIDTH_PREFIX + str(logical_index), new_size)
 
     def open_project_card(self, row: int, col: int):
         item = self.table.item(row, 0)
         pid = item.data(QtCore.Qt.ItemDataRole.UserRole) if item else None
         if pid is None:
             return
+        self._open_project_card_by_id(pid)
+
+    def _open_project_card_by_id(self, pid: int):
+        from project_card import ProjectCard
         dlg = ProjectCard(pid, self)
         dlg.exec()          # пользователь внёс изменения и закрыл карточку
         self.refresh()      # ← сразу подтягиваем свежие данные в главном окне
@@ -673,18 +1158,112 @@ class MainWindow(QtWidgets.QMainWindow):
         item = self.table.item(row, 0)
         return item.data(QtCore.Qt.ItemDataRole.UserRole) if item else None
 
+    def _selected_project_ids(self) -> list[int]:
+        """id выделенных видимых строк (в порядке таблицы)."""
+        ids = []
+        for index in sorted(self.table.selectionModel().selectedRows(), key=lambda i: i.row()):
+            item = self.table.item(index.row(), 0)
+            if item is not None and not self.table.isRowHidden(index.row()):
+                ids.append(item.data(QtCore.Qt.ItemDataRole.UserRole))
+        return ids
+
     def _on_ctx_menu(self, pos):
         pid = self._current_project_id()
         if pid is None:
             return
+        ids = self._selected_project_ids() or [pid]
         menu = QtWidgets.QMenu(self)
-        act_rename = menu.addAction("Переименовать…")
-        act_delete = menu.addAction("Удалить статью…")
+        act_rename = act_delete = None
+        if len(ids) == 1:
+            act_rename = menu.addAction("Переименовать…")
+            act_delete = menu.addAction("Удалить статью…")
+            menu.addSeparator()
+        else:
+            menu.addSection(f"Выделено статей: {len(ids)}")
+        status_menu = menu.addMenu("Статус закупки")
+        status_acts = {status_menu.addAction(s): s for s in db.PROCUREMENT_STATUSES}
+        status_menu.addSeparator()
+        status_acts[status_menu.addAction("— сбросить")] = None
+        act_mine = menu.addAction("Рудник / участок…")
+        out_menu = menu.addMenu("Вне бюджета")
+        act_out_on = out_menu.addAction("Да")
+        act_out_off = out_menu.addAction("Нет")
         action = menu.exec(self.table.viewport().mapToGlobal(pos))
+        if action is None:
+            return
         if action == act_rename:
             self._rename_project(pid)
         elif action == act_delete:
             self._delete_project(pid)
+        elif action in status_acts:
+            self._bulk_update(ids, {"procurement_status": status_acts[action]})
+        elif action in (act_out_on, act_out_off):
+            self._bulk_update(ids, {"out_of_budget": action == act_out_on})
+        elif action == act_mine:
+            values = self._ask_mine_section(len(ids))
+            if values is not None:
+                self._bulk_update(ids, values)
+
+    def _ask_mine_section(self, count: int) -> dict | None:
+        """Выбор рудника и участка для выделенных статей. None — отмена."""
+        from theme import apply_dialog_theme
+        dlg = QtWidgets.QDialog(self)
+        dlg.setWindowTitle("Рудник / участок" + (f" — статей: {count}" if count > 1 else ""))
+        apply_dialog_theme(dlg)
+        mine_combo = QtWidgets.QComboBox()
+        mine_combo.addItem("—", None)
+        for mid, mname in db.list_mines():
+            mine_combo.addItem(mname, mid)
+        section_combo = QtWidgets.QComboBox()
+
+        def on_mine_changed():
+            section_combo.clear()
+            section_combo.addItem("—", None)
+            mid = mine_combo.currentData()
+            if mid is not None:
+                for sid, _, sname in db.list_sections(mine_id=mid):
+                    section_combo.addItem(sname, sid)
+
+        mine_combo.currentIndexChanged.connect(on_mine_changed)
+        on_mine_changed()
+        form = QtWidgets.QFormLayout(dlg)
+        form.addRow("Рудник:", mine_combo)
+        form.addRow("Участок:", section_combo)
+        bb = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.StandardButton.Ok | QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        bb.accepted.connect(dlg.accept)
+        bb.rejected.connect(dlg.reject)
+        form.addRow(bb)
+        if dlg.exec() != QtWidgets.QDialog.DialogCode.Accepted:
+            return None
+        return {"mine_id": mine_combo.currentData(), "section_id": section_combo.currentData()}
+
+    def _bulk_update(self, project_ids: list[int], values: dict):
+        """Групповое изменение полей (одна транзакция) и перерисовка только затронутых строк."""
+        try:
+            db.update_projects_bulk(project_ids, values)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Групповое изменение", str(e))
+            return
+        self._refresh_rows(project_ids)
+
+    def _refresh_rows(self, project_ids: list[int]):
+        """Перечитать из БД только строки project_ids и обновить их в таблице, итогах и дереве."""
+        if self.asof_btn.isChecked():
+            self.refresh()
+            return
+        self._rows_gen += 1
+        fresh, _version = db.list_project_rows(project_ids)
+        merged = dict(self._rows_by_id)
+        for pid in project_ids:
+            merged.pop(pid, None)
+        merged.update((row[0], row) for row in fresh)
+        rows = sorted(merged.values())
+        if self._patch_rows(rows):
+            self._sync_group_tree(project_ids)
+        # Остальные строки могли измениться в другом процессе: снимок помечается версией последнего
+        # полного чтения, и при следующем запуске он будет перепроверен (_start_revalidate)
+        if self._rows_version is not None:
+            table_snapshot.save(db.get_db_path(), self._rows_version, rows, self._status_totals)
 
     def _rename_project(self, project_id: int):
         # текущее имя
@@ -756,7 +1335,11 @@ class MainWindow(QtWidgets.QMainWindow):
             for logical in logical_cols:
                 item = self.table.item(r, logical)
                 if logical == 10:
-                    val = "Да" if item and item.checkState() == QtCore.Qt.CheckState.Checked else "Нет"
+                    val = table_style.format_cell(logical, item is not None and item.checkState() == QtCore.Qt.CheckState.Checked)
+                elif logical in table_style.NUMERIC_COLUMNS:
+                    val = table_style.format_cell(logical, item.data(QtCore.Qt.ItemDataRole.UserRole) if item else None)
+                elif logical == table_style.STATUS_COLUMN:
+                    val = table_style.format_cell(logical, item.text() if item else "")
                 else:
                     val = (item.text() or "").strip()
                 row_data.append(val)
@@ -773,6 +1356,7 @@ class MainWindow(QtWidgets.QMainWindow):
             return
         try:
             headers, rows = self._get_export_data()
+            import export_excel
             out = export_excel.export_table_to_excel(path, headers, rows)
             QMessageBox.information(self, "Экспорт в Excel", f"Файл сохранён:\n{out}")
         except RuntimeError as e:
@@ -783,6 +1367,7 @@ class MainWindow(QtWidgets.QMainWindow):
             QMessageBox.critical(self, "Экспорт в Excel", f"Ошибка экспорта:\n{e}")
     
     def on_import_projects(self):
+        from bulk_import import BulkImportDialog
         dlg = BulkImportDialog(self)
         if dlg.exec():
             self.refresh()
@@ -814,9 +1399,8 @@ class MainWindow(QtWidgets.QMainWindow):
         menu.addSeparator()
 
 
-        settings = QSettings()
         current_db = os.path.abspath(db.get_db_path())
-        recent = settings.value("db/recent", [], list)
+        recent = preferences.get_list("db/recent")
         recent = [p for p in recent if isinstance(p, str) and os.path.exists(p)]
         if recent:
             for p in recent[:8]:
@@ -829,7 +1413,8 @@ class MainWindow(QtWidgets.QMainWindow):
             a = menu.addAction("(нет недавних)")
             a.setEnabled(False)
 
-        act = menu.exec(self.db_btn.mapToGlobal(self.db_btn.rect().bottomLeft()))
+        btn = self.services_db_btn if self._db_type == "services" else self.db_btn
+        act = menu.exec(btn.mapToGlobal(btn.rect().bottomLeft()))
         if not act:
             return
         text = act.text()
@@ -871,18 +1456,7 @@ class MainWindow(QtWidgets.QMainWindow):
             db.ensure_data_dirs()
             db.init_db(db_type=new_type)
             self._remember_recent(path)
-            self._db_type = new_type
-            # Перестроить интерфейс под тип новой базы (сейчас может быть другой тип)
-            if new_type == "services":
-                self._build_services_ui()
-            else:
-                self._build_invest_ui()
-            if hasattr(self, "_services_refresh"):
-                self._apply_db_title_services()
-                self._services_refresh()
-            else:
-                self._apply_db_title()
-                self.refresh()
+            self._show_db_ui(new_type)
             self._show_opened_toast()
             QtWidgets.QMessageBox.information(self, "База данных", f"Создана база:\n{path}")
         except Exception as e:
@@ -893,37 +1467,9 @@ class MainWindow(QtWidgets.QMainWindow):
         try:
             db.set_db_path(path)
             db.ensure_data_dirs()
-            db.init_db()
+            db_type = db.open_db()
             self._remember_recent(path)
-            db_type = db.get_db_type()
-            self._db_type = db_type  # иначе после переключения с «Услуги» строка состояния не обновляется
-            # Перестроить интерфейс под тип открытой базы
-            if db_type == "services":
-                self._build_services_ui()
-            else:
-                self._build_invest_ui()
-            try:
-                if hasattr(self, "_services_refresh"):
-                    self._apply_db_title_services()
-                    self._services_refresh()
-                else:
-                    self._apply_db_title()
-                    self.refresh()
-            except Exception as e:
-                if "service_contracts" in str(e):
-                    # В файле записан тип «услуги», но таблицы нет — исправляем тип и показываем как инвест
-                    db.set_db_type_meta("invest")
-                    self._db_type = "invest"
-                    self._build_invest_ui()
-                    self._apply_db_title()
-                    self.refresh()
-                    self._show_opened_toast()
-                    QtWidgets.QMessageBox.information(
-                        self, "База данных",
-                        f"База открыта как «Инвест-проекты».\nАктивная база:\n{path}"
-                    )
-                    return
-                raise
+            self._show_db_ui(db_type)
             self._show_opened_toast()
             QtWidgets.QMessageBox.information(self, "База данных", f"Активная база:\n{path}")
         except Exception as e:
@@ -931,12 +1477,11 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.critical(self, "База данных", f"Не удалось подключить базу:\n{msg}")
 
     def _remember_recent(self, path: str):
-        settings = QSettings()
-        recent = settings.value("db/recent", [], list)
+        recent = preferences.get_list("db/recent")
         path = os.path.abspath(path)
         recent = [path] + [p for p in recent if isinstance(p, str) and p != path]
-        settings.setValue("db/recent", recent[:12])
-        settings.setValue("db/last_path", path)
+        preferences.set_value("db/recent", recent[:12])
+        preferences.set_value("db/last_path", path)
 
     def _db_save_as_dialog(self):
         path, _ = QtWidgets.QFileDialog.getSaveFileName(
@@ -949,12 +1494,11 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.information(self, "Сохранение",
                                             f"База сохранена как:\n{new_path}")
             self._remember_recent(new_path)
-            if hasattr(self, "_services_refresh"):
-                self._apply_db_title_services()
-                self._services_refresh()
-            else:
-                self._apply_db_title()
-                self.refresh()
+            if self._db_type == "invest" and self._invest_page is not None:
+                self._filter_states[new_path] = self._filter_state()  # копия открывается с теми же фильтрами
+            elif self._db_type == "services" and self._services_page is not None:
+                self._filter_states[new_path] = self._services_filter_state()
+            self._show_db_ui(self._db_type)
         except Exception as e:
             msg = db._format_db_error(e) if hasattr(db, "_format_db_error") else str(e)
             QtWidgets.QMessageBox.critical(self, "Сохранение", f"Ошибка:\n{msg}")
@@ -4,6 +4,7 @@ from PyQt6.QtCore import QDate
 import db, os
 from utils import to_float
 from theme import apply_dialog_theme
+import attachment_transfer
 
 class MarketingDialog(QtWidgets.QDialog):
     def __init__(self, project_id: int, parent=None, record_id: int | None = None, prefill: dict | None = None):
@@ -109,12 +110,14 @@ class MarketingDialog(QtWidgets.QDialog):
             if os.path.isfile(abs_path):
                 project_dir = os.path.abspath(db.get_project_files_dir(self.project_id))
                 abs_path_n = os.path.abspath(abs_path)
-                if not abs_path_n.startswith(project_dir):
+                if not abs_path_n.startswith(project_dir) and not db.is_in_attachment_store(abs_path_n):
                     try:
-                        file_path = db.copy_attachment_to_files(abs_path, "marketing", self.project_id)
+                        file_path = attachment_transfer.copy_with_progress(self, abs_path, "marketing", self.project_id)
                     except Exception as e:
                         QtWidgets.QMessageBox.warning(self, "Файл", f"Не удалось скопировать файл: {e}")
                         return
+                    if file_path is None:
+                        return  # копирование отменено — остаёмся в форме
                 else:
                     file_path = os.path.relpath(abs_path_n, db.DATA_DIR)
             else:
@@ -0,0 +1,112 @@
+# preferences.py
+# Настройки приложения в памяти поверх QSettings. Все ключи читаются один раз при первом обращении,
+# дальше чтения идут из памяти (в Windows QSettings — это реестр). Записи копятся и сбрасываются
+# в QSettings одним пакетом по таймеру (FLUSH_DELAY_MS после последней записи) или явно — flush()
+# (вызывается из MainWindow.closeEvent).
+from PyQt6 import QtCore
+from PyQt6.QtCore import QSettings
+
+FLUSH_DELAY_MS = 1500
+
+_values: dict[str, object] = {}
+_dirty: dict[str, object] = {}
+_parsed: dict[tuple, object] = {}   # (ключ, функция разбора) → результат разбора
+_loaded = False
+_timer: QtCore.QTimer | None = None
+
+
+def _ensure_loaded():
+    global _loaded
+    if _loaded:
+        return
+    s = QSettings()
+    for key in s.allKeys():
+        _values[key] = s.value(key)
+    _loaded = True
+
+
+def value(key: str, default=None):
+    """Значение как есть (как вернул бы QSettings.value без type)."""
+    _ensure_loaded()
+    v = _values.get(key)
+    return default if v is None else v
+
+
+def get_bool(key: str, default: bool = False) -> bool:
+    v = value(key)
+    if v is None:
+        return default
+    if isinstance(v, bool):
+        return v
+    return str(v).strip().lower() in ("1", "true", "yes")
+
+
+def get_int(key: str, default: int | None = None) -> int | None:
+    v = value(key)
+    if v is None:
+        return default
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return default
+
+
+def get_str(key: str, default: str = "") -> str:
+    v = value(key)
+    return default if v is None else str(v)
+
+
+def get_list(key: str, default: list | None = None) -> list:
+    """Список (QSettings может вернуть одну строку вместо списка из одного элемента)."""
+    v = value(key)
+    if v is None:
+        return list(default or [])
+    if isinstance(v, (list, tuple)):
+        return list(v)
+    return [v]
+
+
+def parsed(key: str, parser):
+    """
+    parser(сырое значение или None) с кэшем до следующей записи этого ключа.
+    Для настроек, которые хранятся строкой/списком и разбираются в структуру (порядок столбцов и т.п.).
+    """
+    k = (key, parser)
+    if k not in _parsed:
+        _parsed[k] = parser(value(key))
+    return _parsed[k]
+
+
+def set_value(key: str, v):
+    """Записать в память; в QSettings — при ближайшем сбросе."""
+    _ensure_loaded()
+    _values[key] = v
+    _dirty[key] = v
+    for k in [k for k in _parsed if k[0] == key]:
+        del _parsed[k]
+    _schedule_flush()
+
+
+def _schedule_flush():
+    global _timer
+    if QtCore.QCoreApplication.instance() is None:
+        flush()  # без цикла событий таймер не сработает
+        return
+    if _timer is None:
+        _timer = QtCore.QTimer()
+        _timer.setSingleShot(True)
+        _timer.timeout.connect(flush)
+    _timer.start(FLUSH_DELAY_MS)  # перезапуск: серия записей (перетаскивание столбца) — один сброс
+
+
+def flush():
+    """Записать накопленные изменения в QSettings."""
+    if _timer is not None:
+        _timer.stop()
+    if not _dirty:
+        return
+    s = QSettings()
+    for key, v in _dirty.items():
+        s.setValue(key, v)
+    _dirty.clear()
+    s.sync()
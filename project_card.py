@@ -10,7 +10,7 @@ from marketing_form import MarketingDialog
 from contract_form import ContractDialog
 from correction_form import CorrectionDialog
 from revision_form import RevisionDialog
-import doc_generator
+import attachment_transfer
 
 class ProjectCard(QtWidgets.QDialog):
     def __init__(self, project_id: int, parent=None):
@@ -20,7 +20,9 @@ class ProjectCard(QtWidgets.QDialog):
         self.resize(940, 660)
         apply_dialog_theme(self)
 
-        p = db.get_project(project_id)
+        snap = db.get_project_card_snapshot(project_id)
+        p = snap["project"] if snap else None
+        self._sections = snap["sections"] if snap else {}   # {mine_id: [(id, name)]} — из снимка, без запросов
         self.title_lbl = QtWidgets.QLabel(f"Карточка проекта: {p[1] if p else '??'}")
         self.title_lbl.setStyleSheet("font-size:18pt; margin-bottom:6px;")
 
@@ -33,7 +35,7 @@ class ProjectCard(QtWidgets.QDialog):
 
         self.mine_combo = QtWidgets.QComboBox()
         self.mine_combo.addItem("—", None)
-        for mid, mname in db.list_mines():
+        for mid, mname in (snap["mines"] if snap else []):
             self.mine_combo.addItem(mname, mid)
         self.mine_combo.currentIndexChanged.connect(self._on_mine_combo_changed)
         self.section_combo = QtWidgets.QComboBox()
@@ -123,7 +125,7 @@ class ProjectCard(QtWidgets.QDialog):
         self.memo_btn.clicked.connect(self.on_memo)
         self.folder_btn.clicked.connect(self.on_open_project_folder)
 
-        self.refresh()
+        self.refresh(snap)
 
     def _on_out_of_budget_changed(self, state):
         # state: 0 = Unchecked, 2 = Checked (PyQt6 передаёт int)
@@ -135,7 +137,7 @@ class ProjectCard(QtWidgets.QDialog):
         self.section_combo.clear()
         self.section_combo.addItem("—", None)
         if mine_id:
-            for sid, _, sname in db.list_sections(mine_id=mine_id):
+            for sid, sname in self._sections.get(mine_id, []):
                 self.section_combo.addItem(sname, sid)
         self.section_combo.blockSignals(False)
 
@@ -150,8 +152,21 @@ class ProjectCard(QtWidgets.QDialog):
         val = self.status_combo.currentData()
         db.update_project_procurement_status(self.project_id, val)
 
-    def refresh(self):
-        pr = db.get_project(self.project_id)
+    def refresh(self, snap: dict | None = None):
+        """Перечитать карточку целиком (db.get_project_card_snapshot — одно соединение, одна транзакция)."""
+        snap = snap or db.get_project_card_snapshot(self.project_id)
+        if not snap:
+            return
+        self._sections = snap["sections"]
+        self._show_summary(snap)
+        events = snap["timeline"]
+        self.table.setRowCount(len(events))
+        for r, ev in enumerate(events):
+            self._fill_event_row(r, ev)
+        self.table.sortItems(0, QtCore.Qt.SortOrder.DescendingOrder)
+
+    def _show_summary(self, snap: dict):
+        pr = snap["project"]
         base = float(pr[2]) if pr else 0.0
         mine_id = pr[6] if pr and len(pr) > 6 else None
         section_id = pr[7] if pr and len(pr) > 7 else None
@@ -169,7 +184,7 @@ class ProjectCard(QtWidgets.QDialog):
         idx = self.section_combo.findData(section_id)
         self.section_combo.setCurrentIndex(idx if idx >= 0 else 0)
         self.section_combo.blockSignals(False)
-        st = db.compute_project_status(self.project_id)
+        st = snap["status"]
         self.allocated_lbl.setText(f"Выделено: {money(base)}")
         self.have_lbl.setText(f"Имеется: {money(st['have'])}")
         self.need_lbl.setText(f"Необходимо: {money(st['need'])}")
@@ -178,32 +193,56 @@ class ProjectCard(QtWidgets.QDialog):
         self.need_lbl.setStyleSheet("color:#9be69b; font-size:14pt;" if st['need'] <= st['have'] else "color:#ff7a7a; font-size:14pt;")
         self.diff_lbl.setStyleSheet("color:#9be69b; font-size:14pt;" if st['diff'] >= 0 else "color:#ff7a7a; font-size:14pt;")
 
-        events = db.get_project_timeline(self.project_id)
-        self.table.setRowCount(len(events))
-        for r, ev in enumerate(events):
-            d = QtWidgets.QTableWidgetItem(ev["date"])
-            t = QtWidgets.QTableWidgetItem(ev["type"])
-            amount_text = "—" if ev.get("amount") is None else money(ev["amount"])
-            a = QtWidgets.QTableWidgetItem(amount_text)
-            n = QtWidgets.QTableWidgetItem(ev.get("note") or "")
-            f = QtWidgets.QTableWidgetItem(ev.get("file_path") or "")
-            who = QtWidgets.QTableWidgetItem(ev.get("added_by") or "")
-            k = QtWidgets.QTableWidgetItem(ev["kind"])
-            i = QtWidgets.QTableWidgetItem(str(ev["id"]))
-
-            a.setTextAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
-            self.table.setItem(r, 0, d)
-            self.table.setItem(r, 1, t)
-            self.table.setItem(r, 2, a)
-            self.table.setItem(r, 3, n)
-            self.table.setItem(r, 4, f)
-            self.table.setItem(r, 5, who)
-            self.table.setItem(r, 6, k)  # hidden
-            self.table.setItem(r, 7, i)  # hidden
-
-            if ev["type"].startswith("Ревизия"):
-                a.setForeground(QBrush(QtCore.Qt.GlobalColor.green if ev.get("sign")== "+" else QtCore.Qt.GlobalColor.red))
-
+    def _fill_event_row(self, r: int, ev: dict):
+        d = QtWidgets.QTableWidgetItem(ev["date"])
+        t = QtWidgets.QTableWidgetItem(ev["type"])
+        amount_text = "—" if ev.get("amount") is None else money(ev["amount"])
+        a = QtWidgets.QTableWidgetItem(amount_text)
+        n = QtWidgets.QTableWidgetItem(ev.get("note") or "")
+        f = QtWidgets.QTableWidgetItem(ev.get("file_path") or "")
+        who = QtWidgets.QTableWidgetItem(ev.get("added_by") or "")
+        k = QtWidgets.QTableWidgetItem(ev["kind"])
+        i = QtWidgets.QTableWidgetItem(str(ev["id"]))
+
+        a.setTextAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
+        self.table.setItem(r, 0, d)
+        self.table.setItem(r, 1, t)
+        self.table.setItem(r, 2, a)
+        self.table.setItem(r, 3, n)
+        self.table.setItem(r, 4, f)
+        self.table.setItem(r, 5, who)
+        self.table.setItem(r, 6, k)  # hidden
+        self.table.setItem(r, 7, i)  # hidden
+
+        if ev["type"].startswith("Ревизия"):
+            a.setForeground(QBrush(QtCore.Qt.GlobalColor.green if ev.get("sign")== "+" else QtCore.Qt.GlobalColor.red))
+
+    def _event_row(self, kind: str, rec_id: int) -> int:
+        for r in range(self.table.rowCount()):
+            k, i = self.table.item(r, 6), self.table.item(r, 7)
+            if k and i and k.text() == kind and i.text() == str(rec_id):
+                return r
+        return -1
+
+    def _patch_event(self, kind: str, rec_id: int):
+        """После изменения/удаления одной записи: итоги статьи и только её строка событий."""
+        snap = db.get_project_card_snapshot(self.project_id, with_timeline=False)
+        if not snap:
+            return
+        self._show_summary(snap)
+        # Ревизия при изменении может сменить направление (+/−) — проверяются оба вида
+        kinds = ("revision_in", "revision_out") if kind.startswith("revision") else (kind,)
+        for k in kinds:
+            row = self._event_row(k, rec_id)
+            ev = db.get_timeline_event(k, rec_id, self.project_id)
+            if ev is None:
+                if row >= 0:
+                    self.table.removeRow(row)
+                continue
+            if row < 0:
+                row = self.table.rowCount()
+                self.table.insertRow(row)
+            self._fill_event_row(row, ev)
         self.table.sortItems(0, QtCore.Qt.SortOrder.DescendingOrder)
 
     # ---- Контекст-меню
@@ -269,7 +308,7 @@ class ProjectCard(QtWidgets.QDialog):
         else:
             return
         if dlg.exec():
-            self.refresh()
+            self._patch_event(kind, rec_id)
 
     def _delete_record(self, kind: str, rec_id: int, file_path_hint: str = ""):
         if kind == "file_upload":
@@ -296,7 +335,7 @@ class ProjectCard(QtWidgets.QDialog):
                 db.delete_correction(rec_id)
             elif kind in ("revision_in", "revision_out"):
                 db.delete_revision(rec_id)
-        self.refresh()
+        self._patch_event(kind, rec_id)
 
     # ---- Кнопки действий
     def on_marketing(self):
@@ -324,27 +363,26 @@ class ProjectCard(QtWidgets.QDialog):
             self.refresh()
 
     def on_upload_file(self):
-        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Выберите файл для загрузки", "", "Все файлы (*)")
-        if not path or not path.strip():
+        paths, _ = QtWidgets.QFileDialog.getOpenFileNames(self, "Выберите файлы для загрузки", "", "Все файлы (*)")
+        paths = [p.strip() for p in paths if p and p.strip()]
+        if not paths:
             return
         comment, ok = QtWidgets.QInputDialog.getText(self, "Комментарий", "Комментарий (необязательно):", QtWidgets.QLineEdit.EchoMode.Normal, "")
         if not ok:
             return
-        try:
-            stored = db.copy_attachment_to_files(path.strip(), "file_upload", self.project_id)
-            if not stored:
-                QtWidgets.QMessageBox.warning(self, "Ошибка", "Не удалось скопировать файл.")
-                return
-            db.record_project_file_upload(
-                self.project_id,
-                stored,
-                datetime.date.today().isoformat(),
-                comment.strip() if comment else "",
-                db.get_windows_user()
-            )
-            self.refresh()
-        except Exception as e:
-            QtWidgets.QMessageBox.warning(self, "Ошибка загрузки", str(e))
+        comment = comment.strip() if comment else ""
+        who = db.get_windows_user()
+
+        def record(job):
+            # Запись в БД — только когда файл полностью скопирован и проверен
+            db.record_project_file_upload(self.project_id, job.stored_path, datetime.date.today().isoformat(), comment, who)
+
+        jobs = [attachment_transfer.TransferJob(p, "file_upload", self.project_id, on_done=record) for p in paths]
+        attachment_transfer.run_with_progress(self, jobs, "Загрузка файлов")
+        self.refresh()
+        errors = [f"{j.name}: {j.error}" for j in jobs if j.error]
+        if errors:
+            QtWidgets.QMessageBox.warning(self, "Ошибка загрузки", "Не удалось загрузить:\n" + "\n".join(errors))
 
     def on_correction(self):
         if CorrectionDialog(self.project_id, self).exec():
@@ -365,6 +403,7 @@ class ProjectCard(QtWidgets.QDialog):
         else:
             src = db.get_project(last_rev["target_project_id"])
             dst = db.get_project(last_rev["source_project_id"])
+        import doc_generator
         path = doc_generator.generate_revision_memo(
             src_project=src[1], dst_project=dst[1],
             amount=last_rev["amount"], date=last_rev["date"], note=last_rev.get("note") or "",
@@ -374,7 +413,9 @@ class ProjectCard(QtWidgets.QDialog):
 
     def on_open_project_folder(self):
         """Открыть папку проекта с файлами в проводнике Windows."""
-        folder = db.get_project_files_dir(self.project_id)
+        folder = db.get_project_files_dir(self.project_id, create=True)
+        if db.get_attachment_dedup():
+            db.materialize_project_views(self.project_id)
         if not folder:
             QtWidgets.QMessageBox.warning(self, "Папка проекта", "Не удалось определить путь к папке проекта.")
             return
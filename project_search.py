@@ -0,0 +1,130 @@
+# project_search.py
+# Быстрый поиск статей (палитра Ctrl+K) по названиям, комментариям, подрядчикам и примечаниям событий.
+# Основной путь — FTS5-индекс project_search с токенизатором trigram (db._create_search_index),
+# его синхронизируют триггеры. Если SQLite собран без FTS5 — индекс триграмм в памяти, который
+# перестраивается при изменении _meta.data_version.
+# Опечатки: кандидаты — строки, где есть хотя бы одна триграмма запроса; порядок — по доле совпавших
+# триграмм (подстрока целиком и совпадение в названии — выше).
+import os
+
+import db
+
+KIND_TITLES = {
+    "name": "Название", "comment": "Комментарий", "contract": "Договор", "marketing": "Маркетинг",
+    "correction": "Корректировка", "revision": "Ревизия",
+}
+_KIND_WEIGHT = {"name": 1.0, "comment": 0.7}
+_OTHER_WEIGHT = 0.6
+MIN_OVERLAP = 0.4        # доля триграмм запроса, найденных в тексте, ниже которой строка отбрасывается
+CANDIDATES = 400         # сколько строк индекса перебирать для ранжирования
+
+_memory = None           # (ключ базы, data_version, _MemoryIndex)
+
+
+def fold(text: str) -> str:
+    """Текст для сравнения: латинские «двойники» → кириллица, без учёта регистра."""
+    return db.normalize_search_text(text).casefold()
+
+
+def trigrams(s: str) -> set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _padded_trigrams(s: str) -> set[str]:
+    """Триграммы с пробелами по краям: начало и конец слова тоже считаются (опечатка в середине короткого слова)."""
+    return trigrams(f" {s} ")
+
+
+def _score(q: str, q_tris: set[str], text: str, kind: str) -> float:
+    t = fold(text)
+    if q_tris:
+        overlap = len(q_tris & _padded_trigrams(t)) / len(q_tris)
+    else:
+        overlap = 1.0 if q in t else 0.0
+    if overlap < MIN_OVERLAP:
+        return 0.0
+    bonus = 1.0 if q in t else 0.0
+    return (overlap + bonus) * _KIND_WEIGHT.get(kind, _OTHER_WEIGHT)
+
+
+class _MemoryIndex:
+    """Индекс триграмм в памяти: триграмма → номера документов (id статьи, вид, текст)."""
+
+    def __init__(self, docs: list[tuple]):
+        self.docs = docs
+        self.postings: dict[str, list[int]] = {}
+        self.folded = [fold(text) for _pid, _kind, text in docs]
+        for i, t in enumerate(self.folded):
+            for tri in _padded_trigrams(t):
+                self.postings.setdefault(tri, []).append(i)
+
+    def candidates(self, q: str, q_tris: set[str]) -> list[tuple]:
+        if not q_tris:
+            return [self.docs[i] for i, t in enumerate(self.folded) if q in t][:CANDIDATES]
+        hits: dict[int, int] = {}
+        for tri in q_tris:
+            for i in self.postings.get(tri, ()):
+                hits[i] = hits.get(i, 0) + 1
+        best = sorted(hits, key=hits.get, reverse=True)[:CANDIDATES]
+        return [self.docs[i] for i in best]
+
+
+def _memory_index() -> _MemoryIndex:
+    global _memory
+    key = os.path.abspath(db.get_db_path())
+    version = db.get_data_version()
+    if _memory is None or _memory[0] != key or _memory[1] != version:
+        _memory = (key, version, _MemoryIndex(db.list_search_documents()))
+    return _memory[2]
+
+
+def _fts_candidates(q: str, q_tris: set[str]) -> list[tuple]:
+    con = db.connect()
+    cur = con.cursor()
+    if q_tris:
+        match = " OR ".join('"' + tri.replace('"', '""') + '"' for tri in sorted(q_tris))
+        cur.execute("SELECT project_id, kind, text FROM project_search WHERE project_search MATCH ? "
+                    "ORDER BY bm25(project_search) LIMIT ?", (match, CANDIDATES))
+    else:
+        # Короче трёх символов trigram не ищет — просмотр индекса (он небольшой)
+        con.create_function("fold", 1, lambda v: (v or "").casefold(), deterministic=True)
+        cur.execute("SELECT project_id, kind, text FROM project_search WHERE instr(fold(text), ?) > 0 LIMIT ?",
+                    (q, CANDIDATES))
+    rows = [(r[0], r[1], r[2]) for r in cur.fetchall()]
+    con.close()
+    return rows
+
+
+def search(query: str, limit: int = 30) -> list[dict]:
+    """
+    Статьи по запросу, лучшие сначала: [{"project_id", "name", "kind", "text", "score"}].
+    kind/text — строка индекса, которая дала лучшее совпадение (название, договор, примечание…).
+    """
+    q = " ".join(fold(query).split())
+    if not q:
+        return []
+    q_tris = _padded_trigrams(q) if len(q) >= 3 else set()
+    if db.has_search_index():
+        rows = _fts_candidates(q, q_tris)
+    else:
+        rows = _memory_index().candidates(q, q_tris)
+    best: dict[int, tuple] = {}
+    for pid, kind, text in rows:
+        sc = _score(q, q_tris, text, kind)
+        if sc > 0 and (pid not in best or sc > best[pid][0]):
+            best[pid] = (sc, kind, text)
+    top = sorted(best.items(), key=lambda kv: kv[1][0], reverse=True)[:limit]
+    names = db.get_project_names([pid for pid, _ in top])
+    return [{"project_id": pid, "name": names.get(pid, ""), "kind": kind, "text": text, "score": sc}
+            for pid, (sc, kind, text) in top if pid in names]
+
+
+def snippet(text: str, query: str, width: int = 80) -> str:
+    """Фрагмент текста вокруг совпадения (для списка результатов)."""
+    text = " ".join((text or "").split())
+    pos = fold(text).find(fold(query).strip())
+    if len(text) <= width:
+        return text
+    start = max(0, pos - width // 3) if pos >= 0 else 0
+    cut = text[start:start + width]
+    return ("…" if start > 0 else "") + cut + ("…" if start + width < len(text) else "")
@@ -5,7 +5,6 @@ import db
 import utils  # для форматирования суммы и внутренних проверок
 from utils import to_float
 from theme import apply_dialog_theme
-import doc_generator
 
 class RevisionDialog(QtWidgets.QDialog):
     def __init__(self, target_project_id: int, parent=None,
@@ -133,6 +132,7 @@ class RevisionDialog(QtWidgets.QDialog):
         if self.memo_chk.isChecked():
             src = db.get_project(int(src_id))
             dst = db.get_project(self.target_project_id)
+            import doc_generator
             path = doc_generator.generate_revision_memo(
                 src_project=src[1],
                 dst_project=dst[1],
@@ -0,0 +1,294 @@
+# revision_graph.py
+# Анализ потоков денег по ревизиям (источник → назначение). Все ревизии читаются один раз
+# (db.list_revision_graph_data) в массивы рёбер (array: источник, назначение, сумма) и список
+# смежности в виде CSR (out_start/out_edges) по номерам статей. Поверх — расчёты для аудита:
+#   - net_flows: сальдо между рудниками / участками / статьями (за период, по месяцам);
+#   - round_trips: пары статей с переводами в обе стороны; cycles: замкнутые цепочки (Тарьян);
+#   - ranking: доноры и получатели (только отдают / только получают);
+#   - export: всё это в Excel (потоковая запись, export_excel.export_sheets_streaming).
+# Запуск из командной строки: python revision_graph.py [--db путь] [--level mine] [--export файл.xlsx]
+import argparse
+import sys
+from array import array
+
+import db
+
+LEVELS = {"mine": "Рудник", "section": "Участок", "project": "Статья"}
+NO_MINE = "без рудника"
+EPS = 0.005
+
+
+class RevisionGraph:
+    def __init__(self, edges: list[tuple], nodes: list[tuple]):
+        self.node_ids: list[int] = []
+        self.index: dict[int, int] = {}
+        self.names: list[str] = []
+        self.mines: list[str] = []
+        self.sections: list[str] = []
+        for pid, name, mine, section in nodes:
+            self._add_node(pid, name, mine, section)
+        self.edge_ids = array("q")
+        self.src = array("l")
+        self.dst = array("l")
+        self.amount = array("d")
+        self.dates: list[str] = []
+        for rid, s, t, amount, date in edges:
+            self.edge_ids.append(rid)
+            self.src.append(self._node(s))
+            self.dst.append(self._node(t))
+            self.amount.append(float(amount or 0))
+            self.dates.append(date or "")
+        self._build_csr()
+
+    def _add_node(self, pid, name, mine, section) -> int:
+        i = len(self.node_ids)
+        self.index[pid] = i
+        self.node_ids.append(pid)
+        self.names.append(name or f"#{pid}")
+        self.mines.append(mine or "")
+        self.sections.append(section or "")
+        return i
+
+    def _node(self, pid: int) -> int:
+        i = self.index.get(pid)
+        return i if i is not None else self._add_node(pid, f"#{pid} (удалена)", "", "")
+
+    def _build_csr(self):
+        """Исходящие рёбра каждой статьи подряд: out_edges[out_start[v]:out_start[v + 1]] (подсчётом)."""
+        n = len(self.node_ids)
+        start = array("l", [0] * (n + 1))
+        for s in self.src:
+            start[s + 1] += 1
+        for v in range(n):
+            start[v + 1] += start[v]
+        fill = array("l", start[:n])
+        out = array("l", [0] * len(self.src))
+        for e, s in enumerate(self.src):
+            out[fill[s]] = e
+            fill[s] += 1
+        self.out_start, self.out_edges = start, out
+
+    @classmethod
+    def load(cls) -> "RevisionGraph":
+        edges, nodes = db.list_revision_graph_data()
+        return cls(edges, nodes)
+
+    # ---- Группы
+    def group(self, v: int, level: str) -> str:
+        if level == "mine":
+            return self.mines[v] or NO_MINE
+        if level == "section":
+            mine = self.mines[v] or NO_MINE
+            return f"{mine} / {self.sections[v]}" if self.sections[v] else mine
+        if level == "project":
+            return self.names[v]
+        raise ValueError(f"Неизвестный уровень: {level}")
+
+    def _edges_in(self, date_from: str | None, date_to: str | None):
+        for e in range(len(self.src)):
+            d = self.dates[e]
+            if (date_from and d < date_from) or (date_to and d > date_to):
+                continue
+            yield e
+
+    # ---- Сальдо потоков
+    def net_flows(self, level: str = "mine", date_from: str | None = None, date_to: str | None = None,
+                  by_month: bool = False) -> list[tuple]:
+        """
+        Сальдо между группами: [(месяц или "", от кого, кому, сумма нетто, ревизий)], сумма > 0,
+        по убыванию. Переводы внутри одной группы не учитываются.
+        """
+        labels = [self.group(v, level) for v in range(len(self.node_ids))]
+        gross: dict[tuple, list] = {}
+        for e in self._edges_in(date_from, date_to):
+            a, b = labels[self.src[e]], labels[self.dst[e]]
+            if a == b:
+                continue
+            month = self.dates[e][:7] if by_month else ""
+            key, sign = ((month, a, b), 1) if a < b else ((month, b, a), -1)
+            acc = gross.setdefault(key, [0.0, 0])
+            acc[0] += sign * self.amount[e]
+            acc[1] += 1
+        out = []
+        for (month, a, b), (net, n) in gross.items():
+            if net > EPS:
+                out.append((month, a, b, net, n))
+            elif net < -EPS:
+                out.append((month, b, a, -net, n))
+        out.sort(key=lambda r: (r[0], -r[3]))
+        return out
+
+    # ---- Встречные переводы и циклы
+    def round_trips(self) -> list[dict]:
+        """Пары статей, между которыми деньги ходили в обе стороны."""
+        pair: dict[tuple, list] = {}
+        for e in range(len(self.src)):
+            s, t = self.src[e], self.dst[e]
+            key = (min(s, t), max(s, t))
+            acc = pair.setdefault(key, [0.0, 0.0, 0, "", ""])
+            acc[0 if s == key[0] else 1] += self.amount[e]
+            acc[2] += 1
+            acc[3] = min(acc[3], self.dates[e]) if acc[3] else self.dates[e]
+            acc[4] = max(acc[4], self.dates[e])
+        out = []
+        for (a, b), (ab, ba, n, first, last) in pair.items():
+            if ab > 0 and ba > 0:
+                out.append({"a": self.node_ids[a], "a_name": self.names[a], "b": self.node_ids[b],
+                            "b_name": self.names[b], "a_to_b": ab, "b_to_a": ba, "returned": min(ab, ba),
+                            "count": n, "first": first, "last": last})
+        out.sort(key=lambda r: -r["returned"])
+        return out
+
+    def strongly_connected(self) -> list[list[int]]:
+        """Компоненты сильной связности (итеративный Тарьян) размером от 2 — в каждой есть цикл."""
+        n = len(self.node_ids)
+        index = array("l", [-1] * n)
+        low = array("l", [0] * n)
+        on_stack = bytearray(n)
+        stack: list[int] = []
+        comps = []
+        counter = 0
+        for root in range(n):
+            if index[root] != -1 or self.out_start[root] == self.out_start[root + 1]:
+                continue
+            work = [(root, self.out_start[root])]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            while work:
+                v, pos = work[-1]
+                if pos < self.out_start[v + 1]:
+                    work[-1] = (v, pos + 1)
+                    w = self.dst[self.out_edges[pos]]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = 1
+                        work.append((w, self.out_start[w]))
+                    elif on_stack[w]:
+                        low[v] = min(low[v], index[w])
+                    continue
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    comp = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        comp.append(w)
+                        if w == v:
+                            break
+                    if len(comp) > 1:
+                        comps.append(comp)
+        return comps
+
+    def _example_cycle(self, comp: list[int]) -> list[int]:
+        """Кратчайший цикл через первую статью компоненты (поиск в ширину внутри компоненты)."""
+        members = set(comp)
+        start = comp[0]
+        prev = {start: None}
+        queue = [start]
+        for v in queue:
+            for pos in range(self.out_start[v], self.out_start[v + 1]):
+                w = self.dst[self.out_edges[pos]]
+                if w == start:
+                    path = [v]
+                    while prev[path[-1]] is not None:
+                        path.append(prev[path[-1]])
+                    return list(reversed(path))
+                if w in members and w not in prev:
+                    prev[w] = v
+                    queue.append(w)
+        return [start]
+
+    def cycles(self) -> list[dict]:
+        """Замкнутые цепочки переводов: статьи компоненты, оборот внутри неё и пример цикла."""
+        out = []
+        for comp in self.strongly_connected():
+            members = set(comp)
+            inner = [e for v in comp for e in self.out_edges[self.out_start[v]:self.out_start[v + 1]]
+                     if self.dst[e] in members]
+            cycle = self._example_cycle(comp)
+            out.append({"projects": [self.node_ids[v] for v in comp], "size": len(comp),
+                        "turnover": sum(self.amount[e] for e in inner), "revisions": len(inner),
+                        "example": " → ".join(self.names[v] for v in cycle + cycle[:1])})
+        out.sort(key=lambda c: -c["turnover"])
+        return out
+
+    # ---- Доноры и получатели
+    def ranking(self) -> list[dict]:
+        """По статьям: отдано, получено, сальдо, роль (донор / получатель / оба); по убыванию отданного."""
+        n = len(self.node_ids)
+        given, got = array("d", [0.0] * n), array("d", [0.0] * n)
+        for e in range(len(self.src)):
+            given[self.src[e]] += self.amount[e]
+            got[self.dst[e]] += self.amount[e]
+        out = []
+        for v in range(n):
+            if not given[v] and not got[v]:
+                continue
+            role = "оба" if given[v] and got[v] else ("только донор" if given[v] else "только получатель")
+            out.append({"project_id": self.node_ids[v], "name": self.names[v], "mine": self.mines[v],
+                        "given": given[v], "received": got[v], "net": got[v] - given[v], "role": role})
+        out.sort(key=lambda r: (-r["given"], -r["received"]))
+        return out
+
+
+def export(xlsx_path: str, graph: RevisionGraph, level: str = "mine",
+           date_from: str | None = None, date_to: str | None = None) -> str:
+    """Отчёт в Excel: сальдо (за период и по месяцам), встречные переводы, циклы, доноры/получатели."""
+    import export_excel
+    title = LEVELS[level]
+    flows = graph.net_flows(level, date_from, date_to)
+    monthly = graph.net_flows(level, date_from, date_to, by_month=True)
+    ranking = graph.ranking()
+    sheets = [
+        ("Сальдо", [f"{title}: от", f"{title}: кому", "Сумма нетто", "Ревизий"],
+         ([a, b, net, n] for _m, a, b, net, n in flows), [40, 40, 16, 10]),
+        ("Сальдо по месяцам", ["Месяц", f"{title}: от", f"{title}: кому", "Сумма нетто", "Ревизий"],
+         ([m, a, b, net, n] for m, a, b, net, n in monthly), [10, 40, 40, 16, 10]),
+        ("Встречные переводы", ["Статья A", "Статья B", "A → B", "B → A", "Вернулось", "Ревизий", "Первая", "Последняя"],
+         ([r["a_name"], r["b_name"], r["a_to_b"], r["b_to_a"], r["returned"], r["count"], r["first"], r["last"]]
+          for r in graph.round_trips()), [36, 36, 14, 14, 14, 10, 12, 12]),
+        ("Циклы", ["Статей", "Оборот", "Ревизий", "Пример цикла"],
+         ([c["size"], c["turnover"], c["revisions"], c["example"]] for c in graph.cycles()), [10, 16, 10, 60]),
+        ("Доноры и получатели", ["Статья", "Рудник", "Отдано", "Получено", "Сальдо", "Роль"],
+         ([r["name"], r["mine"], r["given"], r["received"], r["net"], r["role"]] for r in ranking),
+         [40, 24, 16, 16, 16, 18]),
+    ]
+    return export_excel.export_sheets_streaming(xlsx_path, sheets)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Анализ потоков по ревизиям")
+    ap.add_argument("--db", help="путь к базе (по умолчанию — база по умолчанию в data/)")
+    ap.add_argument("--level", choices=sorted(LEVELS), default="mine", help="уровень сальдо")
+    ap.add_argument("--from", dest="date_from", help="с даты (ГГГГ-ММ-ДД)")
+    ap.add_argument("--to", dest="date_to", help="по дату (ГГГГ-ММ-ДД)")
+    ap.add_argument("--export", metavar="FILE.xlsx", help="выгрузить отчёт в Excel")
+    args = ap.parse_args(argv)
+
+    if args.db:
+        db.set_db_path(args.db)
+    if db.open_db() != "invest":
+        print("Ревизии есть только в базе инвест-проектов.", file=sys.stderr)
+        return 2
+    graph = RevisionGraph.load()
+    if args.export:
+        print(export(args.export, graph, args.level, args.date_from, args.date_to))
+        return 0
+    for _m, a, b, net, n in graph.net_flows(args.level, args.date_from, args.date_to):
+        print(f"{a}\t→\t{b}\t{net:.2f}\t{n}")
+    trips, cycles = graph.round_trips(), graph.cycles()
+    donors = sum(1 for r in graph.ranking() if r["role"] == "только донор")
+    print(f"Ревизий: {len(graph.src)} | встречных пар: {len(trips)} | циклов: {len(cycles)} | "
+          f"только доноров: {donors}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
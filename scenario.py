@@ -0,0 +1,124 @@
+# scenario.py
+# Сценарий «что если»: набор планируемых ревизий, корректировок и договоров, посчитанный в памяти
+# поверх текущих строк главной таблицы (db.list_project_rows читается один раз). Каждая операция
+# меняет только затронутые статьи; ревизии проверяются на перерасход теми же правилами, что и
+# db.record_revision (db.check_revision, db.check_revision_funds), в порядке добавления.
+# Проведение — db.apply_scenario: одна транзакция, все операции или ни одной; если база
+# изменилась после загрузки сценария (_meta.data_version), ничего не записывается.
+import db
+
+KINDS = {"revision": "Ревизия", "correction": "Корректировка", "contract": "Договор"}
+
+
+class Scenario:
+    def __init__(self):
+        rows, self.version = db.list_project_rows()
+        self.real: dict[int, tuple] = {r[0]: r for r in rows}
+        self.ops: list[tuple] = []              # операции в формате db.apply_scenario
+        self._state: dict[int, dict] = {}       # только статьи, затронутые операциями
+        self._contract_dates: dict[int, str] = {}
+
+    # ------- операции
+    def add_revision(self, source_id: int, target_id: int, amount: float, date: str, note: str = "") -> int:
+        amt = db.check_revision(source_id, target_id, amount)
+        return self._add(("revision", self._pid(source_id), self._pid(target_id), amt, date, note or ""))
+
+    def add_correction(self, project_id: int, new_budget: float, date: str, note: str = "") -> int:
+        return self._add(("correction", self._pid(project_id), float(new_budget), date, note or ""))
+
+    def add_contract(self, project_id: int, amount: float, date: str, contractor: str = "", note: str = "") -> int:
+        amt = float(amount)
+        if amt <= 0:
+            raise ValueError("Сумма должна быть больше нуля.")
+        return self._add(("contract", self._pid(project_id), amt, date, contractor or "", note or ""))
+
+    def remove(self, index: int):
+        """Убрать операцию; остальные пересчитываются заново (ValueError — без неё не проходит ревизия)."""
+        ops = self.ops[:index] + self.ops[index + 1:]
+        state = {}
+        for op in ops:
+            self._apply(op, state)
+        self.ops, self._state = ops, state
+
+    def clear(self):
+        self.ops, self._state = [], {}
+
+    def _add(self, op: tuple) -> int:
+        self._apply(op, self._state)
+        self.ops.append(op)
+        return len(self.ops) - 1
+
+    def _pid(self, project_id: int) -> int:
+        if project_id not in self.real:
+            raise ValueError(f"Статья не найдена (id={project_id}).")
+        return project_id
+
+    def _get(self, state: dict, pid: int) -> dict:
+        s = state.get(pid)
+        if s is None:
+            r = self.real[pid]
+            s = state[pid] = {"base": r[4], "rev": r[5] - r[4], "marketing": r[7], "contract": r[8]}
+        return s
+
+    def _last_contract_date(self, pid: int) -> str:
+        if pid not in self._contract_dates:
+            last = db.get_last_contract_for_project(pid)
+            self._contract_dates[pid] = last["date"] if last else ""
+        return self._contract_dates[pid]
+
+    def _apply(self, op: tuple, state: dict):
+        """Применить операцию к state; при перерасходе — ValueError, state не меняется."""
+        kind = op[0]
+        if kind == "revision":
+            _k, src, dst, amt, _date, _note = op
+            s = state.get(src)
+            db.check_revision_funds(amt, s["base"] + s["rev"] if s else self.real[src][5])
+            self._get(state, src)["rev"] -= amt
+            self._get(state, dst)["rev"] += amt
+        elif kind == "correction":
+            self._get(state, op[1])["base"] = op[2]
+        elif kind == "contract":
+            _k, pid, amt, date, _contractor, _note = op
+            s = self._get(state, pid)
+            # последним договор становится, только если не раньше уже заключённого
+            if date >= s.get("contract_date", self._last_contract_date(pid)):
+                s["contract"], s["contract_date"] = amt, date
+
+    # ------- результат
+    def row(self, project_id: int) -> tuple:
+        """Строка статьи в формате db.list_project_rows с учётом сценария."""
+        r = self.real[project_id]
+        s = self._state.get(project_id)
+        if s is None:
+            return r
+        st = db._status_values(s["base"], s["rev"], 0.0, s["contract"], s["marketing"])
+        return (r[0], r[1], r[2], r[3], s["base"], st["have"], st["need"], st["marketing_amount"],
+                st["contract_amount"], st["diff"], st["stage"], r[11], r[12])
+
+    def have(self, project_id: int) -> float:
+        return self.row(project_id)[5]
+
+    def deltas(self) -> list[dict]:
+        """Затронутые статьи: было/стало по «заложено», «имеется», «необходимо» и остатку."""
+        out = []
+        for pid in self._state:
+            old, new = self.real[pid], self.row(pid)
+            out.append({"id": pid, "name": old[1], "mine": old[2], "section": old[3],
+                        "budget": (old[4], new[4]), "have": (old[5], new[5]),
+                        "need": (old[6], new[6]), "diff": (old[9], new[9])})
+        out.sort(key=lambda d: d["name"].casefold())
+        return out
+
+    def describe(self, op: tuple) -> str:
+        name = lambda pid: self.real[pid][1]
+        if op[0] == "revision":
+            return f"{name(op[1])} → {name(op[2])}"
+        if op[0] == "contract" and op[4]:
+            return f"{name(op[1])} ({op[4]})"
+        return name(op[1])
+
+    def commit(self, added_by: str | None = None) -> int:
+        """Провести все операции одной транзакцией (db.apply_scenario). Возвращает их число."""
+        n = db.apply_scenario(self.ops, self.version, added_by)
+        self.clear()
+        return n
@@ -0,0 +1,193 @@
+# scenario_dialog.py
+# Окно «Сценарий перераспределения»: планируемые ревизии, корректировки и договоры считаются
+# в памяти (scenario.Scenario), ниже — изменения по затронутым статьям относительно базы.
+# «Провести» записывает весь сценарий одной транзакцией.
+from PyQt6 import QtCore, QtWidgets
+from PyQt6.QtCore import QDate
+from PyQt6.QtGui import QBrush
+
+import scenario
+from utils import money, to_float
+from theme import apply_dialog_theme
+
+_RIGHT = QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter
+_BAD = QBrush(QtCore.Qt.GlobalColor.red)
+
+
+class ScenarioDialog(QtWidgets.QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Сценарий перераспределения")
+        self.resize(980, 640)
+        apply_dialog_theme(self)
+        self.scenario = scenario.Scenario()
+
+        self.kind_combo = QtWidgets.QComboBox()
+        for kind, title in scenario.KINDS.items():
+            self.kind_combo.addItem(title, kind)
+        self.source_combo = QtWidgets.QComboBox()
+        self.project_combo = QtWidgets.QComboBox()
+        names = sorted(self.scenario.real.values(), key=lambda r: r[1].casefold())
+        for combo in (self.source_combo, self.project_combo):
+            for r in names:
+                combo.addItem(r[1], r[0])
+        self.available_lbl = QtWidgets.QLabel("")
+        self.available_lbl.setStyleSheet("color: gray;")
+        self.amount_edit = QtWidgets.QLineEdit()
+        self.date_edit = QtWidgets.QDateEdit(QDate.currentDate())
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setDisplayFormat("dd.MM.yyyy")
+        self.contractor_edit = QtWidgets.QLineEdit()
+        self.note_edit = QtWidgets.QLineEdit()
+        add_btn = QtWidgets.QPushButton("➕ Добавить в сценарий")
+
+        form = QtWidgets.QFormLayout()
+        form.addRow("Операция:", self.kind_combo)
+        form.addRow("Источник:", self.source_combo)
+        form.addRow("", self.available_lbl)
+        form.addRow("Статья:", self.project_combo)
+        form.addRow("Сумма:", self.amount_edit)
+        form.addRow("Дата:", self.date_edit)
+        form.addRow("Контрагент:", self.contractor_edit)
+        form.addRow("Комментарий:", self.note_edit)
+        self._form = form
+
+        self.ops_table = QtWidgets.QTableWidget(0, 4)
+        self.ops_table.setHorizontalHeaderLabels(["Операция", "Статьи", "Сумма", "Дата"])
+        self.ops_table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.ops_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.ops_table.horizontalHeader().setStretchLastSection(True)
+        remove_btn = QtWidgets.QPushButton("Убрать операцию")
+
+        self.delta_table = QtWidgets.QTableWidget(0, 7)
+        self.delta_table.setHorizontalHeaderLabels(
+            ["Статья", "Рудник", "Имеется: было", "Имеется: станет", "Необходимо: станет", "Остаток: было", "Остаток: станет"])
+        self.delta_table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.delta_table.setAlternatingRowColors(True)
+        self.summary_lbl = QtWidgets.QLabel("")
+        self.summary_lbl.setStyleSheet("padding: 6px; font-weight: bold;")
+
+        self.commit_btn = QtWidgets.QPushButton("✅ Провести сценарий")
+        close_btn = QtWidgets.QPushButton("Закрыть")
+
+        left = QtWidgets.QVBoxLayout()
+        left.addLayout(form)
+        left.addWidget(add_btn)
+        left.addStretch(1)
+        right = QtWidgets.QVBoxLayout()
+        right.addWidget(QtWidgets.QLabel("Операции сценария (проверяются по порядку):"))
+        right.addWidget(self.ops_table)
+        right.addWidget(remove_btn, alignment=QtCore.Qt.AlignmentFlag.AlignLeft)
+        top = QtWidgets.QHBoxLayout()
+        top.addLayout(left, 2)
+        top.addLayout(right, 3)
+        bottom = QtWidgets.QHBoxLayout()
+        bottom.addWidget(self.summary_lbl, 1)
+        bottom.addWidget(self.commit_btn)
+        bottom.addWidget(close_btn)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(top)
+        layout.addWidget(QtWidgets.QLabel("Изменения по статьям относительно базы:"))
+        layout.addWidget(self.delta_table, 1)
+        layout.addLayout(bottom)
+
+        self.kind_combo.currentIndexChanged.connect(self._on_kind_changed)
+        self.source_combo.currentIndexChanged.connect(self._update_available)
+        add_btn.clicked.connect(self._add)
+        remove_btn.clicked.connect(self._remove)
+        self.commit_btn.clicked.connect(self._commit)
+        close_btn.clicked.connect(self.reject)
+        self._on_kind_changed()
+        self._show()
+
+    def _on_kind_changed(self):
+        kind = self.kind_combo.currentData()
+        self._form.setRowVisible(self.source_combo, kind == "revision")
+        self._form.setRowVisible(self.available_lbl, kind == "revision")
+        self._form.setRowVisible(self.contractor_edit, kind == "contract")
+        self._form.labelForField(self.project_combo).setText("Назначение:" if kind == "revision" else "Статья:")
+        self._form.labelForField(self.amount_edit).setText("Новый бюджет:" if kind == "correction" else "Сумма:")
+        self._update_available()
+
+    def _update_available(self):
+        pid = self.source_combo.currentData()
+        if pid is not None:
+            self.available_lbl.setText(f"Доступно с учётом сценария: {money(self.scenario.have(pid))}")
+
+    def _add(self):
+        kind = self.kind_combo.currentData()
+        pid = self.project_combo.currentData()
+        amount = to_float(self.amount_edit.text())
+        date = self.date_edit.date().toString("yyyy-MM-dd")
+        note = self.note_edit.text().strip()
+        if pid is None:
+            return
+        try:
+            if kind == "revision":
+                self.scenario.add_revision(self.source_combo.currentData(), pid, amount, date, note)
+            elif kind == "correction":
+                self.scenario.add_correction(pid, amount, date, note)
+            else:
+                self.scenario.add_contract(pid, amount, date, self.contractor_edit.text().strip(), note)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Сценарий", str(e))
+            return
+        self.amount_edit.clear()
+        self._show()
+
+    def _remove(self):
+        row = self.ops_table.currentRow()
+        if row < 0:
+            return
+        try:
+            self.scenario.remove(row)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Сценарий", f"Без этой операции сценарий не проходит:\n{e}")
+            return
+        self._show()
+
+    def _show(self):
+        sc = self.scenario
+        self.ops_table.setRowCount(len(sc.ops))
+        for r, op in enumerate(sc.ops):
+            amount, date = (op[3], op[4]) if op[0] == "revision" else (op[2], op[3])
+            amt = QtWidgets.QTableWidgetItem(money(amount))
+            amt.setTextAlignment(_RIGHT)
+            self.ops_table.setItem(r, 0, QtWidgets.QTableWidgetItem(scenario.KINDS[op[0]]))
+            self.ops_table.setItem(r, 1, QtWidgets.QTableWidgetItem(sc.describe(op)))
+            self.ops_table.setItem(r, 2, amt)
+            self.ops_table.setItem(r, 3, QtWidgets.QTableWidgetItem(QDate.fromString(date, "yyyy-MM-dd").toString("dd.MM.yyyy")))
+        self.ops_table.resizeColumnsToContents()
+
+        deltas = sc.deltas()
+        self.delta_table.setRowCount(len(deltas))
+        for r, d in enumerate(deltas):
+            mine = d["mine"] + (f" / {d['section']}" if d["section"] else "")
+            self.delta_table.setItem(r, 0, QtWidgets.QTableWidgetItem(d["name"]))
+            self.delta_table.setItem(r, 1, QtWidgets.QTableWidgetItem(mine))
+            for c, value in enumerate((d["have"][0], d["have"][1], d["need"][1], d["diff"][0], d["diff"][1]), start=2):
+                it = QtWidgets.QTableWidgetItem(money(value))
+                it.setTextAlignment(_RIGHT)
+                if c >= 5 and value < 0:
+                    it.setForeground(_BAD)
+                self.delta_table.setItem(r, c, it)
+        self.delta_table.resizeColumnsToContents()
+
+        worse = sum(1 for d in deltas if d["diff"][1] < 0 <= d["diff"][0])
+        better = sum(1 for d in deltas if d["diff"][0] < 0 <= d["diff"][1])
+        self.summary_lbl.setText(f"Операций: {len(sc.ops)} | Затронуто статей: {len(deltas)} | "
+                                 f"Уйдут в перерасход: {worse} | Выйдут из перерасхода: {better}")
+        self.commit_btn.setEnabled(bool(sc.ops))
+        self._update_available()
+
+    def _commit(self):
+        n = len(self.scenario.ops)
+        ans = QtWidgets.QMessageBox.question(self, "Сценарий", f"Провести {n} операций в базе одной транзакцией?")
+        if ans != QtWidgets.QMessageBox.StandardButton.Yes:
+            return
+        try:
+            self.scenario.commit()
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Сценарий", f"Сценарий не проведён:\n{e}")
+            return
+        self.accept()
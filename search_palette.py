@@ -0,0 +1,96 @@
+# search_palette.py
+# Палитра быстрого поиска (Ctrl+K): ввод → project_search.search и поиск по содержимому вложений
+# attachment_index.search (с задержкой, пока печатают),
+# стрелки — выбор, Enter/двойной щелчок — открыть карточку статьи (project_id выбранной строки).
+import os
+
+from PyQt6 import QtCore, QtWidgets
+
+import attachment_index
+import db
+import project_search
+from theme import apply_dialog_theme
+
+SEARCH_DELAY_MS = 120
+
+
+class SearchPalette(QtWidgets.QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Быстрый поиск")
+        self.resize(680, 420)
+        apply_dialog_theme(self)
+        self.project_id: int | None = None
+
+        self.edit = QtWidgets.QLineEdit()
+        self.edit.setPlaceholderText("Название, подрядчик, примечание… (Enter — открыть карточку)")
+        self.edit.setClearButtonEnabled(True)
+        self.list = QtWidgets.QListWidget()
+        self.info = QtWidgets.QLabel("")
+        self.info.setStyleSheet("color: gray;")
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.edit)
+        layout.addWidget(self.list)
+        layout.addWidget(self.info)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run)
+        self.edit.textChanged.connect(lambda _t: self._timer.start(SEARCH_DELAY_MS))
+        self.edit.returnPressed.connect(self._accept_current)
+        self.edit.installEventFilter(self)
+        self.list.itemActivated.connect(lambda _it: self._accept_current())
+
+    def eventFilter(self, obj, event):
+        # Стрелки в поле ввода двигают выбор в списке — руки не уходят с клавиатуры
+        if obj is self.edit and event.type() == QtCore.QEvent.Type.KeyPress:
+            key = event.key()
+            if key in (QtCore.Qt.Key.Key_Down, QtCore.Qt.Key.Key_Up, QtCore.Qt.Key.Key_PageDown, QtCore.Qt.Key.Key_PageUp):
+                QtWidgets.QApplication.sendEvent(self.list, event)
+                return True
+        return super().eventFilter(obj, event)
+
+    def _run(self):
+        query = self.edit.text()
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+        results = self.search(query)
+        self.list.clear()
+        for r in results:
+            item = QtWidgets.QListWidgetItem(self.result_text(r, query))
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, r["project_id"])
+            self.list.addItem(item)
+        if self.list.count():
+            self.list.setCurrentRow(0)
+        self.info.setText(f"Найдено: {len(results)} · {timer.elapsed()} мс" if query.strip() else "")
+
+    def search(self, query: str) -> list[dict]:
+        """Сначала статьи (название, примечания), затем вложения, в тексте которых есть запрос."""
+        results = project_search.search(query)
+        files = attachment_index.search(query)
+        names = db.get_project_names({f["project_id"] for f in files})
+        for f in files:
+            if f["project_id"] in names:
+                results.append({"project_id": f["project_id"], "name": names[f["project_id"]], "kind": "file",
+                                "text": f"{os.path.basename(str(f['file_path']))}: {f['snippet']}"})
+        return results
+
+    @staticmethod
+    def result_text(r: dict, query: str) -> str:
+        if r["kind"] == "name":
+            return r["name"]
+        if r["kind"] == "file":
+            return f"{r['name']}  —  📎 {r['text']}"
+        kind = project_search.KIND_TITLES.get(r["kind"], r["kind"])
+        return f"{r['name']}  —  {kind}: {project_search.snippet(r['text'], query)}"
+
+    def _accept_current(self):
+        if self._timer.isActive():  # Enter сразу после ввода — сначала дойти до результатов
+            self._timer.stop()
+            self._run()
+        item = self.list.currentItem()
+        if item is None:
+            return
+        self.project_id = item.data(QtCore.Qt.ItemDataRole.UserRole)
+        self.accept()
@@ -10,6 +10,7 @@ class ServiceActDialog(QtWidgets.QDialog):
         super().__init__(parent)
         self.contract_id = contract_id
         self.act_id = act_id
+        self.saved_act_id: int | None = None    # id добавленного/изменённого акта (после accept)
         self.setWindowTitle("Редактировать акт" if act_id else "Добавить акт выполненных работ")
         apply_dialog_theme(self)
 
@@ -74,6 +75,7 @@ class ServiceActDialog(QtWidgets.QDialog):
         note = self.note_edit.text().strip()
         if self.act_id:
             db.update_service_act(self.act_id, period_start, period_end or None, act_date, amount, note or None)
+            self.saved_act_id = self.act_id
         else:
-            db.add_service_act(self.contract_id, period_start, period_end or None, act_date, amount, note or None)
+            self.saved_act_id = db.add_service_act(self.contract_id, period_start, period_end or None, act_date, amount, note or None)
         self.accept()
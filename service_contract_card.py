@@ -13,20 +13,22 @@ class ServiceContractCard(QtWidgets.QDialog):
         self.resize(720, 520)
         apply_dialog_theme(self)
 
-        c = db.get_service_contract(contract_id)
-        if not c:
+        snap = db.get_service_contract_snapshot(contract_id)
+        if not snap:
             return
-        tot = db.get_service_contract_totals(contract_id)
-        mine_name = db.get_mine_name(c.get("mine_id")) if c.get("mine_id") else ""
-        section_name = db.get_section_name(c.get("section_id")) if c.get("section_id") else ""
+        self._acts: list[dict] = []     # акты в порядке строк таблицы (act_date, id)
+        self._total = 0.0
 
-        self.title_lbl = QtWidgets.QLabel(f"Договор: {c['name']}")
+        self.title_lbl = QtWidgets.QLabel("")
         self.title_lbl.setStyleSheet("font-size:14pt;")
-        self.total_lbl = QtWidgets.QLabel(f"Сумма договора: {money(tot['total'])}")
-        self.spent_lbl = QtWidgets.QLabel(f"Списано всего: {money(tot['spent'])}")
-        self.remaining_lbl = QtWidgets.QLabel(f"Остаток: {money(tot['remaining'])}")
-        self.mine_lbl = QtWidgets.QLabel(f"Рудник: {mine_name or '—'}")
-        self.section_lbl = QtWidgets.QLabel(f"Участок: {section_name or '—'}")
+        self.total_lbl = QtWidgets.QLabel("")
+        self.spent_lbl = QtWidgets.QLabel("")
+        self.remaining_lbl = QtWidgets.QLabel("")
+        self.mine_lbl = QtWidgets.QLabel("")
+        self.section_lbl = QtWidgets.QLabel("")
+        self.rate_lbl = QtWidgets.QLabel("")
+        self.exhaustion_lbl = QtWidgets.QLabel("")
+        self.variance_lbl = QtWidgets.QLabel("")
 
         grid = QtWidgets.QGridLayout()
         grid.addWidget(self.title_lbl, 0, 0, 1, 2)
@@ -35,6 +37,9 @@ class ServiceContractCard(QtWidgets.QDialog):
         grid.addWidget(self.remaining_lbl, 2, 0)
         grid.addWidget(self.mine_lbl, 2, 1)
         grid.addWidget(self.section_lbl, 3, 0)
+        grid.addWidget(self.rate_lbl, 4, 0)
+        grid.addWidget(self.exhaustion_lbl, 4, 1)
+        grid.addWidget(self.variance_lbl, 5, 0, 1, 2)
 
         self.acts_table = QtWidgets.QTableWidget(0, 5)
         self.acts_table.setHorizontalHeaderLabels(["Период с", "Период по", "Дата акта", "Сумма", ""])
@@ -55,43 +60,82 @@ class ServiceContractCard(QtWidgets.QDialog):
 
         self.add_act_btn.clicked.connect(self._add_act)
         self.edit_contract_btn.clicked.connect(self._edit_contract)
-        self.refresh()
-
-    def refresh(self):
-        tot = db.get_service_contract_totals(self.contract_id)
-        self.total_lbl.setText(f"Сумма договора: {money(tot['total'])}")
-        self.spent_lbl.setText(f"Списано всего: {money(tot['spent'])}")
-        self.remaining_lbl.setText(f"Остаток: {money(tot['remaining'])}")
-        c = db.get_service_contract(self.contract_id)
-        if c:
-            self.mine_lbl.setText(f"Рудник: {db.get_mine_name(c.get('mine_id')) or '—'}")
-            self.section_lbl.setText(f"Участок: {db.get_section_name(c.get('section_id')) or '—'}")
-
-        acts = db.list_service_acts(self.contract_id)
-        self.acts_table.setRowCount(len(acts))
-        for r, a in enumerate(acts):
-            self.acts_table.setItem(r, 0, QtWidgets.QTableWidgetItem(a.get("period_start") or ""))
-            self.acts_table.setItem(r, 1, QtWidgets.QTableWidgetItem(a.get("period_end") or ""))
-            self.acts_table.setItem(r, 2, QtWidgets.QTableWidgetItem(a.get("act_date") or ""))
-            amt_item = QtWidgets.QTableWidgetItem(money(a.get("amount", 0)))
-            amt_item.setTextAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
-            self.acts_table.setItem(r, 3, amt_item)
-            self.acts_table.setItem(r, 4, QtWidgets.QTableWidgetItem(str(a.get("id", ""))))
-            self.acts_table.item(r, 4).setData(QtCore.Qt.ItemDataRole.UserRole, a.get("id"))
+        self.refresh(snap)
+
+    def refresh(self, snap: dict | None = None):
+        """Перечитать договор и все акты (db.get_service_contract_snapshot — одно соединение)."""
+        snap = snap or db.get_service_contract_snapshot(self.contract_id)
+        if not snap:
+            return
+        c = snap["contract"]
+        self._total = float(c["total_amount"] or 0)
+        self.title_lbl.setText(f"Договор: {c['name']}")
+        self.mine_lbl.setText(f"Рудник: {snap['mine_name'] or '—'}")
+        self.section_lbl.setText(f"Участок: {snap['section_name'] or '—'}")
+        self._acts = list(snap["acts"])
+        self.acts_table.setRowCount(len(self._acts))
+        for r, a in enumerate(self._acts):
+            self._fill_act_row(r, a)
         self.acts_table.setColumnHidden(4, True)
         self.acts_table.setAlternatingRowColors(True)
+        self._show_totals()
+
+    def _fill_act_row(self, r: int, a: dict):
+        self.acts_table.setItem(r, 0, QtWidgets.QTableWidgetItem(a.get("period_start") or ""))
+        self.acts_table.setItem(r, 1, QtWidgets.QTableWidgetItem(a.get("period_end") or ""))
+        self.acts_table.setItem(r, 2, QtWidgets.QTableWidgetItem(a.get("act_date") or ""))
+        amt_item = QtWidgets.QTableWidgetItem(money(a.get("amount", 0)))
+        amt_item.setTextAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
+        self.acts_table.setItem(r, 3, amt_item)
+        self.acts_table.setItem(r, 4, QtWidgets.QTableWidgetItem(str(a.get("id", ""))))
+        self.acts_table.item(r, 4).setData(QtCore.Qt.ItemDataRole.UserRole, a.get("id"))
+
+    def _show_totals(self):
+        """Итоги по актам, уже загруженным в карточку (без запроса к базе)."""
+        spent = sum(float(a.get("amount") or 0) for a in self._acts)
+        self.total_lbl.setText(f"Сумма договора: {money(self._total)}")
+        self.spent_lbl.setText(f"Списано всего: {money(spent)}")
+        self.remaining_lbl.setText(f"Остаток: {money(self._total - spent)}")
+        self._show_forecast()
+
+    def _patch_act(self, act_id: int):
+        """После добавления/изменения/удаления акта — перечитать только его строку и пересчитать итоги."""
+        pos = next((i for i, a in enumerate(self._acts) if a["id"] == act_id), None)
+        if pos is not None:
+            self._acts.pop(pos)
+            self.acts_table.removeRow(pos)
+        a = db.get_service_act(act_id)
+        if a is not None:
+            key = (a["act_date"] or "", a["id"])
+            pos = next((i for i, b in enumerate(self._acts) if (b["act_date"] or "", b["id"]) > key), len(self._acts))
+            self._acts.insert(pos, a)
+            self.acts_table.insertRow(pos)
+            self._fill_act_row(pos, a)
+            self.acts_table.selectRow(pos)
+        self._show_totals()
+
+    def _show_forecast(self):
+        """Прогноз по текущему темпу актов (service_forecast, кэш до изменения актов)."""
+        import service_forecast
+        f = service_forecast.forecast_for(self.contract_id)
+        self.rate_lbl.setText(f"Расход в месяц: {money(f['rate']) if f['rate'] is not None else '—'}")
+        self.exhaustion_lbl.setText(f"Исчерпание суммы: {f['exhaustion'] or '—'}")
+        if f["variance"] is None:
+            self.variance_lbl.setText(f"Прогноз к окончанию: {f['status'] or '—'}")
+        else:
+            word = "перерасход" if f["variance"] > 0 else "экономия"
+            self.variance_lbl.setText(f"Прогноз к окончанию: {money(f['projected'])} ({word} {money(abs(f['variance']))})")
+        self.variance_lbl.setStyleSheet("color: red;" if f["status"] == "перерасход" else "")
 
     def _add_act(self):
         from service_act_form import ServiceActDialog
-        if ServiceActDialog(self.contract_id, self).exec():
-            self.refresh()
+        dlg = ServiceActDialog(self.contract_id, self)
+        if dlg.exec() and dlg.saved_act_id is not None:
+            self._patch_act(dlg.saved_act_id)
 
     def _edit_contract(self):
         from service_contract_form import ServiceContractDialog
         if ServiceContractDialog(parent=self, contract_id=self.contract_id).exec():
-            c = db.get_service_contract(self.contract_id)
-            if c:
-                self.title_lbl.setText(f"Договор: {c['name']}")
             self.refresh()
 
     def _on_ctx_menu(self, pos):
@@ -109,8 +153,8 @@ class ServiceContractCard(QtWidgets.QDialog):
         if action == act_edit:
             from service_act_form import ServiceActDialog
             if ServiceActDialog(self.contract_id, self, act_id=act_id).exec():
-                self.refresh()
+                self._patch_act(act_id)
         elif action == act_del:
             if QtWidgets.QMessageBox.question(self, "Удаление", "Удалить акт?") == QtWidgets.QMessageBox.StandardButton.Yes:
                 db.delete_service_act(act_id)
-                self.refresh()
+                self._patch_act(act_id)
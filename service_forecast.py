@@ -0,0 +1,88 @@
+# service_forecast.py
+# Прогноз расходования договоров услуг: средний расход в месяц по периодам актов
+# (от начала первого периода до конца последнего), дата исчерпания суммы договора
+# и ожидаемый перерасход (+) или экономия (−) на дату окончания договора.
+# Суммы и границы периодов по всем договорам дают один запрос с GROUP BY
+# (db.list_service_forecast_inputs); результат кэшируется до изменения актов или договоров
+# (_meta.data_version, триггеры db.SERVICES_DATA_VERSION_TABLES).
+import datetime
+import os
+
+import db
+
+DAYS_PER_MONTH = 365.25 / 12
+MIN_MONTHS = 1.0          # период короче месяца считается за месяц (один акт не даёт завышенный темп)
+
+_cache = None             # (путь базы, data_version, {id договора: прогноз})
+
+
+def parse_date(text) -> datetime.date | None:
+    """ГГГГ-ММ-ДД (или ГГГГ-ММ — первое число месяца); иначе None."""
+    s = str(text or "").strip()
+    for n, fmt in ((10, "%Y-%m-%d"), (7, "%Y-%m")):
+        try:
+            return datetime.datetime.strptime(s[:n], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _months(a: datetime.date, b: datetime.date) -> float:
+    return (b - a).days / DAYS_PER_MONTH
+
+
+def forecast_row(total: float, end_date, spent: float, first_start, last_end, acts: int) -> dict:
+    """
+    Прогноз по одному договору: {"rate", "months", "exhaustion", "projected", "variance", "status"}.
+    rate — расход в месяц; exhaustion — дата исчерпания суммы в том же темпе (ISO) или "" (нет
+    данных); projected — ожидаемая сумма актов к end_date; variance = projected − total.
+    """
+    total, spent = float(total or 0), float(spent or 0)
+    out = {"rate": None, "months": None, "exhaustion": "", "projected": None, "variance": None, "status": ""}
+    start, last = parse_date(first_start), parse_date(last_end)
+    if not acts or start is None or last is None or last < start:
+        out["status"] = "нет актов" if not acts else "нет дат"
+        return out
+    months = max(_months(start, last + datetime.timedelta(days=1)), MIN_MONTHS)
+    rate = spent / months
+    out["rate"], out["months"] = rate, months
+    remaining = total - spent
+    if remaining <= 0:
+        out["exhaustion"] = last.isoformat()
+    elif rate > 0:
+        out["exhaustion"] = (last + datetime.timedelta(days=remaining / rate * DAYS_PER_MONTH)).isoformat()
+    end = parse_date(end_date)
+    if end is not None:
+        ahead = _months(last, end) if end > last else 0.0   # после последнего акта расход идёт в том же темпе
+        out["projected"] = spent + rate * ahead
+        out["variance"] = out["projected"] - total
+        out["status"] = "перерасход" if out["variance"] > 0.005 else "в пределах"
+    else:
+        out["status"] = "перерасход" if remaining < 0 else "нет даты окончания"
+    return out
+
+
+def forecast_all() -> dict[int, dict]:
+    """Прогнозы всех договоров текущей базы: {id договора: forecast_row(...)}. Кэш — до изменения данных."""
+    global _cache
+    key = os.path.abspath(db.get_db_path())
+    version = db.get_data_version()
+    if _cache is not None and _cache[:2] == (key, version):
+        return _cache[2]
+    rows, version = db.list_service_forecast_inputs()
+    result = {r[0]: forecast_row(r[1], r[3], r[4], r[5], r[6], r[7]) for r in rows}
+    _cache = (key, version, result)
+    return result
+
+
+def forecast_for(contract_id: int) -> dict:
+    return forecast_all().get(contract_id) or forecast_row(0, None, 0, None, None, 0)
+
+
+def attach(rows: list[dict]) -> list[dict]:
+    """Добавить к строкам db.list_service_contract_rows поля прогноза (rate, exhaustion, variance, forecast)."""
+    forecasts = forecast_all()
+    for r in rows:
+        f = forecasts.get(r["id"]) or forecast_row(0, None, 0, None, None, 0)
+        r["rate"], r["exhaustion"], r["variance"], r["forecast"] = f["rate"], f["exhaustion"], f["variance"], f["status"]
+    return rows
@@ -0,0 +1,78 @@
+# service_pivot.py
+# Свод актов «Услуги и работы»: месяц × рудник × участок × контрагент.
+# Суммы считает SQLite одним GROUP BY (db.list_service_pivot_cells, индекс по месяцу акта);
+# здесь строки куба раскладываются в матрицу по выбранной раскладке строк (столбцы — месяцы).
+# Ячейка матрицы → фильтр по измерениям для расшифровки (db.list_service_pivot_acts).
+import db
+
+# Раскладки строк матрицы: (название, измерения строки)
+ROW_LAYOUTS = (
+    ("Рудник", ("mine",)),
+    ("Рудник / участок", ("mine", "section")),
+    ("Контрагент", ("contractor",)),
+    ("Рудник / контрагент", ("mine", "contractor")),
+    ("Рудник / участок / контрагент", ("mine", "section", "contractor")),
+)
+DIMENSION_TITLES = {"month": "Месяц", "mine": "Рудник", "section": "Участок", "contractor": "Контрагент"}
+_DIM_INDEX = {"month": 0, "mine": 1, "section": 2, "contractor": 3}
+EMPTY = "—"
+NO_MONTH = "без даты"
+
+
+class Pivot:
+    """Матрица свода: row_keys × months, values[(row_key, month)] = (сумма, число актов)."""
+
+    def __init__(self, cells: list[tuple], row_dims: tuple):
+        self.row_dims = tuple(row_dims)
+        self.values: dict[tuple, list] = {}
+        self.row_totals: dict[tuple, float] = {}
+        self.col_totals: dict[str, float] = {}
+        self.total = 0.0
+        for cell in cells:
+            month, amount, acts = cell[0], cell[4], cell[5]
+            rk = tuple(cell[_DIM_INDEX[d]] for d in self.row_dims)
+            v = self.values.setdefault((rk, month), [0.0, 0])
+            v[0] += amount
+            v[1] += acts
+            self.row_totals[rk] = self.row_totals.get(rk, 0.0) + amount
+            self.col_totals[month] = self.col_totals.get(month, 0.0) + amount
+            self.total += amount
+        self.row_keys = sorted(self.row_totals, key=lambda k: tuple(s.casefold() for s in k))
+        self.months = sorted(self.col_totals, key=lambda m: (m == "", m))
+
+    def amount(self, row_key: tuple, month: str) -> float:
+        v = self.values.get((row_key, month))
+        return v[0] if v else 0.0
+
+    def filters(self, row_key: tuple | None, month: str | None) -> dict:
+        """Условия расшифровки ячейки (None — итоговая строка/столбец, измерение не ограничивается)."""
+        out = {}
+        if row_key is not None:
+            out.update(zip(self.row_dims, row_key))
+        if month is not None:
+            out["month"] = month
+        return out
+
+    def headers(self) -> list[str]:
+        return [DIMENSION_TITLES[d] for d in self.row_dims] + [month_title(m) for m in self.months] + ["Итого"]
+
+    def rows(self):
+        """Строки матрицы для экспорта (генератор): значения измерений, суммы по месяцам, итог; в конце — «Итого»."""
+        for rk in self.row_keys:
+            yield [k or EMPTY for k in rk] + [self.amount(rk, m) or None for m in self.months] + [self.row_totals[rk]]
+        yield (["Итого"] + [""] * (len(self.row_dims) - 1) + [self.col_totals[m] for m in self.months] + [self.total])
+
+
+def month_title(month: str) -> str:
+    return month or NO_MONTH
+
+
+def build(row_dims: tuple) -> Pivot:
+    return Pivot(db.list_service_pivot_cells(), row_dims)
+
+
+def export(xlsx_path: str, pivot: Pivot) -> str:
+    """Матрица в Excel через потоковую запись (export_excel.export_rows_streaming)."""
+    import export_excel
+    widths = [24] * len(pivot.row_dims) + [14] * (len(pivot.months) + 1)
+    return export_excel.export_rows_streaming(xlsx_path, pivot.headers(), pivot.rows(), "Свод актов", widths)
@@ -0,0 +1,141 @@
+# service_pivot_dialog.py
+# Свод актов по месяцам (service_pivot): выбор раскладки строк, матрица с итогами,
+# двойной щелчок по сумме — акты, из которых она сложилась; экспорт матрицы в Excel.
+from PyQt6 import QtCore, QtWidgets
+from PyQt6.QtGui import QFont
+
+import db
+import service_pivot
+from utils import money
+from theme import apply_dialog_theme
+
+CELL_ROLE = QtCore.Qt.ItemDataRole.UserRole      # (ключ строки или None, месяц или None)
+_RIGHT = QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter
+
+
+class ServicePivotDialog(QtWidgets.QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Свод актов по месяцам")
+        self.resize(1000, 560)
+        apply_dialog_theme(self)
+        self.pivot = None
+        self._cells = db.list_service_pivot_cells()
+
+        self.layout_combo = QtWidgets.QComboBox()
+        for title, _dims in service_pivot.ROW_LAYOUTS:
+            self.layout_combo.addItem(title)
+        self.export_btn = QtWidgets.QPushButton("📤 Экспорт в Excel…")
+        self.table = QtWidgets.QTableWidget()
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setAlternatingRowColors(True)
+        self.info = QtWidgets.QLabel("Двойной щелчок по сумме — акты, из которых она сложилась.")
+        self.info.setStyleSheet("color: gray;")
+
+        top = QtWidgets.QHBoxLayout()
+        top.addWidget(QtWidgets.QLabel("Строки:"))
+        top.addWidget(self.layout_combo)
+        top.addStretch(1)
+        top.addWidget(self.export_btn)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(top)
+        layout.addWidget(self.table)
+        layout.addWidget(self.info)
+
+        self.layout_combo.currentIndexChanged.connect(self._rebuild)
+        self.table.cellDoubleClicked.connect(self._drill_down)
+        self.export_btn.clicked.connect(self._export)
+        self._rebuild()
+
+    def _rebuild(self):
+        dims = service_pivot.ROW_LAYOUTS[max(self.layout_combo.currentIndex(), 0)][1]
+        p = self.pivot = service_pivot.Pivot(self._cells, dims)
+        nd = len(dims)
+        self.table.clear()
+        self.table.setColumnCount(nd + len(p.months) + 1)
+        self.table.setRowCount(len(p.row_keys) + 1)
+        self.table.setHorizontalHeaderLabels(p.headers())
+        bold = QFont()
+        bold.setBold(True)
+        for r, rk in enumerate(p.row_keys + [None]):
+            labels = [k or service_pivot.EMPTY for k in rk] if rk is not None else ["Итого"] + [""] * (nd - 1)
+            for c, text in enumerate(labels):
+                self.table.setItem(r, c, QtWidgets.QTableWidgetItem(text))
+            for c, month in enumerate(p.months + [None], start=nd):
+                if rk is None:
+                    value = p.col_totals[month] if month is not None else p.total
+                else:
+                    value = p.amount(rk, month) if month is not None else p.row_totals[rk]
+                item = QtWidgets.QTableWidgetItem(money(value) if value else "")
+                item.setTextAlignment(_RIGHT)
+                item.setData(CELL_ROLE, (rk, month))
+                if rk is None or month is None:
+                    item.setFont(bold)
+                self.table.setItem(r, c, item)
+        self.table.resizeColumnsToContents()
+
+    def _drill_down(self, row: int, col: int):
+        item = self.table.item(row, col)
+        key = item.data(CELL_ROLE) if item else None
+        if key is None or not item.text():
+            return
+        row_key, month = key
+        filters = self.pivot.filters(row_key, month)
+        parts = [f"{service_pivot.DIMENSION_TITLES[d]}: "
+                 f"{(service_pivot.month_title(v) if d == 'month' else v) or service_pivot.EMPTY}"
+                 for d, v in filters.items()]
+        ServicePivotActsDialog(filters, " · ".join(parts) or "Все акты", self).exec()
+
+    def _export(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Экспорт свода", "Свод актов.xlsx", "Excel (*.xlsx)")
+        if not path:
+            return
+        try:
+            out = service_pivot.export(path, self.pivot)
+        except (RuntimeError, OSError) as e:
+            QtWidgets.QMessageBox.warning(self, "Экспорт", str(e))
+            return
+        QtWidgets.QMessageBox.information(self, "Экспорт", f"Сохранено:\n{out}")
+
+
+class ServicePivotActsDialog(QtWidgets.QDialog):
+    """Расшифровка ячейки свода: акты с договором; двойной щелчок — карточка договора."""
+
+    HEADERS = ["Договор", "Контрагент", "Рудник", "Участок", "Период с", "Период по", "Дата акта", "Сумма"]
+
+    def __init__(self, filters: dict, title: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Акты — {title}")
+        self.resize(900, 420)
+        apply_dialog_theme(self)
+        acts = db.list_service_pivot_acts(filters)
+        self.table = QtWidgets.QTableWidget(len(acts), len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setAlternatingRowColors(True)
+        for r, a in enumerate(acts):
+            values = [a["contract"], a["contractor"], a["mine"], a["section"],
+                      a["period_start"] or "", a["period_end"] or "", a["act_date"] or ""]
+            for c, text in enumerate(values):
+                self.table.setItem(r, c, QtWidgets.QTableWidgetItem(text))
+            amt = QtWidgets.QTableWidgetItem(money(a["amount"]))
+            amt.setTextAlignment(_RIGHT)
+            self.table.setItem(r, 7, amt)
+            self.table.item(r, 0).setData(QtCore.Qt.ItemDataRole.UserRole, a["contract_id"])
+        self.table.resizeColumnsToContents()
+        self.table.cellDoubleClicked.connect(self._open_contract)
+        total = sum(a["amount"] for a in acts)
+        info = QtWidgets.QLabel(f"Актов: {len(acts)} | Сумма: {money(total)}")
+        info.setStyleSheet("padding: 6px; font-weight: bold;")
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addWidget(info)
+
+    def _open_contract(self, row: int, _col: int):
+        item = self.table.item(row, 0)
+        cid = item.data(QtCore.Qt.ItemDataRole.UserRole) if item else None
+        if cid is None:
+            return
+        from service_contract_card import ServiceContractCard
+        ServiceContractCard(cid, self).exec()
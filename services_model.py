@@ -0,0 +1,195 @@
+# services_model.py
+# Таблица договоров базы «Услуги и работы»: модель над строками db.list_service_contract_rows
+# (один запрос с GROUP BY по актам) с полями прогноза service_forecast.attach, прокси
+# с сортировкой по сырым числам и фильтрами (текст + диапазоны ОТ/ДО по сумме, списанному и остатку). Итоги по показанным строкам
+# пересчитываются целиком только при смене фильтра; при обновлении отдельных договоров
+# (patch_rows) — вычитается старая строка и прибавляется новая.
+from PyQt6 import QtCore
+from PyQt6.QtGui import QBrush
+
+from utils import money
+
+# (ключ строки, заголовок)
+COLUMNS = (
+    ("name", "Название"), ("contractor", "Контрагент"), ("total", "Сумма договора"),
+    ("spent", "Списано"), ("remaining", "Остаток"), ("mine", "Рудник"),
+    ("rate", "Расход в месяц"), ("exhaustion", "Исчерпание"), ("variance", "Прогноз к окончанию"),
+)
+MONEY_KEYS = ("total", "spent", "remaining")
+FORECAST_MONEY_KEYS = ("rate", "variance")   # поля service_forecast.attach (None — нет данных)
+RANGE_KEYS = MONEY_KEYS                      # по каким столбцам есть фильтр ОТ/ДО
+TEXT_KEYS = ("name", "contractor", "mine", "section")
+TOTAL_KEYS = ("count",) + MONEY_KEYS
+
+SORT_ROLE = QtCore.Qt.ItemDataRole.UserRole          # сырое значение (числа сортируются как числа)
+ID_ROLE = QtCore.Qt.ItemDataRole.UserRole + 1        # id договора
+
+PLACEHOLDER = "—"
+_RIGHT = QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter
+_BAD = QBrush(QtCore.Qt.GlobalColor.red)
+
+
+def empty_totals() -> dict:
+    return {k: 0 if k == "count" else 0.0 for k in TOTAL_KEYS}
+
+
+def _add(totals: dict, row: dict, sign: int):
+    totals["count"] += sign
+    for k in MONEY_KEYS:
+        totals[k] += sign * row[k]
+
+
+class ServicesTableModel(QtCore.QAbstractTableModel):
+    # (старая строка или None, новая строка или None) — для пересчёта итогов без обхода всей таблицы
+    rowReplaced = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[dict] = []
+        self._pos: dict[int, int] = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if orientation == QtCore.Qt.Orientation.Horizontal and role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section][1]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        key = COLUMNS[index.column()][0]
+        value = row.get(key)
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            if key in MONEY_KEYS:
+                return money(value)
+            if key in FORECAST_MONEY_KEYS:
+                return PLACEHOLDER if value is None else (("+" if key == "variance" and value > 0 else "") + money(value))
+            return value or (PLACEHOLDER if key == "exhaustion" else "")
+        if role == SORT_ROLE:
+            if value is None:
+                return -float("inf")
+            return value.casefold() if isinstance(value, str) else value
+        if role == ID_ROLE:
+            return row["id"]
+        if role == QtCore.Qt.ItemDataRole.TextAlignmentRole and key in MONEY_KEYS + FORECAST_MONEY_KEYS:
+            return _RIGHT
+        if role == QtCore.Qt.ItemDataRole.ForegroundRole:
+            if key == "remaining" and value < 0:
+                return _BAD
+            if key in ("exhaustion", "variance") and row.get("forecast") == "перерасход":
+                return _BAD
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole and key in ("exhaustion", "variance"):
+            return row.get("forecast") or None
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole and key == "mine" and row["section"]:
+            return f"{row['mine']} / {row['section']}"
+        return None
+
+    def row(self, source_row: int) -> dict:
+        return self._rows[source_row]
+
+    def rows(self) -> list[dict]:
+        return self._rows
+
+    def set_rows(self, rows: list[dict]):
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._pos = {r["id"]: i for i, r in enumerate(self._rows)}
+        self.endResetModel()
+
+    def patch_rows(self, contract_ids, rows: list[dict]):
+        """Обновить только договоры contract_ids: rows — их свежие строки (договора нет в rows — удалён)."""
+        fresh = {r["id"]: r for r in rows}
+        for cid in contract_ids:
+            new = fresh.get(cid)
+            pos = self._pos.get(cid)
+            if pos is not None and new is not None:
+                old = self._rows[pos]
+                self._rows[pos] = new
+                self.dataChanged.emit(self.index(pos, 0), self.index(pos, len(COLUMNS) - 1))
+                self.rowReplaced.emit(old, new)
+            elif pos is not None:
+                self.beginRemoveRows(QtCore.QModelIndex(), pos, pos)
+                old = self._rows.pop(pos)
+                self._pos = {r["id"]: i for i, r in enumerate(self._rows)}
+                self.endRemoveRows()
+                self.rowReplaced.emit(old, None)
+            elif new is not None:
+                n = len(self._rows)
+                self.beginInsertRows(QtCore.QModelIndex(), n, n)
+                self._rows.append(new)
+                self._pos[cid] = n
+                self.endInsertRows()
+                self.rowReplaced.emit(None, new)
+
+
+class ServicesFilterProxy(QtCore.QSortFilterProxyModel):
+    """Сортировка по SORT_ROLE, фильтр: текст (название, контрагент, рудник, участок) и диапазоны сумм."""
+
+    totalsChanged = QtCore.pyqtSignal()
+
+    def __init__(self, model: ServicesTableModel, parent=None):
+        super().__init__(parent)
+        self._text = ""
+        self._ranges: dict[str, tuple[float | None, float | None]] = {}
+        self.totals = empty_totals()
+        self.setSortRole(SORT_ROLE)
+        self.setDynamicSortFilter(True)
+        self.setSourceModel(model)
+        model.modelReset.connect(self._recount)
+        model.rowReplaced.connect(self._on_row_replaced)
+
+    def set_text(self, text: str):
+        self._text = " ".join(text.casefold().split())
+        self._refilter()
+
+    def set_range(self, key: str, lo: float | None, hi: float | None):
+        if lo is None and hi is None:
+            self._ranges.pop(key, None)
+        else:
+            self._ranges[key] = (lo, hi)
+        self._refilter()
+
+    def range(self, key: str) -> tuple[float | None, float | None]:
+        return self._ranges.get(key, (None, None))
+
+    def clear_filters(self):
+        self._text = ""
+        self._ranges.clear()
+        self._refilter()
+
+    def accepts(self, row: dict) -> bool:
+        for key, (lo, hi) in self._ranges.items():
+            v = row[key]
+            if (lo is not None and v < lo) or (hi is not None and v > hi):
+                return False
+        if self._text:
+            return any(self._text in row[k].casefold() for k in TEXT_KEYS)
+        return True
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.accepts(self.sourceModel().row(source_row))
+
+    def _refilter(self):
+        self.invalidateFilter()
+        self._recount()
+
+    def _recount(self):
+        totals = empty_totals()
+        for r in self.sourceModel().rows():
+            if self.accepts(r):
+                _add(totals, r, 1)
+        self.totals = totals
+        self.totalsChanged.emit()
+
+    def _on_row_replaced(self, old, new):
+        if old is not None and self.accepts(old):
+            _add(self.totals, old, -1)
+        if new is not None and self.accepts(new):
+            _add(self.totals, new, 1)
+        self.totalsChanged.emit()
@@ -1,8 +1,9 @@
 # settings_dialog.py — настройки столбцов таблицы (режим «Инвест») и «О программе»
 from PyQt6 import QtWidgets, QtCore
-from PyQt6.QtCore import QSettings
 from theme import apply_dialog_theme
+import preferences
 from about_dialog import AboutDialog
+import db
 
 # Логические столбцы таблицы проектов (индекс = позиция в списке по умолчанию)
 COLUMN_IDS = [
@@ -20,8 +21,10 @@ SETTINGS_VISIBLE_KEY = "invest_columns/visible"
 
 def load_column_order() -> list[int]:
     """Порядок логических индексов (0..11) слева направо. Всегда 12 элементов (дополняем при старых настройках)."""
-    s = QSettings()
-    val = s.value(SETTINGS_ORDER_KEY)
+    return list(preferences.parsed(SETTINGS_ORDER_KEY, _parse_column_order))
+
+
+def _parse_column_order(val) -> list[int]:
     if val is None:
         return list(range(12))
     if isinstance(val, list):
@@ -41,14 +44,15 @@ def load_column_order() -> list[int]:
 
 
 def save_column_order(order: list[int]) -> None:
-    s = QSettings()
-    s.setValue(SETTINGS_ORDER_KEY, [int(x) for x in order])
+    preferences.set_value(SETTINGS_ORDER_KEY, [int(x) for x in order])
 
 
 def load_column_visible() -> list[bool]:
     """Видимость по логическому индексу (0..11). Всегда 12 элементов (дополняем при старых настройках)."""
-    s = QSettings()
-    val = s.value(SETTINGS_VISIBLE_KEY)
+    return list(preferences.parsed(SETTINGS_VISIBLE_KEY, _parse_column_visible))
+
+
+def _parse_column_visible(val) -> list[bool]:
     if val is None:
         return [True] * 12
     if isinstance(val, list):
@@ -68,8 +72,7 @@ def load_column_visible() -> list[bool]:
 
 
 def save_column_visible(visible: list[bool]) -> None:
-    s = QSettings()
-    s.setValue(SETTINGS_VISIBLE_KEY, [1 if v else 0 for v in visible])
+    preferences.set_value(SETTINGS_VISIBLE_KEY, [1 if v else 0 for v in visible])
 
 
 class ColumnItemWidget(QtWidgets.QWidget):
@@ -121,6 +124,16 @@ class SettingsDialog(QtWidgets.QDialog):
                 self.list_layout.addWidget(w)
             layout.addWidget(self.list_widget)
 
+        if invest_mode:
+            layout.addWidget(QtWidgets.QLabel("<b>Файлы</b>"))
+            self.dedup_chk = QtWidgets.QCheckBox("Хранить одинаковые файлы один раз (хранилище по содержимому)")
+            self.dedup_chk.setToolTip(
+                "Новые вложения кладутся в Files/{база}/_store под именем хэша содержимого;\n"
+                "в папке проекта создаётся ссылка на файл. Уже сохранённые файлы не переносятся."
+            )
+            self.dedup_chk.setChecked(db.get_attachment_dedup())
+            layout.addWidget(self.dedup_chk)
+
         layout.addWidget(QtWidgets.QLabel("<b>Рудники и участки</b>"))
         mines_btn = QtWidgets.QPushButton("Рудники и участки…")
         mines_btn.clicked.connect(self._show_mines_sections)
@@ -178,4 +191,6 @@ class SettingsDialog(QtWidgets.QDialog):
             self._save_visible_from_widgets()
             save_column_order(self.order)
             save_column_visible(self.visible)
+            if self.dedup_chk.isChecked() != db.get_attachment_dedup():
+                db.set_attachment_dedup(self.dedup_chk.isChecked())
         self.accept()
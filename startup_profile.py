@@ -0,0 +1,78 @@
+# startup_profile.py
+# Хронология запуска: импорты, открытие БД, init_db, первый refresh, первая отрисовка окна.
+# Записи копятся всегда (это дёшево) до вызова finish(); вывести их можно флагом --startup-timeline.
+import sys
+import time
+from contextlib import contextmanager
+
+_T0 = time.perf_counter()
+_events: list[tuple[str, float, float]] = []   # (метка, начало мс, длительность мс)
+_finished = False
+
+# Модули, которые не должны загружаться до первой отрисовки окна (см. bench_startup.py)
+LAZY_MODULES = ("openpyxl", "pyperclip", "docx", "export_excel", "bulk_import", "project_card", "doc_generator")
+
+
+def _ms(t: float) -> float:
+    return (t - _T0) * 1000.0
+
+
+def mark(label: str):
+    """Отметка момента (без длительности)."""
+    if not _finished:
+        now = _ms(time.perf_counter())
+        _events.append((label, now, 0.0))
+
+
+@contextmanager
+def span(label: str):
+    """Замер участка: with startup_profile.span("init_db"): ..."""
+    if _finished:
+        yield
+        return
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        _events.append((label, _ms(t), (time.perf_counter() - t) * 1000.0))
+
+
+def finish(label: str = "первая отрисовка окна") -> float:
+    """Последняя отметка; дальше записи не ведутся. Возвращает время от старта процесса, мс."""
+    global _finished
+    mark(label)
+    _finished = True
+    return _events[-1][1]
+
+
+def events() -> list[tuple[str, float, float]]:
+    return list(_events)
+
+
+def format_timeline() -> str:
+    lines = ["Хронология запуска (мс от старта):"]
+    for label, start, dur in sorted(_events, key=lambda e: e[1]):
+        lines.append(f"{start:9.1f}  {dur:8.1f}  {label}" if dur else f"{start:9.1f}  {'':8}  {label}")
+    loaded = [m for m in LAZY_MODULES if m in sys.modules]
+    lines.append("Загружены при старте: " + (", ".join(loaded) if loaded else "—"))
+    return "\n".join(lines)
+
+
+def parse_flag(argv: list[str]) -> tuple[bool, str | None]:
+    """--startup-timeline → (True, None) — вывод в stderr; --startup-timeline=файл → (True, файл)."""
+    for a in argv:
+        if a == "--startup-timeline":
+            return True, None
+        if a.startswith("--startup-timeline="):
+            return True, a.split("=", 1)[1] or None
+    return False, None
+
+
+def dump(path: str | None = None):
+    """Записать хронологию в файл (или в stderr, если путь не задан)."""
+    text = format_timeline() + "\n"
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    elif sys.stderr is not None:
+        sys.stderr.write(text)
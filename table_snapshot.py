@@ -0,0 +1,67 @@
+# table_snapshot.py
+# Снимок главной таблицы на диске: строки всех 12 столбцов и итоги, посчитанные при последнем refresh.
+# При запуске снимок рисуется сразу, а свежие данные дочитываются в фоне (см. MainWindow._paint_snapshot).
+# Формат: zlib(marshal(dict)) — компактно и без зависимостей. Ключ — путь к БД и _meta.data_version.
+import hashlib
+import marshal
+import os
+import zlib
+
+from PyQt6.QtCore import QStandardPaths
+
+SNAPSHOT_FORMAT = 1
+
+
+def _snapshot_dir() -> str:
+    base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppLocalDataLocation)
+    return os.path.join(base or os.path.abspath("data"), "snapshots")
+
+
+def _norm_db_path(db_path: str) -> str:
+    return os.path.normcase(os.path.abspath(db_path))
+
+
+def snapshot_path(db_path: str) -> str:
+    key = hashlib.sha1(_norm_db_path(db_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(_snapshot_dir(), f"table_{key}.bin")
+
+
+def save(db_path: str, data_version: int, rows: list[tuple], totals: dict):
+    """Записать снимок (через временный файл, чтобы не оставить обрезанный)."""
+    payload = {
+        "format": SNAPSHOT_FORMAT,
+        "db": _norm_db_path(db_path),
+        "data_version": int(data_version),
+        "rows": [tuple(r) for r in rows],
+        "totals": dict(totals),
+    }
+    path = snapshot_path(db_path)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(zlib.compress(marshal.dumps(payload), 1))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # снимок — только ускорение, без него всё работает
+
+
+def load(db_path: str) -> dict | None:
+    """Снимок для базы db_path или None (нет файла, другой формат, повреждён)."""
+    try:
+        with open(snapshot_path(db_path), "rb") as f:
+            payload = marshal.loads(zlib.decompress(f.read()))
+    except (OSError, ValueError, EOFError, TypeError, zlib.error):
+        return None
+    if not isinstance(payload, dict) or payload.get("format") != SNAPSHOT_FORMAT:
+        return None
+    if payload.get("db") != _norm_db_path(db_path):
+        return None
+    return payload
+
+
+def remove(db_path: str):
+    try:
+        os.remove(snapshot_path(db_path))
+    except OSError:
+        pass
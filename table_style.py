@@ -0,0 +1,92 @@
+# table_style.py
+# Оформление главной таблицы (режим «Инвест»): в ячейках лежат только сырые значения,
+# а текст, выравнивание и цвета считает делегат при отрисовке — только для видимых ячеек.
+# format_cell используется и делегатом, и экспортом, чтобы текст в Excel совпадал с таблицей.
+from PyQt6 import QtCore, QtWidgets
+from PyQt6.QtGui import QBrush, QColor, QPalette
+
+from utils import money
+
+HEADERS = (
+    "Название", "Рудник", "Участок", "Заложено", "Имеется", "Необходимо",
+    "Маркетинг", "Договор", "Остаток", "Исполн. %", "Вне бюджета", "Статус закупки",
+)
+PLACEHOLDER = "—"
+MONEY_COLUMNS = (3, 4, 5, 6, 7, 8)     # Заложено … Остаток
+PCT_COLUMN = 9
+NUMERIC_COLUMNS = MONEY_COLUMNS + (PCT_COLUMN,)
+OUT_COLUMN = 10
+STATUS_COLUMN = 11
+NEED_COLUMN, HAVE_COLUMN, DIFF_COLUMN = 5, 4, 8
+
+VALUE_ROLE = QtCore.Qt.ItemDataRole.UserRole          # сырое число (None → -inf), для столбца 0 — id статьи
+STAGE_ROLE = QtCore.Qt.ItemDataRole.UserRole + 1      # стадия строки (хранится только в столбце 0)
+
+_STAGE_BRUSHES = {
+    "contract": QBrush(QColor("#0f3e5a")),
+    "marketing": QBrush(QColor("#1f4a3b")),
+}
+_DEFAULT_BRUSH = QBrush(QColor("#2f2f2f"))
+_GOOD = QColor(QtCore.Qt.GlobalColor.green)
+_BAD = QColor(QtCore.Qt.GlobalColor.red)
+_RIGHT = QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter
+
+
+def _number(value) -> float | None:
+    try:
+        v = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if v == -float("inf") else v
+
+
+def column_values(row: tuple) -> list:
+    """Сырые значения 12 столбцов по строке db.list_project_rows (Исполн. % считается здесь)."""
+    (_pid, name, mine_name, section_name, budget_val, have, need, marketing_amount,
+     contract_amount, diff, _stage, out_of_budget, procurement_status) = row
+    contract_val = contract_amount if contract_amount is not None else 0.0
+    # Исполн. % = по договорам исполнено / заложено × 100 (сколько от бюджета уже исполнено по договорам)
+    pct = round((contract_val / budget_val) * 100, 1) if budget_val else None
+    return [name, mine_name, section_name, budget_val, have, need, marketing_amount,
+            contract_amount, diff, pct, out_of_budget, procurement_status or ""]
+
+
+def format_cell(col: int, value) -> str:
+    """Текст ячейки главной таблицы по логическому столбцу и сырому значению."""
+    if col in MONEY_COLUMNS:
+        v = _number(value)
+        return money(v) if v is not None else PLACEHOLDER
+    if col == PCT_COLUMN:
+        v = _number(value)
+        return f"{v}%" if v is not None else PLACEHOLDER
+    if col == OUT_COLUMN:
+        return "Да" if value else "Нет"
+    if col == STATUS_COLUMN:
+        return (value or "").strip() or PLACEHOLDER
+    return "" if value is None else str(value)
+
+
+class MainTableDelegate(QtWidgets.QStyledItemDelegate):
+    """Цвет строки по стадии, зелёный/красный для «Необходимо» и «Остаток», формат и выравнивание сумм."""
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        col = index.column()
+        if col in NUMERIC_COLUMNS:
+            value = index.data(VALUE_ROLE)
+            option.text = format_cell(col, value)
+            option.features |= QtWidgets.QStyleOptionViewItem.ViewItemFeature.HasDisplay
+            option.displayAlignment = _RIGHT
+            if col == NEED_COLUMN:
+                have = _number(index.siblingAtColumn(HAVE_COLUMN).data(VALUE_ROLE)) or 0.0
+                self._set_text_color(option, _GOOD if (_number(value) or 0.0) <= have else _BAD)
+            elif col == DIFF_COLUMN:
+                self._set_text_color(option, _GOOD if (_number(value) or 0.0) >= 0 else _BAD)
+        elif col == STATUS_COLUMN:
+            option.text = format_cell(col, option.text)
+        stage = index.siblingAtColumn(0).data(STAGE_ROLE)
+        option.backgroundBrush = _STAGE_BRUSHES.get(stage, _DEFAULT_BRUSH)
+
+    @staticmethod
+    def _set_text_color(option, color: QColor):
+        option.palette.setColor(QPalette.ColorRole.Text, color)